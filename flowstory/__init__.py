@@ -0,0 +1 @@
+# Núcleo do FlowStory sem dependência de Tk (modelo da história, salvamento, etc.)
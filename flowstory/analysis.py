@@ -0,0 +1,215 @@
+# Verificação da história: bolhas inalcançáveis, caminhos sem "Parar Tudo",
+# laços sem saída e quantos finais diferentes existem. Um "Se" sem o ramo
+# "Então" ou sem o "Senão" também conta como sem saída: o interpretador vai
+# direto para o fim quando a condição cai no ramo que falta.
+#
+# Tudo em tempo linear no número de bolhas e ligações (uma busca em largura
+# e o algoritmo de Tarjan, sem recursão), então histórias de 100 mil bolhas
+# são verificadas em bem menos de um segundo.
+
+import threading
+from collections import deque
+
+from flowstory.graph import END_KINDS, EDGE_NEXT, EDGE_THEN, EDGE_ELSE
+
+# Mudanças que alteram a estrutura; mover ou editar texto não muda o resultado
+STRUCTURAL_EVENTS = ('add', 'remove', 'connect', 'disconnect', 'clear')
+
+
+class AnalysisReport:
+    __slots__ = ('start', 'reachable', 'unreachable', 'dead_ends', 'trapped_cycles', 'endings')
+
+    def __init__(self, start, reachable, unreachable, dead_ends, trapped_cycles, endings):
+        self.start = start
+        self.reachable = reachable
+        self.unreachable = unreachable
+        self.dead_ends = dead_ends
+        self.trapped_cycles = trapped_cycles
+        self.endings = endings
+
+    def problem_nodes(self):
+        nodes = set(self.unreachable) | set(self.dead_ends)
+        for cycle in self.trapped_cycles:
+            nodes.update(cycle)
+        return nodes
+
+    def is_clean(self):
+        return not (self.unreachable or self.dead_ends or self.trapped_cycles)
+
+    def summary(self):
+        parts = [f"{len(self.endings)} final(is)"]
+        if self.unreachable:
+            parts.append(f"{len(self.unreachable)} inalcançável(is)")
+        if self.dead_ends:
+            parts.append(f"{len(self.dead_ends)} sem saída")
+        if self.trapped_cycles:
+            parts.append(f"{len(self.trapped_cycles)} laço(s) sem fim")
+        return " · ".join(parts)
+
+
+def analyze(graph, start=None):
+    if start is None:
+        start = graph.start_node()
+
+    # Ids -> índices 0..n-1 com listas de vizinhos, para os laços abaixo ficarem baratos
+    ids = list(graph.nodes)
+    index = {node_id: position for position, node_id in enumerate(ids)}
+    successors = [[index[edge.dst] for edge in graph.out_edges(node_id)] for node_id in ids]
+    is_end = [graph.nodes[node_id].kind in END_KINDS for node_id in ids]
+    count = len(ids)
+
+    # Alcance a partir do início
+    reached = [False] * count
+    if start is not None:
+        queue = deque([index[start]])
+        reached[index[start]] = True
+        while queue:
+            current = queue.popleft()
+            if is_end[current]:
+                continue
+            for nxt in successors[current]:
+                if not reached[nxt]:
+                    reached[nxt] = True
+                    queue.append(nxt)
+
+    reachable = {ids[i] for i in range(count) if reached[i]}
+    unreachable = [ids[i] for i in range(count) if not reached[i]]
+    endings = [ids[i] for i in range(count) if reached[i] and is_end[i]]
+    dead_ends = [ids[i] for i in range(count)
+                 if reached[i] and not is_end[i]
+                 and (not successors[i] or _missing_branch(graph, ids[i]))]
+
+    trapped = []
+    for component in _strongly_connected(successors, reached):
+        members = set(component)
+        if len(component) == 1 and component[0] not in successors[component[0]]:
+            continue
+        if any(is_end[member] for member in component):
+            continue
+        leaves = any(nxt not in members for member in component for nxt in successors[member])
+        if not leaves:
+            trapped.append(sorted(ids[member] for member in component))
+
+    return AnalysisReport(start, reachable, unreachable, dead_ends, trapped, endings)
+
+
+def _missing_branch(graph, node_id):
+    # Mesma regra do compile_story: sem "Então"/"Senão", o ramo usa a ligação comum
+    if graph.nodes[node_id].kind != "Se":
+        return False
+    labels = {edge.label for edge in graph.out_edges(node_id)}
+    return EDGE_NEXT not in labels and not (EDGE_THEN in labels and EDGE_ELSE in labels)
+
+
+def _strongly_connected(successors, include):
+    # Tarjan iterativo, só sobre as bolhas alcançáveis
+    count = len(successors)
+    order = [-1] * count
+    low = [0] * count
+    on_stack = [False] * count
+    stack = []
+    components = []
+    counter = 0
+
+    for root in range(count):
+        if not include[root] or order[root] != -1:
+            continue
+        work = [(root, 0)]
+        order[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+
+        while work:
+            node, child = work[-1]
+            neighbours = successors[node]
+            if child < len(neighbours):
+                work[-1] = (node, child + 1)
+                nxt = neighbours[child]
+                if not include[nxt]:
+                    continue
+                if order[nxt] == -1:
+                    order[nxt] = low[nxt] = counter
+                    counter += 1
+                    stack.append(nxt)
+                    on_stack[nxt] = True
+                    work.append((nxt, 0))
+                elif on_stack[nxt] and order[nxt] < low[node]:
+                    low[node] = order[nxt]
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if low[node] < low[parent]:
+                    low[parent] = low[node]
+            if low[node] == order[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(component)
+    return components
+
+
+class LiveAnalyzer:
+    # Guarda o último relatório e refaz a análise numa thread depois de mudanças
+    # na estrutura. A thread lê o grafo enquanto o Tk continua editando; cada
+    # mudança na estrutura avança generation, e um resultado de uma geração que
+    # já passou (ou que quebrou lendo o grafo no meio de uma mudança) é jogado
+    # fora e a análise roda de novo. A thread do Tk só gasta o tempo do poll().
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.report = None
+        self.generation = 0
+        self._analyzed = -1        # geração do relatório atual
+        self._job = None           # (geração, thread, [relatório ou exceção])
+        graph.listeners.append(self.on_graph_event)
+
+    def on_graph_event(self, event, *args):
+        if event in STRUCTURAL_EVENTS:
+            self.generation += 1
+
+    def stale(self):
+        return self.report is None or self._analyzed != self.generation
+
+    def refresh(self):
+        # Na hora, na thread do Tk (botão "Verificar")
+        if self.stale():
+            self.report = analyze(self.graph)
+            self._analyzed = self.generation
+        return self.report
+
+    def poll(self):
+        # Na thread do Tk: o relatório em dia, ou None enquanto a análise corre
+        if self._job is not None:
+            generation, thread, result = self._job
+            if thread.is_alive():
+                return None
+            self._job = None
+            if generation == self.generation:
+                if isinstance(result[0], Exception):
+                    raise result[0]
+                self.report = result[0]
+                self._analyzed = generation
+        if self.stale():
+            self._start()
+            return None
+        return self.report
+
+    def _start(self):
+        result = []
+
+        def run():
+            try:
+                result.append(analyze(self.graph))
+            except Exception as error:
+                result.append(error)
+
+        thread = threading.Thread(target=run, name='flowstory-analysis', daemon=True)
+        self._job = (self.generation, thread, result)
+        thread.start()
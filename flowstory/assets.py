@@ -0,0 +1,101 @@
+# Imagens dos projetos ("Cenário", "Personagem") guardadas pelo conteúdo.
+#
+# Cada arquivo importado é identificado pelo SHA-256 do seu conteúdo e guardado
+# uma única vez em objects/ab/abcdef...; o mesmo fundo usado em vinte capítulos
+# ocupa espaço uma vez só. Arquivos grandes são lidos com mmap (open_buffer),
+# sem copiar tudo para a memória, tanto no hash quanto na cópia para os pacotes
+# exportados. As miniaturas só são decodificadas quando alguém pede, e
+# ficam num cache LRU com limite de bytes.
+
+import hashlib
+import mmap
+import os
+import shutil
+from collections import OrderedDict
+from contextlib import contextmanager
+
+MMAP_THRESHOLD = 4 * 1024 * 1024
+THUMBNAIL_CACHE_BYTES = 32 * 1024 * 1024
+
+
+@contextmanager
+def open_buffer(path):
+    # Conteúdo do arquivo como buffer: mmap para arquivos grandes, bytes para os pequenos
+    with open(path, 'rb') as handle:
+        if os.fstat(handle.fileno()).st_size >= MMAP_THRESHOLD:
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped
+        else:
+            yield handle.read()
+
+
+def hash_file(path):
+    with open_buffer(path) as data:
+        return hashlib.sha256(data).hexdigest()
+
+
+class AssetStore:
+    def __init__(self, root):
+        self.root = root
+        self.objects = os.path.join(root, 'objects')
+
+    def path(self, digest):
+        return os.path.join(self.objects, digest[:2], digest[2:])
+
+    def __contains__(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def import_file(self, source):
+        # Devolve (digest, novo); se o conteúdo já existe, nada é copiado
+        digest = hash_file(source)
+        target = self.path(digest)
+        if os.path.exists(target):
+            return digest, False
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_path = target + '.tmp'
+        shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, target)
+        return digest, True
+
+    def size(self, digest):
+        return os.path.getsize(self.path(digest))
+
+
+class ThumbnailCache:
+    # decoder(caminho, tamanho) -> (miniatura, bytes ocupados), ou None se não souber decodificar
+
+    def __init__(self, store, decoder, max_bytes=THUMBNAIL_CACHE_BYTES):
+        self.store = store
+        self.decoder = decoder
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()   # (digest, tamanho) -> (miniatura, bytes)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, digest, box=96):
+        key = (digest, box)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        decoded = self.decoder(self.store.path(digest), box)
+        if decoded is None:
+            return None
+        thumbnail, cost = decoded
+        self._entries[key] = (thumbnail, cost)
+        self.size += cost
+        while self.size > self.max_bytes and len(self._entries) > 1:
+            _, (_, old_cost) = self._entries.popitem(last=False)
+            self.size -= old_cost
+        return thumbnail
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
@@ -0,0 +1,249 @@
+# Exportação em lote, sem tela: verifica, compila e exporta uma pasta de projetos.
+#
+#   python -m flowstory.batch projetos/ saida/                 # jogo compilado (.zip)
+#   python -m flowstory.batch projetos/ saida/ --format jsonl  # JSON Lines
+#   python -m flowstory.batch projetos/ saida/ --jobs 8 --force --summary tempos.json
+#
+# Cada projeto (.flow ou pasta .flowseries) vai para um processo do pool. Um
+# projeto cujos arquivos não mudaram desde a última rodada, com o mesmo
+# formato, é pulado: as chaves ficam em saida/.flowstory-batch.json. A saída
+# é determinística (mesma entrada, mesmos bytes), então dá para comparar ou
+# versionar os pacotes. Não importa tkinter: roda em servidor sem display.
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from flowstory.analysis import analyze
+from flowstory.assets import AssetStore
+from flowstory.export import CHUNK_SIZE, export_bundle, export_jsonl, snapshot
+from flowstory.journal import FORMAT_VERSION, JOURNAL_SUFFIX, load_project
+from flowstory.player import TABLE_VERSION, chapter_from_graph, export_player
+from flowstory.runtime import compile_story, StoryError
+from flowstory.series import SERIES_SUFFIX, INDEX_NAME, SeriesLibrary
+
+FORMATS = ('game', 'zip', 'jsonl')
+MANIFEST_NAME = '.flowstory-batch.json'
+OUTPUT_SUFFIX = {'game': '.zip', 'zip': '.web.zip', 'jsonl': '.jsonl'}
+DEFAULT_ASSETS = os.path.join(os.path.expanduser('~'), '.flowstory', 'assets')
+DEFAULT_CACHE = os.path.join(os.path.expanduser('~'), '.flowstory', 'cache', 'jogo')
+
+
+def find_projects(root):
+    # Caminhos relativos, em ordem: histórias .flow e websérie .flowseries (sem entrar nelas)
+    found = []
+    for folder, directories, files in os.walk(root):
+        for name in list(directories):
+            if name.endswith(SERIES_SUFFIX):
+                found.append(os.path.relpath(os.path.join(folder, name), root))
+                directories.remove(name)
+        directories.sort()
+        for name in files:
+            if name.endswith('.flow'):
+                found.append(os.path.relpath(os.path.join(folder, name), root))
+    return sorted(found)
+
+
+def _project_files(path):
+    if path.endswith(SERIES_SUFFIX):
+        files = [os.path.join(path, INDEX_NAME)]
+        for folder, _, names in os.walk(path):
+            files.extend(os.path.join(folder, name) for name in names
+                         if name.endswith('.flow') or name.endswith(JOURNAL_SUFFIX))
+        return sorted(set(files))
+    return [path, path + JOURNAL_SUFFIX]
+
+
+def project_key(path, output_format):
+    # Muda quando um arquivo do projeto, o formato ou a versão do exportador mudam
+    digest = hashlib.sha1(f"{output_format}:{FORMAT_VERSION}:{TABLE_VERSION}\n".encode('utf-8'))
+    for name in _project_files(path):
+        digest.update(os.path.relpath(name, path).encode('utf-8') + b'\0')
+        try:
+            with open(name, 'rb') as handle:
+                for chunk in iter(lambda: handle.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+        except FileNotFoundError:
+            pass
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _assets(project, assets_dir):
+    # Só as imagens que existem; o resto vira aviso
+    store = AssetStore(assets_dir)
+    found, missing = [], []
+    for name, digest in sorted(project.get('assets', {}).items()):
+        if digest in store:
+            found.append((name, store.path(digest)))
+        else:
+            missing.append(name)
+    return found, missing
+
+
+def _check(graph, label, warnings):
+    compile_story(graph)
+    report = analyze(graph)
+    if not report.is_clean():
+        warnings.append(f"{label}: {report.summary()}")
+
+
+def _describe(failure):
+    return str(failure) or type(failure).__name__
+
+
+def _failed(error):
+    return {'status': 'erro', 'error': error, 'warnings': [], 'bubbles': 0, 'timings': {}}
+
+
+def export_project(task):
+    # Roda num processo do pool; devolve um dicionário simples com o resultado e os tempos
+    source, target, output_format, assets_dir, cache_dir = task
+    timings = {}
+    warnings = []
+    started = time.perf_counter()
+    try:
+        if source.endswith(SERIES_SUFFIX):
+            series = SeriesLibrary.open(source)
+            project = series.project
+            chapters = []
+            for info in sorted(series.chapters(), key=lambda info: info.episode):
+                # Capítulo ainda vazio não tem arquivo: load_project devolve grafo vazio
+                _, graph = load_project(series.chapter_path(info.id))
+                chapters.append((info.label(), graph))
+        else:
+            project, graph = load_project(source)
+            chapters = [(project.get('title') or os.path.basename(source), graph)]
+        timings['load_ms'] = (time.perf_counter() - started) * 1000
+
+        mark = time.perf_counter()
+        for label, graph in chapters:
+            _check(graph, label, warnings)
+        timings['check_ms'] = (time.perf_counter() - mark) * 1000
+
+        mark = time.perf_counter()
+        assets, missing = _assets(project, assets_dir)
+        warnings.extend(f"imagem não encontrada: {name}" for name in missing)
+        os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+        if output_format == 'game':
+            # O grafo já está na memória pela verificação; o cache evita recompilar
+            export_player(target, project, [chapter_from_graph(label, graph)
+                                            for label, graph in chapters],
+                          assets, cache_dir)
+        else:
+            if len(chapters) > 1:
+                raise StoryError("Websérie só pode ser exportada como jogo (--format game)")
+            nodes, edges, start = snapshot(chapters[0][1])
+            if output_format == 'zip':
+                export_bundle(target, project, nodes, edges, start, assets)
+            else:
+                export_jsonl(target, project, nodes, edges, start)
+        timings['export_ms'] = (time.perf_counter() - mark) * 1000
+        status, error = 'ok', None
+    except Exception as failure:
+        # Um projeto quebrado (JSON inválido, .flow que não é um projeto, StoryError)
+        # vira uma linha 'erro'; os outros projetos do lote seguem normalmente
+        status, error = 'erro', _describe(failure)
+    timings['total_ms'] = (time.perf_counter() - started) * 1000
+    return {'status': status, 'error': error, 'warnings': warnings,
+            'bubbles': sum(len(graph) for _, graph in chapters) if status == 'ok' else 0,
+            'timings': timings}
+
+
+def _load_manifest(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return {}
+
+
+def run(source_dir, output_dir, output_format='game', jobs=None, force=False,
+        assets_dir=DEFAULT_ASSETS, cache_dir=DEFAULT_CACHE):
+    # -> {projeto: resultado}, em ordem de nome
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = {} if force else _load_manifest(manifest_path)
+    results = {}
+    tasks = {}
+    keys = {}
+    for relative in find_projects(source_dir):
+        source = os.path.join(source_dir, relative)
+        base = relative[:-len(SERIES_SUFFIX)] if relative.endswith(SERIES_SUFFIX) else relative[:-5]
+        target = os.path.join(output_dir, base + OUTPUT_SUFFIX[output_format])
+        key = project_key(source, output_format)
+        keys[relative] = key
+        if manifest.get(relative) == key and os.path.exists(target):
+            results[relative] = {'status': 'pulado', 'error': None, 'warnings': [],
+                                 'bubbles': 0, 'timings': {}}
+            continue
+        tasks[relative] = (source, target, output_format, assets_dir, cache_dir)
+
+    if tasks:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {relative: pool.submit(export_project, task) for relative, task in tasks.items()}
+            for relative, future in futures.items():
+                try:
+                    results[relative] = future.result()
+                except Exception as failure:
+                    # O processo do pool morreu no meio (falta de memória, BrokenProcessPool)
+                    results[relative] = _failed(_describe(failure))
+
+    # Só entra no manifesto o que foi exportado sem erro
+    updated = {relative: keys[relative] for relative, result in results.items()
+               if result['status'] in ('ok', 'pulado')}
+    os.makedirs(output_dir, exist_ok=True)
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as handle:
+        json.dump(updated, handle, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+    return dict(sorted(results.items()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exportação em lote do FlowStory, sem tela")
+    parser.add_argument('source', help="pasta com projetos .flow e .flowseries")
+    parser.add_argument('output', help="pasta de saída")
+    parser.add_argument('--format', choices=FORMATS, default='game')
+    parser.add_argument('--jobs', type=int, default=None, help="processos (padrão: um por núcleo)")
+    parser.add_argument('--force', action='store_true', help="exporta tudo, mesmo sem mudanças")
+    parser.add_argument('--assets', default=DEFAULT_ASSETS, help="pasta das imagens importadas")
+    parser.add_argument('--cache', default=DEFAULT_CACHE, help="cache das tabelas de cena")
+    parser.add_argument('--summary', help="arquivo JSON com o resultado de cada projeto")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    results = run(args.source, args.output, args.format, args.jobs, args.force,
+                  args.assets, args.cache)
+    elapsed = time.perf_counter() - started
+
+    print(f"{'projeto':<40} {'status':<7} {'bolhas':>8} {'ler ms':>8} {'verif. ms':>10} "
+          f"{'exportar ms':>12} {'total ms':>9}")
+    for relative, result in results.items():
+        timings = result['timings']
+        columns = [f"{timings[key]:.1f}" if key in timings else '-'
+                   for key in ('load_ms', 'check_ms', 'export_ms', 'total_ms')]
+        print(f"{relative:<40} {result['status']:<7} {result['bubbles']:>8} {columns[0]:>8} "
+              f"{columns[1]:>10} {columns[2]:>12} {columns[3]:>9}")
+        if result['error']:
+            print(f"    erro: {result['error']}")
+        for warning in result['warnings']:
+            print(f"    aviso: {warning}")
+    counts = {}
+    for result in results.values():
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    print(f"{len(results)} projeto(s) em {elapsed:.2f} s: "
+          + ", ".join(f"{count} {status}" for status, count in sorted(counts.items())))
+
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as handle:
+            json.dump({'elapsed_s': elapsed, 'projects': results}, handle, indent=2,
+                      ensure_ascii=False)
+    return 1 if counts.get('erro') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,170 @@
+# Benchmark do interpretador em histórias sintéticas, sem tela.
+#
+#   python -m flowstory.bench                       # 1k, 10k e 100k bolhas
+#   python -m flowstory.bench --json atual.json     # grava os números
+#   python -m flowstory.bench --baseline base.json  # falha se piorar além da tolerância
+#
+# Para cada tamanho mede o tempo de compilação, o tempo até a primeira cena e
+# quantos passos por segundo o interpretador executa até "Parar Tudo".
+
+import argparse
+import json
+import random
+import sys
+import time
+
+from flowstory.graph import (StoryGraph, EDGE_NEXT, EDGE_THEN, EDGE_ELSE, EDGE_ROUTE,
+                             EDGE_CHAPTER)
+from flowstory.runtime import compile_story, StoryRunner
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+SCENE_EVENTS = ('line', 'background', 'scene', 'show')
+CHARACTERS = ("Ana", "Bento", "Clara", "Davi")
+
+
+def make_story(size, seed=0):
+    # História determinística com diálogos, "Se/Senão", rotas, capítulos e personagens
+    rng = random.Random(seed)
+    graph = StoryGraph()
+    columns = 40
+
+    def add(kind, text=''):
+        count = len(graph)
+        return graph.add_node(kind, text, x=(count % columns) * 150,
+                              y=(count // columns) * 100).id
+
+    def chain(src, dst, label=EDGE_NEXT):
+        graph.connect(src, dst, label)
+        return dst
+
+    tail = add("Cenário", "floresta")
+    tail = chain(tail, add("Personagem", CHARACTERS[0]))
+    tail = chain(tail, add("Contexto", "coragem = 0"))
+
+    while len(graph) < size - 1:
+        roll = rng.random()
+        remaining = size - 1 - len(graph)
+        if len(graph) % 1000 < 8 and len(graph) > 1000 and remaining > 2:
+            tail = chain(tail, add("Novo Capítulo", f"Capítulo {len(graph) // 1000}"), EDGE_CHAPTER)
+        elif roll < 0.05 and remaining > 6:
+            test = chain(tail, add("Se", "coragem > 3"))
+            then_head = chain(test, add("Então"), EDGE_THEN)
+            then_line = chain(then_head, add("Diálogo", "Ana: Vamos em frente!"))
+            else_head = chain(test, add("Senão"), EDGE_ELSE)
+            else_line = chain(else_head, add("Diálogo", "Ana: Ainda tenho medo..."))
+            tail = add("Contexto", "coragem += 1")
+            chain(then_line, tail)
+            chain(else_line, tail)
+        elif roll < 0.08 and remaining > 6:
+            question = chain(tail, add("Diálogo", "Bento: Para onde vamos?"))
+            merge = add("Cena", "encontro")
+            for name in ("Rio", "Montanha"):
+                route = chain(question, add("Criar Rota", name), EDGE_ROUTE)
+                line = chain(route, add("Diálogo", f"Clara: Seguindo para {name}."))
+                chain(line, merge)
+            tail = merge
+        elif roll < 0.12:
+            name = rng.choice(CHARACTERS)
+            kind = rng.choice(("Trazer Personagem", "Esconder Personagem", "Mudar Expressão",
+                               "Mover Personagem"))
+            text = name if kind.endswith("Personagem") and kind != "Mover Personagem" else f"{name} feliz"
+            tail = chain(tail, add(kind, text))
+        else:
+            speaker = rng.choice(CHARACTERS)
+            tail = chain(tail, add("Diálogo", f"{speaker}: Fala número {len(graph)} (coragem {{coragem}})"))
+
+    chain(tail, add("Parar Tudo"))
+    return graph
+
+
+def measure(size, seed=0, repeat=3):
+    graph = make_story(size, seed)
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        program = compile_story(graph)
+        compiled = time.perf_counter()
+
+        runner = StoryRunner(program)
+        while True:
+            event = runner.step()
+            if event is None or event[0] in SCENE_EVENTS:
+                break
+            if event[0] == 'choice':
+                runner.choose(0)
+        first_scene = time.perf_counter()
+
+        turn = [0]
+
+        def chooser(options):
+            turn[0] += 1
+            return turn[0] % len(options)
+
+        runner.run(chooser)
+        finished = time.perf_counter()
+
+        run_seconds = finished - first_scene
+        result = {
+            'bubbles': len(graph),
+            'compile_ms': (compiled - started) * 1000,
+            'first_scene_ms': (first_scene - started) * 1000,
+            'run_ms': run_seconds * 1000,
+            'steps': runner.steps,
+            'steps_per_second': runner.steps / run_seconds if run_seconds > 0 else float('inf'),
+        }
+        if best is None or result['first_scene_ms'] + result['run_ms'] < best['first_scene_ms'] + best['run_ms']:
+            best = result
+    return best
+
+
+def compare(current, baseline, tolerance):
+    # Devolve as linhas que pioraram mais do que a tolerância (0.25 = 25%)
+    regressions = []
+    for size, result in current.items():
+        base = baseline.get(size)
+        if base is None:
+            continue
+        for key in ('compile_ms', 'first_scene_ms'):
+            if result[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{size} bolhas: {key} {base[key]:.2f} -> {result[key]:.2f}")
+        if result['steps_per_second'] < base['steps_per_second'] / (1 + tolerance):
+            regressions.append(f"{size} bolhas: steps_per_second {base['steps_per_second']:.0f} -> "
+                               f"{result['steps_per_second']:.0f}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do interpretador do FlowStory")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="arquivo onde gravar os resultados")
+    parser.add_argument('--baseline', help="resultados anteriores para comparar")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    results = {}
+    print(f"{'bolhas':>8} {'compilar ms':>12} {'1ª cena ms':>11} {'passos/s':>12}")
+    for size in args.sizes:
+        result = measure(size, args.seed, args.repeat)
+        results[str(size)] = result
+        print(f"{result['bubbles']:>8} {result['compile_ms']:>12.2f} {result['first_scene_ms']:>11.2f} "
+              f"{result['steps_per_second']:>12.0f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as handle:
+            json.dump(results, handle, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as handle:
+            baseline = json.load(handle)
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSÃO: {line}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
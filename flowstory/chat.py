@@ -0,0 +1,95 @@
+# Motor do bate-papo: guarda só as últimas mensagens e diz ao widget o que mudar.
+#
+# As mensagens visíveis ficam num anel de tamanho fixo (MAX_MESSAGES); quando
+# chega uma nova com o anel cheio, a mais antiga sai da tela. Mensagens que
+# chegam em rajada esperam em "pending" e entram todas juntas no próximo
+# quadro, numa única atualização do widget. Ao rolar até o topo, a página
+# anterior do histórico é pedida à Flow e colocada em cima; se o anel
+# transbordar, as mais novas saem de baixo e a sala deixa de acompanhar o ao
+# vivo até a pessoa voltar para o fim.
+
+from collections import deque
+
+MAX_MESSAGES = 500
+HISTORY_PAGE = 50
+
+
+class ChatEngine:
+    def __init__(self, capacity=MAX_MESSAGES, page_size=HISTORY_PAGE):
+        self.capacity = capacity
+        self.page_size = page_size
+        self.window = deque()        # (id, nick, texto) na tela, da mais antiga para a mais nova
+        self.pending = deque(maxlen=capacity)
+        self.live = True             # a tela mostra as mensagens mais recentes
+        self.has_older = True
+        self.loading_older = False
+        self.newest_id = 0           # maior id já recebido, mesmo que fora da tela
+
+    def __len__(self):
+        return len(self.window)
+
+    def oldest_id(self):
+        for message_id, _, _ in self.window:
+            if message_id is not None:
+                return message_id
+        return None
+
+    def receive(self, messages):
+        # Só enfileira; o widget muda uma vez por quadro em take_frame()
+        for message in messages:
+            message_id = message[0]
+            if message_id is not None:
+                if message_id <= self.newest_id:
+                    continue
+                self.newest_id = message_id
+            self.pending.append(tuple(message))
+        return bool(self.pending) and self.live
+
+    def take_frame(self):
+        # -> (mensagens para acrescentar no fim, quantas linhas tirar do topo)
+        if not self.live or not self.pending:
+            return [], 0
+        added = list(self.pending)
+        self.pending.clear()
+        if len(added) > self.capacity:
+            added = added[-self.capacity:]
+        self.window.extend(added)
+        trimmed = 0
+        while len(self.window) > self.capacity:
+            self.window.popleft()
+            trimmed += 1
+        if trimmed:
+            self.has_older = True
+        return added, trimmed
+
+    def prepend(self, older):
+        # Página anterior do histórico -> (mensagens para pôr no topo, quantas tirar de baixo)
+        self.loading_older = False
+        oldest = self.oldest_id()
+        if oldest is not None:
+            older = [message for message in older if message[0] < oldest]
+        if len(older) < self.page_size:
+            self.has_older = False
+        older = [tuple(message) for message in older[-self.capacity:]]
+        self.window.extendleft(reversed(older))
+        trimmed = 0
+        while len(self.window) > self.capacity:
+            self.window.pop()
+            trimmed += 1
+        if trimmed:
+            # As mais novas saíram de baixo: só voltam com jump_to_latest()
+            self.live = False
+        return older, trimmed
+
+    def jump_to_latest(self, latest):
+        # Recomeça a tela com a última página; devolve as mensagens a mostrar
+        self.window.clear()
+        self.pending.clear()
+        self.live = True
+        self.has_older = True
+        self.loading_older = False
+        self.window.extend(tuple(message) for message in latest[-self.capacity:])
+        for message in self.window:
+            if message[0] is not None and message[0] > self.newest_id:
+                self.newest_id = message[0]
+        return list(self.window)
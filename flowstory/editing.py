@@ -0,0 +1,42 @@
+# Passos de edição da Mesa de Trabalho que só mexem no modelo (grafo, grade
+# espacial e histórico), sem o Tk. O FlowStoryApp e o editorbench chamam as
+# mesmas funções, então o benchmark mede o caminho de verdade do editor.
+
+from flowstory.graph import END_KINDS, edge_label_for, BUBBLE_WIDTH, BUBBLE_HEIGHT
+from flowstory.history import AddBubble, PlacedBubble
+
+# Posições aplicadas por volta do laço do Tk depois de uma organização automática
+LAYOUT_BATCH = 500
+
+
+def add_bubble(graph, spatial, history, kind, parent_id=None, drop_point=None, placed=False):
+    # A nova bolha entra embaixo da bolha mãe, ou em drop_point(), num lugar vazio;
+    # placed: a organização automática vai encaixá-la (o encaixe entra no mesmo passo)
+    parent = graph.get(parent_id)
+    if parent is not None:
+        x, y = parent.x, parent.y + BUBBLE_HEIGHT + 30
+    else:
+        x, y = drop_point()
+    x, y = spatial.free_spot(x, y, BUBBLE_WIDTH, BUBBLE_HEIGHT)
+    node = graph.add_node(kind, x=x, y=y)
+
+    # Ligar a nova bolha à mãe ("Se" -> "Então", "Criar Rota", ...)
+    edges = []
+    if parent is not None and parent.kind not in END_KINDS:
+        edges.append(graph.connect(parent.id, node.id, edge_label_for(kind)))
+
+    history.record((PlacedBubble if placed else AddBubble)(node, edges))
+    return node
+
+
+def apply_positions(graph, positions, moves, limit=LAYOUT_BATCH):
+    # Posições vindas da organização (iterador de (id, (x, y))), até limit bolhas
+    # por vez; guarda (antes, depois) em moves. False: ainda sobrou para o próximo lote
+    for count, (node_id, new) in enumerate(positions, 1):
+        node = graph.get(node_id)
+        if node is not None:
+            moves[node_id] = ((node.x, node.y), new)
+            graph.move_node(node_id, *new)
+        if count == limit:
+            return False
+    return True
@@ -0,0 +1,501 @@
+# Benchmark do editor sem tela: reproduz "a Mesa fica lenta com N bolhas".
+#
+#   python -m flowstory.editorbench                          # 1k, 10k e 50k bolhas
+#   python -m flowstory.editorbench --json atual.json        # grava os números
+#   python -m flowstory.editorbench --baseline base.json     # falha se piorar além da tolerância
+#   python -m flowstory.editorbench --sizes 100000 --no-memory
+#
+# EditorCore é o editor sem o Tk: o mesmo grafo, grade espacial, renderizador,
+# histórico e diário que o FlowStoryApp liga, com um canvas que só conta os
+# itens. A história é criada bolha a bolha com as mesmas funções de
+# flowstory.editing que o add_bubble_to_workspace usa (lugar livre embaixo da
+# selecionada, ligação, desfazer), mais o redesenho, com a seleção voltando de
+# vez em quando para uma bolha recente, como faz quem escreve. Depois vêm os
+# cenários: arrastar, adicionar com a organização automática ligada, desfazer
+# e refazer, salvar, buscar, digitar no editor de falas e exportar. Tudo parte
+# de random.Random(seed), então a mesma semente gera sempre a mesma história.
+#
+# Os tempos saem de uma passada normal; o pico de memória, de uma segunda
+# passada com tracemalloc (que deixa tudo mais lento e por isso não entra nos
+# tempos).
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from flowstory.bench import CHARACTERS
+from flowstory.editing import add_bubble, apply_positions
+from flowstory.export import export_bundle, snapshot
+from flowstory.graph import StoryGraph, BUBBLE_WIDTH, BUBBLE_HEIGHT
+from flowstory.history import UndoHistory, MoveBubbles, SetText
+from flowstory.journal import JournalWriter, encode_changes, write_snapshot
+from flowstory.layout import graph_snapshot, relayout
+from flowstory.markup import LineStates, tokenize
+from flowstory.player import chapter_from_graph, export_player
+from flowstory.render import BubbleRenderer
+from flowstory.search import SearchIndex
+from flowstory.spatial import SpatialGrid
+
+DEFAULT_SIZES = (1000, 10000, 50000)
+VIEW_WIDTH = 1280
+VIEW_HEIGHT = 800
+IDLE_EVERY = 20          # adições entre um redesenho e outro (o Tk fica livre entre teclas)
+BRANCH_CHANCE = 0.08     # chance de a próxima bolha sair de uma bolha anterior
+BRANCH_WINDOW = 200      # ... escolhida entre as últimas criadas (quem escreve volta pouco)
+DRAG_BUBBLES = 50
+DRAG_STEPS = 60
+PLACE_BUBBLES = 20       # bolhas adicionadas com a organização automática ligada
+UNDO_STEPS = 2000
+SEARCH_QUERIES = 200
+KEYSTROKES = 500
+# Diferenças abaixo disso são ruído de medição, mesmo que passem da tolerância
+MIN_DELTA_MS = 2.0
+MIN_DELTA_KB = 256
+# O máximo de uma única passada depende demais da sorte (coletor, outro processo)
+NOT_COMPARED = ('max_ms',)
+
+KINDS = ("Diálogo",) * 8 + ("Trazer Personagem", "Mudar Expressão", "Cenário", "Se",
+                            "Contexto", "Cena")
+WORDS = ("floresta", "castelo", "segredo", "coragem", "medo", "porta", "mapa", "rio",
+         "montanha", "carta", "promessa", "noite", "festa", "espada", "sonho")
+
+
+class NullCanvas:
+    # Canvas que não desenha nada: só numera itens e conta chamadas, para o
+    # renderizador rodar igual ao da janela; left/top são a rolagem
+
+    def __init__(self, width=VIEW_WIDTH, height=VIEW_HEIGHT):
+        self.width = width
+        self.height = height
+        self.left = 0
+        self.top = 0
+        self.items = 0
+        self.calls = 0
+        self._idle = {}
+        self._next_job = 0
+
+    def _create(self, *coords, **options):
+        self.calls += 1
+        self.items += 1
+        return self.items
+
+    create_oval = create_text = create_rectangle = create_line = _create
+
+    def _touch(self, *args, **options):
+        self.calls += 1
+
+    coords = itemconfigure = configure = delete = tag_lower = _touch
+    xview = yview = xview_moveto = yview_moveto = _touch
+
+    def canvasx(self, x):
+        return self.left + x
+
+    def canvasy(self, y):
+        return self.top + y
+
+    def winfo_width(self):
+        return self.width
+
+    def winfo_height(self):
+        return self.height
+
+    def after_idle(self, callback):
+        self._next_job += 1
+        self._idle[self._next_job] = callback
+        return self._next_job
+
+    def after_cancel(self, job):
+        self._idle.pop(job, None)
+
+    def run_idle(self):
+        # O que o Tk faria ao ficar livre
+        while self._idle:
+            _, callback = self._idle.popitem()
+            callback()
+
+
+class EditorCore:
+    # Os passos de FlowStoryApp que mexem no modelo, sem widgets nem status
+
+    def __init__(self):
+        self.graph = StoryGraph()
+        self.spatial = SpatialGrid()
+        self.spatial.attach(self.graph)
+        self.canvas = NullCanvas()
+        self.renderer = BubbleRenderer(self.canvas, self.graph, query=self.spatial.query)
+        self.history = UndoHistory()
+        self.selected = None
+        self.auto_layout = False
+
+    def drop_point(self):
+        left, top, right, bottom = self.renderer.viewport(margin=0)
+        return int((left + right - BUBBLE_WIDTH) / 2), int((top + bottom - BUBBLE_HEIGHT) / 2)
+
+    def add_bubble(self, kind, text=''):
+        # add_bubble_to_workspace seguido de apply_text_changes
+        node = add_bubble(self.graph, self.spatial, self.history, kind, self.selected,
+                          self.drop_point, placed=self.auto_layout)
+        self.select(node.id)
+        self.follow(node)
+        if text:
+            self.graph.set_text(node.id, text)
+            self.history.record(SetText(node.id, '', text))
+        return node
+
+    def place(self, node_ids):
+        # request_relayout até apply_layout_batch, com o cálculo aqui mesmo em vez
+        # do LayoutWorker: -> (segundos na thread do Tk, segundos do cálculo)
+        started = time.perf_counter()
+        nodes, edges = graph_snapshot(self.graph)
+        snapped = time.perf_counter()
+        positions = iter(list(relayout(nodes, edges, node_ids).items()))
+        computed = time.perf_counter()
+        moves = {}
+        while not apply_positions(self.graph, positions, moves):
+            self.idle()
+        if moves:
+            self.history.record(MoveBubbles(moves), merge=True)
+        self.idle()
+        return (snapped - started) + (time.perf_counter() - computed), computed - snapped
+
+    def select(self, node_id):
+        self.selected = node_id
+        self.renderer.set_selection({node_id} if node_id is not None else ())
+
+    def follow(self, node):
+        # Quem escreve rola a Mesa quando a bolha nova sai da tela
+        left, top, right, bottom = self.renderer.viewport(margin=0)
+        if left <= node.x and node.x + BUBBLE_WIDTH <= right and top <= node.y \
+                and node.y + BUBBLE_HEIGHT <= bottom:
+            return
+        self.canvas.left = max(0, node.x - self.canvas.width // 2)
+        self.canvas.top = max(0, node.y - self.canvas.height // 2)
+        self.renderer.schedule()
+
+    def drag(self, node_ids, dx, dy, steps):
+        # Um arraste com vários eventos de movimento, um redesenho por evento
+        origin = {node_id: (self.graph.get(node_id).x, self.graph.get(node_id).y)
+                  for node_id in node_ids}
+        latencies = []
+        for step in range(1, steps + 1):
+            started = time.perf_counter()
+            moves = {}
+            for node_id, (old_x, old_y) in origin.items():
+                new = (old_x + dx * step // steps, old_y + dy * step // steps)
+                self.graph.move_node(node_id, *new)
+                moves[node_id] = ((old_x, old_y), new)
+            self.history.record(MoveBubbles(moves), merge=step > 1)
+            self.idle()
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    def idle(self):
+        self.canvas.run_idle()
+
+
+def _words(rng, count):
+    return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+
+def _text(rng, kind):
+    # Texto que o interpretador aceita para cada tipo, como no bench do interpretador
+    if kind == "Diálogo":
+        return f"{rng.choice(CHARACTERS)}: {_words(rng, 6)}"
+    if kind == "Se":
+        return f"coragem > {rng.randint(0, 5)}"
+    if kind == "Contexto":
+        return "coragem += 1"
+    if kind == "Trazer Personagem":
+        return rng.choice(CHARACTERS)
+    if kind == "Mudar Expressão":
+        return f"{rng.choice(CHARACTERS)} feliz"
+    return _words(rng, 2)
+
+
+def _summary(latencies):
+    # Tempos de cada operação (segundos) -> total, mediana, p99 e máximo em ms
+    ordered = sorted(latencies)
+    if not ordered:
+        return {'total_ms': 0.0, 'p50_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+    return {
+        'total_ms': sum(ordered) * 1000,
+        'p50_ms': ordered[len(ordered) // 2] * 1000,
+        'p99_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+        'max_ms': ordered[-1] * 1000,
+    }
+
+
+def scenario_build(state, size, rng):
+    core = state['core'] = EditorCore()
+    latencies = []
+    created = []
+    while len(core.graph) < size:
+        if created and rng.random() < BRANCH_CHANCE:
+            core.select(rng.choice(created[-BRANCH_WINDOW:]))
+        kind = rng.choice(KINDS)
+        text = _text(rng, kind)
+        started = time.perf_counter()
+        created.append(core.add_bubble(kind, text).id)
+        if len(created) % IDLE_EVERY == 0:
+            core.idle()
+        latencies.append(time.perf_counter() - started)
+    core.idle()
+    state['created'] = created
+    result = _summary(latencies)
+    result['canvas_items'] = core.canvas.items
+    return result
+
+
+def scenario_drag(state, size, rng):
+    core = state['core']
+    visible = sorted(core.spatial.query(*core.renderer.viewport(margin=0)))
+    chosen = visible[:DRAG_BUBBLES]
+    return _summary(core.drag(chosen, 400, 300, DRAG_STEPS))
+
+
+def scenario_place(state, size, rng):
+    # Organização automática ligada: cada bolha nova é encaixada e o encaixe
+    # entra no mesmo passo de desfazer da adição
+    core = state['core']
+    core.auto_layout = True
+    steps = len(core.history)
+    latencies = []
+    computing = 0.0
+    for _ in range(PLACE_BUBBLES):
+        started = time.perf_counter()
+        node = core.add_bubble(rng.choice(KINDS))
+        added = time.perf_counter() - started
+        on_tk, elsewhere = core.place({node.id})
+        latencies.append(added + on_tk)
+        computing += elsewhere
+    core.auto_layout = False
+    result = _summary(latencies)
+    result['layout_ms'] = computing * 1000
+    result['undo_steps'] = len(core.history) - steps
+    return result
+
+
+def scenario_undo(state, size, rng):
+    core = state['core']
+    steps = min(UNDO_STEPS, len(core.history))
+    latencies = []
+    for method in (core.history.undo, core.history.redo):
+        for _ in range(steps):
+            started = time.perf_counter()
+            method(core.graph)
+            core.idle()
+            latencies.append(time.perf_counter() - started)
+    result = _summary(latencies)
+    result['steps'] = steps
+    return result
+
+
+def scenario_save(state, size, rng):
+    # O diário inteiro (primeira gravação), uma gravação pequena e a compactação
+    core = state['core']
+    path = os.path.join(state['directory'], 'historia.flow')
+    project = {'type': 'História', 'title': "Benchmark"}
+    writer = JournalWriter(path, reset=True)
+    started = time.perf_counter()
+    payload = encode_changes(core.graph, project)
+    encoded = time.perf_counter()
+    writer.submit(payload)
+    writer.flush()
+    written = time.perf_counter()
+
+    core.graph.set_text(core.selected, "Última fala")
+    small_started = time.perf_counter()
+    writer.submit(encode_changes(core.graph))
+    small_encoded = time.perf_counter()
+    writer.close()
+
+    compact_started = time.perf_counter()
+    write_snapshot(path, project, core.graph)
+    compacted = time.perf_counter()
+    return {
+        'encode_ms': (encoded - started) * 1000,
+        'write_ms': (written - encoded) * 1000,
+        'small_encode_ms': (small_encoded - small_started) * 1000,
+        'snapshot_ms': (compacted - compact_started) * 1000,
+        'journal_kb': len(payload) // 1024,
+    }
+
+
+def scenario_search(state, size, rng):
+    # Vitrine com histórias feitas das falas da Mesa; consultas de 1 e 2 palavras
+    core = state['core']
+    index = SearchIndex()
+    texts = [node.text for node in core.graph if node.text]
+    stories = max(100, size // 10)
+    started = time.perf_counter()
+    for number in range(stories):
+        lines = [texts[(number * 7 + offset) % len(texts)] for offset in range(5)]
+        index.add(("Autor", f"História {number}"), {
+            'title': f"História {number} {_words(rng, 2)}",
+            'description': _words(rng, 8),
+            'dialogue': ' '.join(lines),
+            'category': rng.choice(("Romance", "Aventura", "Mistério")),
+        })
+    indexed = time.perf_counter()
+    latencies = []
+    for _ in range(SEARCH_QUERIES):
+        query = _words(rng, rng.choice((1, 2)))
+        began = time.perf_counter()
+        results = index.search(query)
+        results.page(0)
+        latencies.append(time.perf_counter() - began)
+    result = _summary(latencies)
+    result['index_ms'] = (indexed - started) * 1000
+    return result
+
+
+def scenario_typing(state, size, rng):
+    # O roteiro inteiro colado no editor de falas (uma linha por bolha), realçado
+    # do zero, e depois teclas em linhas ao acaso: só as linhas tocadas são relidas
+    core = state['core']
+    lines = [node.text for node in core.graph]
+    states = LineStates(len(lines))
+    started = time.perf_counter()
+    while states.pending():
+        for line in states.take(1000):
+            states.set_problems(line, len(tokenize(lines[line])[1]))
+    full = time.perf_counter() - started
+    latencies = []
+    for _ in range(KEYSTROKES):
+        line = rng.randrange(len(lines))
+        began = time.perf_counter()
+        if rng.random() < 0.1:
+            # Enter no fim da linha
+            lines.insert(line + 1, '')
+            states.inserted(line, 1)
+        else:
+            lines[line] += rng.choice('abc{}[]: ')
+            states.inserted(line, 0)
+        for dirty in states.take(200, line, line + 1):
+            states.set_problems(dirty, len(tokenize(lines[dirty])[1]))
+        latencies.append(time.perf_counter() - began)
+    result = _summary(latencies)
+    result['full_ms'] = full * 1000
+    return result
+
+
+def scenario_export(state, size, rng):
+    core = state['core']
+    project = {'title': "Benchmark"}
+    started = time.perf_counter()
+    nodes, edges, start = snapshot(core.graph)
+    export_bundle(os.path.join(state['directory'], 'web.zip'), project, nodes, edges, start)
+    bundled = time.perf_counter()
+    export_player(os.path.join(state['directory'], 'jogo.zip'), project,
+                  [chapter_from_graph("Capítulo 1", core.graph)])
+    played = time.perf_counter()
+    return {'bundle_ms': (bundled - started) * 1000, 'game_ms': (played - bundled) * 1000}
+
+
+SCENARIOS = (
+    ('build', scenario_build),
+    ('drag', scenario_drag),
+    ('place', scenario_place),
+    ('undo', scenario_undo),
+    ('save', scenario_save),
+    ('search', scenario_search),
+    ('typing', scenario_typing),
+    ('export', scenario_export),
+)
+
+
+def _run(size, seed, memory):
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='flowstory-bench-') as directory:
+        state = {'directory': directory}
+        for name, scenario in SCENARIOS:
+            rng = random.Random(f"{seed}:{name}")
+            if memory:
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                scenario(state, size, rng)
+                results[name] = {'peak_kb': (tracemalloc.get_traced_memory()[1] - before) // 1024}
+            else:
+                results[name] = scenario(state, size, rng)
+    return results
+
+
+def measure(size, seed=0, memory=True):
+    # {cenário: {medida: valor}}; com memory, cada cenário ganha peak_kb
+    results = _run(size, seed, False)
+    if memory:
+        tracemalloc.start()
+        try:
+            for name, peaks in _run(size, seed, True).items():
+                results[name].update(peaks)
+        finally:
+            tracemalloc.stop()
+    return results
+
+
+def compare(current, baseline, tolerance):
+    # Devolve as medidas (_ms e _kb) que pioraram mais do que a tolerância (0.25 = 25%)
+    # e mais do que o piso de ruído
+    regressions = []
+    for size, scenarios in current.items():
+        for name, result in scenarios.items():
+            base = baseline.get(size, {}).get(name)
+            if base is None:
+                continue
+            for key, value in result.items():
+                old = base.get(key)
+                if old is None or key in NOT_COMPARED:
+                    continue
+                if key.endswith('_ms'):
+                    floor = MIN_DELTA_MS
+                elif key.endswith('_kb'):
+                    floor = MIN_DELTA_KB
+                else:
+                    continue
+                if value > old * (1 + tolerance) and value - old > floor:
+                    regressions.append(f"{size} bolhas, {name}: {key} {old:.2f} -> {value:.2f}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do editor do FlowStory, sem tela")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help="pula a passada com tracemalloc")
+    parser.add_argument('--json', help="arquivo onde gravar os resultados")
+    parser.add_argument('--baseline', help="resultados anteriores para comparar")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    results = {}
+    for size in args.sizes:
+        result = measure(size, args.seed, not args.no_memory)
+        results[str(size)] = result
+        print(f"{size} bolhas")
+        for name, values in result.items():
+            line = ' '.join(f"{key}={value:.2f}" if isinstance(value, float) else f"{key}={value}"
+                            for key, value in values.items())
+            print(f"  {name:<7} {line}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as handle:
+            json.dump(results, handle, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as handle:
+            baseline = json.load(handle)
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSÃO: {line}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
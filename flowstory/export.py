@@ -0,0 +1,297 @@
+# Exportação em fluxo: a história é gravada em pedaços, direto no disco.
+#
+# Nada é montado inteiro na memória: bolhas e ligações viram linhas JSON que
+# saem em blocos de 64 KB, e os arquivos de imagem são copiados para o pacote
+# também em blocos (os grandes mapeados com mmap). Assim o uso de memória não cresce com o projeto.
+#
+# Formatos:
+#   .jsonl -> cabeçalho, uma linha por bolha e uma por ligação
+#   .zip   -> pacote web: index.html + story.js (os mesmos registros) + assets/
+
+import json
+import os
+import threading
+import zipfile
+
+from flowstory.assets import open_buffer
+from flowstory.journal import FORMAT_NAME, FORMAT_VERSION
+
+CHUNK_SIZE = 64 * 1024
+# Data fixa nas entradas do .zip: o mesmo projeto gera sempre o mesmo arquivo
+ZIP_DATE = (1980, 1, 1, 0, 0, 0)
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def snapshot(graph):
+    # Cópia feita na thread do Tk: bolhas como tuplas (id, tipo, texto, x, y,
+    # capítulo) e ligações como (origem, destino, rótulo). A exportação roda em
+    # outra thread enquanto o editor continua mexendo nos objetos Node
+    # (move_node, set_text), e nada disso pode aparecer no meio do arquivo
+    nodes = [(node.id, node.kind, node.text, node.x, node.y, node.chapter)
+             for node in graph.nodes.values()]
+    edges = [(edge.src, edge.dst, edge.label) for edge in graph.edges()]
+    return nodes, edges, graph.start_node()
+
+
+class _Progress:
+    def __init__(self, total, callback, cancel):
+        self.total = max(1, total)
+        self.done = 0
+        self.callback = callback
+        self.cancel = cancel
+        self._reported = -1
+
+    def advance(self, units=1, message=""):
+        if self.cancel is not None and self.cancel.is_set():
+            raise ExportCancelled()
+        self.done += units
+        # Avisa a cada 0,5% para não inundar a interface
+        step = self.done * 200 // self.total
+        if self.callback is not None and step != self._reported:
+            self._reported = step
+            self.callback(min(1.0, self.done / self.total), message)
+
+
+class _ChunkWriter:
+    # Junta textos pequenos e grava em blocos
+    def __init__(self, handle):
+        self.handle = handle
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= CHUNK_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.parts:
+            self.handle.write(''.join(self.parts).encode('utf-8'))
+            self.parts = []
+            self.size = 0
+
+
+def _records(project, nodes, edges, start):
+    yield {'type': 'header', 'format': FORMAT_NAME, 'version': FORMAT_VERSION,
+           'project': project, 'start': start, 'nodes': len(nodes), 'edges': len(edges)}
+    for node_id, kind, text, x, y, chapter in nodes:
+        yield {'id': node_id, 'kind': kind, 'text': text, 'x': x, 'y': y, 'chapter': chapter,
+               'type': 'node'}
+    for src, dst, label in edges:
+        yield {'src': src, 'dst': dst, 'label': label, 'type': 'edge'}
+
+
+def zip_entry(name):
+    info = zipfile.ZipInfo(name, date_time=ZIP_DATE)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.external_attr = 0o644 << 16
+    return info
+
+
+def copy_assets(bundle, assets, tracker):
+    # Imagens em ordem de nome, em blocos; as grandes são lidas com mmap
+    for name, source in sorted(assets):
+        with open_buffer(source) as data, memoryview(data) as view, \
+                bundle.open(zip_entry('assets/' + name), 'w') as dst:
+            for offset in range(0, len(view), CHUNK_SIZE):
+                dst.write(view[offset:offset + CHUNK_SIZE])
+                tracker.advance(message=f"Copiando {name}")
+
+
+def _write_records(writer, records, progress, suffix='\n'):
+    encode = _encoder.encode
+    for record in records:
+        writer.write(encode(record) + suffix)
+        progress.advance(message="Exportando bolhas")
+
+
+def _finish(tmp_path, path, work):
+    # Grava num arquivo temporário e só troca pelo final se tudo der certo
+    try:
+        work()
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+
+
+def export_jsonl(path, project, nodes, edges, start=None, progress=None, cancel=None):
+    tracker = _Progress(len(nodes) + len(edges) + 1, progress, cancel)
+    tmp_path = path + '.part'
+
+    def work():
+        with open(tmp_path, 'wb') as handle:
+            writer = _ChunkWriter(handle)
+            _write_records(writer, _records(project, nodes, edges, start), tracker)
+            writer.flush()
+
+    _finish(tmp_path, path, work)
+    if progress is not None:
+        progress(1.0, "Exportação concluída")
+
+
+def export_bundle(path, project, nodes, edges, start=None, assets=(), progress=None, cancel=None):
+    # assets: pares (nome no pacote, caminho no disco)
+    assets = list(assets)
+    asset_chunks = sum(os.path.getsize(source) // CHUNK_SIZE + 1 for _, source in assets)
+    tracker = _Progress(len(nodes) + len(edges) + 1 + asset_chunks, progress, cancel)
+    tmp_path = path + '.part'
+
+    def work():
+        with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as bundle:
+            bundle.writestr(zip_entry('index.html'), PLAYER_HTML)
+            with bundle.open(zip_entry('story.js'), 'w') as handle:
+                writer = _ChunkWriter(handle)
+                writer.write('window.FLOWSTORY_DATA = [\n')
+                _write_records(writer, _records(project, nodes, edges, start), tracker, suffix=',\n')
+                writer.write('];\n')
+                writer.flush()
+            copy_assets(bundle, assets, tracker)
+
+    _finish(tmp_path, path, work)
+    if progress is not None:
+        progress(1.0, "Exportação concluída")
+
+
+def _export(path, project, nodes, edges, start, assets, progress, cancel):
+    if path.lower().endswith('.zip'):
+        export_bundle(path, project, nodes, edges, start, assets, progress, cancel)
+    else:
+        export_jsonl(path, project, nodes, edges, start, progress, cancel)
+
+
+def export_story(path, project, graph, assets=(), progress=None, cancel=None):
+    nodes, edges, start = snapshot(graph)
+    _export(path, project, nodes, edges, start, assets, progress, cancel)
+
+
+class ExportJob:
+    # Roda uma exportação numa thread; a interface consulta o andamento com status()
+
+    def __init__(self, path, project, graph, assets=()):
+        self._setup(path)
+        # A cópia das bolhas e ligações é feita aqui, ainda na thread do Tk
+        nodes, edges, start = snapshot(graph)
+        self._start(_export, path, project, nodes, edges, start, list(assets))
+
+    def _setup(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._fraction = 0.0
+        self._message = "Preparando exportação"
+        self._finished = False
+        self._error = None
+
+    def _start(self, function, *args):
+        # function(*args, progress, cancel) roda na thread da exportação
+        self._thread = threading.Thread(target=self._run, name='flowstory-export', daemon=True,
+                                        args=(function, args))
+        self._thread.start()
+
+    def _progress(self, fraction, message):
+        with self._lock:
+            self._fraction = fraction
+            self._message = message
+
+    def _run(self, function, args):
+        try:
+            function(*args, self._progress, self._cancel)
+        except ExportCancelled:
+            self._progress(self._fraction, "Exportação cancelada")
+        except Exception as error:
+            # Qualquer falha (disco, história que não compila, ZIP grande demais)
+            # é mostrada como erro, nunca como "Exportado"
+            with self._lock:
+                self._error = error
+        finally:
+            with self._lock:
+                self._finished = True
+
+    def cancel(self):
+        self._cancel.set()
+
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def status(self):
+        with self._lock:
+            return self._fraction, self._message, self._finished, self._error
+
+    def wait(self, timeout=None):
+        self._thread.join(timeout)
+
+
+PLAYER_HTML = """<!DOCTYPE html>
+<html lang="pt-br">
+<head>
+<meta charset="UTF-8">
+<title>FlowStory</title>
+<style>
+body { font-family: Arial, sans-serif; background: #f5f0ff; margin: 0; }
+#stage { max-width: 720px; margin: 40px auto; background: white; border-radius: 12px; padding: 24px; }
+#line { min-height: 80px; font-size: 18px; }
+#speaker { color: #6a5acd; font-weight: bold; }
+button { background: #d8bfd8; border: none; border-radius: 8px; padding: 8px 16px; margin: 4px; cursor: pointer; }
+</style>
+</head>
+<body>
+<div id="stage"><div id="speaker"></div><div id="line"></div><div id="choices"></div>
+<button id="next">Avançar ▶</button></div>
+<script src="story.js"></script>
+<script>
+(function () {
+  var nodes = {}, out = {}, start = null;
+  window.FLOWSTORY_DATA.forEach(function (r) {
+    if (r.type === 'header') start = r.start;
+    else if (r.type === 'node') { nodes[r.id] = r; out[r.id] = out[r.id] || []; }
+    else if (r.type === 'edge') { (out[r.src] = out[r.src] || []).push(r); }
+  });
+  var current = start, next = document.getElementById('next');
+  function show(speaker, text) {
+    document.getElementById('speaker').textContent = speaker;
+    document.getElementById('line').textContent = text;
+  }
+  function advance() {
+    var choices = document.getElementById('choices');
+    choices.innerHTML = '';
+    while (current !== null && current !== undefined) {
+      var node = nodes[current], edges = out[current] || [];
+      var routes = edges.filter(function (e) { return e.label === 'route'; });
+      var forward = edges.filter(function (e) { return e.label !== 'route'; })[0];
+      current = forward ? forward.dst : null;
+      if (node.kind === 'Parar Tudo') { current = null; break; }
+      if (routes.length) {
+        next.disabled = true;
+        routes.forEach(function (e) {
+          var b = document.createElement('button');
+          b.textContent = nodes[e.dst].text || 'Rota';
+          b.onclick = function () { current = e.dst; next.disabled = false; advance(); };
+          choices.appendChild(b);
+        });
+      }
+      if (node.kind === 'Diálogo') {
+        var parts = node.text.split(':');
+        if (parts.length > 1) show(parts.shift(), parts.join(':').trim());
+        else show('', node.text);
+        return;
+      }
+      if (routes.length) return;
+    }
+    show('', '— Fim —');
+    next.disabled = true;
+  }
+  next.onclick = advance;
+  advance();
+})();
+</script>
+</body>
+</html>
+"""
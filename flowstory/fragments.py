@@ -0,0 +1,180 @@
+# Pedaços de história para copiar, colar e carimbar como modelo.
+#
+# Um fragmento guarda as bolhas com a posição relativa ao canto de cima da
+# seleção e só as ligações entre elas, em listas simples que vão direto para
+# JSON: [tipo, texto, dx, dy] por bolha e [origem, destino, rótulo] por
+# ligação, com origem e destino sendo posições na lista de bolhas. stamp()
+# cria tudo no grafo de uma vez e devolve bolhas e ligações para um único
+# AddBubbles no histórico.
+
+import os
+
+from flowstory.graph import (BUBBLE_WIDTH, BUBBLE_HEIGHT, EDGE_NEXT, EDGE_THEN, EDGE_ELSE,
+                             EDGE_ROUTE)
+
+FRAGMENT_VERSION = 1
+TEMPLATE_SUFFIX = '.json'
+COLUMN_STEP = BUBBLE_WIDTH + 40
+ROW_STEP = BUBBLE_HEIGHT + 30
+
+
+def copy_fragment(graph, node_ids):
+    chosen = sorted(node_id for node_id in node_ids if node_id in graph)
+    if not chosen:
+        return None
+    nodes = [graph.get(node_id) for node_id in chosen]
+    left = min(node.x for node in nodes)
+    top = min(node.y for node in nodes)
+    position = {node_id: index for index, node_id in enumerate(chosen)}
+    edges = [[position[edge.src], position[edge.dst], edge.label]
+             for node_id in chosen for edge in graph.out_edges(node_id) if edge.dst in position]
+    return {
+        'version': FRAGMENT_VERSION,
+        'nodes': [[node.kind, node.text, node.x - left, node.y - top] for node in nodes],
+        'edges': edges,
+    }
+
+
+def fragment_size(fragment):
+    # Largura e altura do retângulo que o fragmento ocupa
+    nodes = fragment['nodes']
+    if not nodes:
+        return 0, 0
+    return (max(dx for _, _, dx, _ in nodes) + BUBBLE_WIDTH,
+            max(dy for _, _, _, dy in nodes) + BUBBLE_HEIGHT)
+
+
+def stamp(graph, fragment, x, y, chapter=0):
+    add_node = graph.add_node
+    created = [add_node(kind, text, x + dx, y + dy, chapter)
+               for kind, text, dx, dy in fragment['nodes']]
+    connect = graph.connect
+    edges = [connect(created[src].id, created[dst].id, label)
+             for src, dst, label in fragment['edges']]
+    return created, edges
+
+
+def check_fragment(data):
+    # Confere um fragmento lido de arquivo antes de carimbar
+    if not isinstance(data, dict) or data.get('version') != FRAGMENT_VERSION:
+        raise ValueError("Modelo em formato desconhecido")
+    nodes = data.get('nodes')
+    edges = data.get('edges', [])
+    if not isinstance(nodes, list) or not isinstance(edges, list):
+        raise ValueError("Modelo sem bolhas")
+    try:
+        for kind, text, dx, dy in nodes:
+            if not isinstance(kind, str) or not isinstance(text, str) or dx < 0 or dy < 0:
+                raise ValueError("Bolha inválida no modelo")
+        for src, dst, _ in edges:
+            if not (0 <= src < len(nodes) and 0 <= dst < len(nodes)):
+                raise ValueError("Ligação inválida no modelo")
+    except TypeError as error:
+        raise ValueError("Modelo com dados inválidos") from error
+    return data
+
+
+# Modelos que vêm com o programa ---------------------------------------------
+
+def _snake(count, columns):
+    # Posições em zigue-zague: a fila seguinte volta no sentido contrário
+    for index in range(count):
+        row, col = divmod(index, columns)
+        if row % 2:
+            col = columns - 1 - col
+        yield col * COLUMN_STEP, row * ROW_STEP
+
+
+def dialogue_scene(lines=40, columns=8):
+    # "Cena" guarda texto livre; um "Contexto" com esse texto não compilaria
+    nodes = [["Cena", "Onde a cena acontece", 0, 0]]
+    for index, (dx, dy) in enumerate(_snake(lines, columns)):
+        nodes.append(["Diálogo", f"Fala {index + 1}", dx, dy + ROW_STEP])
+    edges = [[index, index + 1, EDGE_NEXT] for index in range(lines)]
+    return {'version': FRAGMENT_VERSION, 'nodes': nodes, 'edges': edges}
+
+
+def choice_scene(lines=3):
+    nodes = [["Se", "Condição", COLUMN_STEP, 0],
+             ["Então", "", 0, ROW_STEP],
+             ["Senão", "", 2 * COLUMN_STEP, ROW_STEP]]
+    edges = [[0, 1, EDGE_THEN], [0, 2, EDGE_ELSE]]
+    for branch, column in ((1, 0), (2, 2)):
+        previous = branch
+        for line in range(lines):
+            nodes.append(["Diálogo", "", column * COLUMN_STEP, (line + 2) * ROW_STEP])
+            edges.append([previous, len(nodes) - 1, EDGE_NEXT])
+            previous = len(nodes) - 1
+    return {'version': FRAGMENT_VERSION, 'nodes': nodes, 'edges': edges}
+
+
+def routes_scene(routes=3, length=6):
+    nodes = [["Cena", "Escolha da rota", 0, 0]]
+    edges = []
+    for route in range(routes):
+        previous = 0
+        for step in range(length):
+            kind = "Criar Rota" if step == 0 else "Diálogo"
+            nodes.append([kind, f"Rota {route + 1}" if step == 0 else "",
+                          route * COLUMN_STEP, (step + 1) * ROW_STEP])
+            edges.append([previous, len(nodes) - 1, EDGE_ROUTE if step == 0 else EDGE_NEXT])
+            previous = len(nodes) - 1
+        nodes.append(["Parar Tudo", "", route * COLUMN_STEP, (length + 1) * ROW_STEP])
+        edges.append([previous, len(nodes) - 1, EDGE_NEXT])
+    return {'version': FRAGMENT_VERSION, 'nodes': nodes, 'edges': edges}
+
+
+BUILTIN_TEMPLATES = {
+    "Cena de diálogo (40 falas)": lambda: dialogue_scene(40),
+    "Escolha Se / Então / Senão": choice_scene,
+    "Três rotas com final": lambda: routes_scene(3, 6),
+}
+
+
+class TemplateLibrary:
+    # Modelos do programa mais os salvos pela pessoa, um arquivo JSON por modelo
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, name):
+        safe = ''.join(char if char.isalnum() or char in ' -_' else '_' for char in name).strip()
+        return os.path.join(self.directory, (safe or 'modelo') + TEMPLATE_SUFFIX)
+
+    def saved(self):
+        # json só é importado quando a aba "Modelos" é aberta
+        import json
+        try:
+            files = sorted(os.listdir(self.directory))
+        except FileNotFoundError:
+            return []
+        names = []
+        for filename in files:
+            if filename.endswith(TEMPLATE_SUFFIX):
+                try:
+                    with open(os.path.join(self.directory, filename), encoding='utf-8') as handle:
+                        names.append(json.load(handle).get('name') or filename[:-len(TEMPLATE_SUFFIX)])
+                except (OSError, ValueError, AttributeError):
+                    continue
+        return names
+
+    def names(self):
+        return list(BUILTIN_TEMPLATES) + [name for name in self.saved()
+                                          if name not in BUILTIN_TEMPLATES]
+
+    def load(self, name):
+        factory = BUILTIN_TEMPLATES.get(name)
+        if factory is not None:
+            return factory()
+        import json
+        with open(self._path(name), encoding='utf-8') as handle:
+            return check_fragment(json.load(handle))
+
+    def save(self, name, fragment):
+        import json
+        os.makedirs(self.directory, exist_ok=True)
+        data = dict(fragment, name=name)
+        temporary = self._path(name) + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as handle:
+            json.dump(data, handle, ensure_ascii=False)
+        os.replace(temporary, self._path(name))
@@ -0,0 +1,255 @@
+# Grafo da história: cada bolha é um nó e cada ligação entre bolhas é uma aresta.
+# Os índices de sucessores e predecessores permitem consultar vizinhos sem
+# percorrer a lista inteira de bolhas.
+
+BUBBLE_WIDTH = 100
+BUBBLE_HEIGHT = 60
+
+# Rótulos das ligações
+EDGE_NEXT = 'next'
+EDGE_THEN = 'then'
+EDGE_ELSE = 'else'
+EDGE_ROUTE = 'route'
+EDGE_CHAPTER = 'chapter'
+
+# Tipo de bolha -> rótulo da ligação que chega até ela
+EDGE_LABELS = {
+    "Então": EDGE_THEN,
+    "Senão": EDGE_ELSE,
+    "Criar Rota": EDGE_ROUTE,
+    "Novo Capítulo": EDGE_CHAPTER,
+}
+
+END_KINDS = ("Parar Tudo",)
+
+
+def edge_label_for(kind):
+    return EDGE_LABELS.get(kind, EDGE_NEXT)
+
+
+class Node:
+    __slots__ = ('id', 'kind', 'text', 'x', 'y', 'chapter')
+
+    def __init__(self, node_id, kind, text='', x=0, y=0, chapter=0):
+        self.id = node_id
+        self.kind = kind
+        self.text = text
+        self.x = x
+        self.y = y
+        self.chapter = chapter
+
+    def bounds(self):
+        return (self.x, self.y, self.x + BUBBLE_WIDTH, self.y + BUBBLE_HEIGHT)
+
+    def to_dict(self):
+        return {'id': self.id, 'kind': self.kind, 'text': self.text,
+                'x': self.x, 'y': self.y, 'chapter': self.chapter}
+
+    def __repr__(self):
+        return f"Node({self.id}, {self.kind!r})"
+
+
+class Edge:
+    __slots__ = ('src', 'dst', 'label')
+
+    def __init__(self, src, dst, label=EDGE_NEXT):
+        self.src = src
+        self.dst = dst
+        self.label = label
+
+    def to_dict(self):
+        return {'src': self.src, 'dst': self.dst, 'label': self.label}
+
+    def __repr__(self):
+        return f"Edge({self.src} -> {self.dst}, {self.label!r})"
+
+
+class StoryGraph:
+    def __init__(self):
+        self.nodes = {}
+        self._succ = {}
+        self._pred = {}
+        self.next_id = 1
+        # Alterações desde o último salvamento: bolhas e origens de ligações
+        self.changed_nodes = set()
+        self.changed_edges = set()
+        # Funções chamadas a cada mudança: listener(evento, *dados)
+        self.listeners = []
+
+    def _notify(self, event, *args):
+        for listener in self.listeners:
+            listener(event, *args)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, node_id):
+        return node_id in self.nodes
+
+    def __iter__(self):
+        return iter(self.nodes.values())
+
+    def get(self, node_id):
+        return self.nodes.get(node_id)
+
+    def add_node(self, kind, text='', x=0, y=0, chapter=0, node_id=None):
+        if node_id is None:
+            node_id = self.next_id
+        elif node_id in self.nodes:
+            raise ValueError(f"Bolha {node_id} já existe")
+        self.next_id = max(self.next_id, node_id + 1)
+
+        node = Node(node_id, kind, text, x, y, chapter)
+        self.nodes[node_id] = node
+        self._succ[node_id] = []
+        self._pred[node_id] = []
+        self.changed_nodes.add(node_id)
+        self._notify('add', node)
+        return node
+
+    def restore_node(self, node, edges=()):
+        # Devolve ao grafo um nó removido antes, com o mesmo id e as mesmas arestas
+        if node.id in self.nodes:
+            raise ValueError(f"Bolha {node.id} já existe")
+        self.next_id = max(self.next_id, node.id + 1)
+        self.nodes[node.id] = node
+        self._succ[node.id] = []
+        self._pred[node.id] = []
+        self.changed_nodes.add(node.id)
+        self._notify('add', node)
+        for edge in edges:
+            self._relink(edge)
+        return node
+
+    def restore_nodes(self, nodes, edges=()):
+        # Vários nós de uma vez (colar, carimbar um modelo): primeiro as bolhas, depois as
+        # ligações, para as arestas entre elas não dependerem da ordem
+        for node in nodes:
+            self.restore_node(node)
+        for edge in edges:
+            self._relink(edge)
+
+    def _relink(self, edge):
+        if edge.src in self.nodes and edge.dst in self.nodes:
+            self._succ[edge.src].append(edge)
+            self._pred[edge.dst].append(edge)
+            self.changed_edges.add(edge.src)
+            self._notify('connect', edge)
+
+    def remove_node(self, node_id):
+        # Devolve o nó e as arestas removidas, para poder desfazer depois
+        node = self.nodes.pop(node_id)
+        edges = self._succ.pop(node_id) + self._pred.pop(node_id)
+        for edge in edges:
+            if edge.src != node_id:
+                self._succ[edge.src].remove(edge)
+            if edge.dst != node_id and edge.dst in self._pred:
+                self._pred[edge.dst].remove(edge)
+            self.changed_edges.add(edge.src)
+        self.changed_nodes.add(node_id)
+        # Laços (src == dst) aparecem nas duas listas
+        edges = list(dict.fromkeys(edges))
+        self._notify('remove', node, edges)
+        return node, edges
+
+    def move_node(self, node_id, x, y):
+        node = self.nodes[node_id]
+        node.x = x
+        node.y = y
+        self.changed_nodes.add(node_id)
+        self._notify('move', node)
+        return node
+
+    def set_text(self, node_id, text):
+        node = self.nodes[node_id]
+        node.text = text
+        self.changed_nodes.add(node_id)
+        self._notify('text', node)
+        return node
+
+    def connect(self, src, dst, label=EDGE_NEXT):
+        if src not in self.nodes or dst not in self.nodes:
+            raise KeyError(f"Ligação inválida: {src} -> {dst}")
+        edge = Edge(src, dst, label)
+        self._succ[src].append(edge)
+        self._pred[dst].append(edge)
+        self.changed_edges.add(src)
+        self._notify('connect', edge)
+        return edge
+
+    def disconnect(self, src, dst, label=None):
+        for edge in self._succ.get(src, ()):
+            if edge.dst == dst and (label is None or edge.label == label):
+                self._succ[src].remove(edge)
+                self._pred[dst].remove(edge)
+                self.changed_edges.add(src)
+                self._notify('disconnect', edge)
+                return edge
+        return None
+
+    def out_edges(self, node_id):
+        return self._succ[node_id]
+
+    def in_edges(self, node_id):
+        return self._pred[node_id]
+
+    def successors(self, node_id):
+        return [edge.dst for edge in self._succ[node_id]]
+
+    def predecessors(self, node_id):
+        return [edge.src for edge in self._pred[node_id]]
+
+    def edges(self):
+        for edge_list in self._succ.values():
+            yield from edge_list
+
+    def edge_count(self):
+        return sum(len(edge_list) for edge_list in self._succ.values())
+
+    def roots(self):
+        return [node_id for node_id, preds in self._pred.items() if not preds]
+
+    def start_node(self):
+        # Início da história: a bolha mais antiga sem nenhuma ligação chegando
+        roots = self.roots()
+        if roots:
+            return min(roots)
+        return min(self.nodes) if self.nodes else None
+
+    def clear(self):
+        self.nodes.clear()
+        self._succ.clear()
+        self._pred.clear()
+        self.next_id = 1
+        self.changed_nodes.clear()
+        self.changed_edges.clear()
+        self._notify('clear')
+
+    def has_changes(self):
+        return bool(self.changed_nodes or self.changed_edges)
+
+    def pop_changes(self):
+        changes = (self.changed_nodes, self.changed_edges)
+        self.changed_nodes = set()
+        self.changed_edges = set()
+        return changes
+
+    def mark_all_changed(self):
+        self.changed_nodes.update(self.nodes)
+        self.changed_edges.update(self.nodes)
+
+    def to_dict(self):
+        return {
+            'nodes': [node.to_dict() for node in self.nodes.values()],
+            'edges': [edge.to_dict() for edge in self.edges()],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        graph = cls()
+        for item in data.get('nodes', []):
+            graph.add_node(item['kind'], item.get('text', ''), item.get('x', 0),
+                           item.get('y', 0), item.get('chapter', 0), node_id=item['id'])
+        for item in data.get('edges', []):
+            graph.connect(item['src'], item['dst'], item.get('label', EDGE_NEXT))
+        return graph
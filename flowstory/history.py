@@ -0,0 +1,259 @@
+# Desfazer/refazer por comandos: cada edição guarda só o necessário para ser
+# revertida (a bolha e suas ligações, uma posição, um texto), nunca uma cópia
+# do projeto inteiro. O histórico tem limite de memória e descarta os passos
+# mais antigos quando passa dele.
+
+from collections import deque
+
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+
+# Estimativas de tamanho em memória (objetos com __slots__)
+COMMAND_BYTES = 64
+NODE_BYTES = 120
+EDGE_BYTES = 64
+
+
+class AddBubble:
+    __slots__ = ('node', 'edges')
+
+    def __init__(self, node, edges=()):
+        self.node = node
+        self.edges = list(edges)
+
+    def apply(self, graph):
+        graph.restore_node(self.node, self.edges)
+
+    def revert(self, graph):
+        _, self.edges = graph.remove_node(self.node.id)
+
+    def merge(self, other):
+        return False
+
+    def size(self):
+        return COMMAND_BYTES + NODE_BYTES + len(self.node.text) + EDGE_BYTES * len(self.edges)
+
+    def describe(self):
+        return f"adicionar '{self.node.kind}'"
+
+
+class DeleteBubble(AddBubble):
+    __slots__ = ()
+
+    def apply(self, graph):
+        AddBubble.revert(self, graph)
+
+    def revert(self, graph):
+        AddBubble.apply(self, graph)
+
+    def describe(self):
+        return f"apagar '{self.node.kind}'"
+
+
+class PlacedBubble(AddBubble):
+    # Bolha adicionada com a organização automática ligada: o encaixe que chega
+    # depois (ela e as filhas que ela cobriria) entra no mesmo passo da adição
+    __slots__ = ('moves',)
+
+    def __init__(self, node, edges=()):
+        AddBubble.__init__(self, node, edges)
+        self.moves = None
+
+    def apply(self, graph):
+        AddBubble.apply(self, graph)
+        if self.moves is not None:
+            self.moves.apply(graph)
+
+    def revert(self, graph):
+        if self.moves is not None:
+            self.moves.revert(graph)
+        AddBubble.revert(self, graph)
+
+    def merge(self, other):
+        if type(other) is not MoveBubbles or self.node.id not in other.moves:
+            return False
+        if self.moves is None:
+            self.moves = MoveBubbles(dict(other.moves))
+        else:
+            for node_id, (old, new) in other.moves.items():
+                self.moves.moves[node_id] = (self.moves.moves.get(node_id, (old,))[0], new)
+        return True
+
+    def size(self):
+        return AddBubble.size(self) + (self.moves.size() if self.moves is not None else 0)
+
+
+class AddBubbles:
+    # Um colar ou um modelo carimbado: centenas de bolhas num passo só do histórico
+    __slots__ = ('nodes', 'edges', 'label')
+
+    def __init__(self, nodes, edges, label):
+        self.nodes = list(nodes)
+        self.edges = list(edges)
+        self.label = label
+
+    def apply(self, graph):
+        graph.restore_nodes(self.nodes, self.edges)
+
+    def revert(self, graph):
+        removed = {}
+        for node in reversed(self.nodes):
+            _, edges = graph.remove_node(node.id)
+            removed.update(dict.fromkeys(edges))
+        # Ligações feitas depois, de bolhas antigas até as coladas, também voltam no refazer
+        self.edges = list(removed)
+
+    def merge(self, other):
+        return False
+
+    def size(self):
+        return (COMMAND_BYTES + sum(NODE_BYTES + len(node.text) for node in self.nodes)
+                + EDGE_BYTES * len(self.edges))
+
+    def describe(self):
+        return self.label
+
+
+class MoveBubbles:
+    __slots__ = ('moves',)
+
+    def __init__(self, moves):
+        # id da bolha -> ((x, y) antes, (x, y) depois)
+        self.moves = moves
+
+    def apply(self, graph):
+        for node_id, (_, new) in self.moves.items():
+            graph.move_node(node_id, *new)
+
+    def revert(self, graph):
+        for node_id, (old, _) in self.moves.items():
+            graph.move_node(node_id, *old)
+
+    def merge(self, other):
+        # Os vários passos de um arraste viram um só: mantém a origem, troca o destino
+        if type(other) is not MoveBubbles or other.moves.keys() != self.moves.keys():
+            return False
+        for node_id, (_, new) in other.moves.items():
+            self.moves[node_id] = (self.moves[node_id][0], new)
+        return True
+
+    def size(self):
+        return COMMAND_BYTES + EDGE_BYTES * len(self.moves)
+
+    def describe(self):
+        return "mover bolha" if len(self.moves) == 1 else f"mover {len(self.moves)} bolhas"
+
+
+class SetText:
+    __slots__ = ('node_id', 'old', 'new')
+
+    def __init__(self, node_id, old, new):
+        self.node_id = node_id
+        self.old = old
+        self.new = new
+
+    def apply(self, graph):
+        graph.set_text(self.node_id, self.new)
+
+    def revert(self, graph):
+        graph.set_text(self.node_id, self.old)
+
+    def merge(self, other):
+        if type(other) is not SetText or other.node_id != self.node_id:
+            return False
+        self.new = other.new
+        return True
+
+    def size(self):
+        return COMMAND_BYTES + len(self.old) + len(self.new)
+
+    def describe(self):
+        return "editar texto"
+
+
+class Batch:
+    # Vários comandos que entram e saem do histórico como um passo só
+    __slots__ = ('commands', 'label')
+
+    def __init__(self, commands, label):
+        self.commands = list(commands)
+        self.label = label
+
+    def apply(self, graph):
+        for command in self.commands:
+            command.apply(graph)
+
+    def revert(self, graph):
+        for command in reversed(self.commands):
+            command.revert(graph)
+
+    def merge(self, other):
+        return False
+
+    def size(self):
+        return COMMAND_BYTES + sum(command.size() for command in self.commands)
+
+    def describe(self):
+        return self.label
+
+
+class UndoHistory:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        # Pares [comando, tamanho], para a conta de memória não depender do estado atual
+        self._done = deque()
+        self._undone = []
+        self.size = 0
+
+    def __len__(self):
+        return len(self._done)
+
+    def can_undo(self):
+        return bool(self._done)
+
+    def can_redo(self):
+        return bool(self._undone)
+
+    def record(self, command, merge=False):
+        # O comando já foi executado pelo editor; aqui só entra no histórico
+        for _, size in self._undone:
+            self.size -= size
+        self._undone.clear()
+
+        if merge and self._done:
+            entry = self._done[-1]
+            if entry[0].merge(command):
+                self.size -= entry[1]
+                entry[1] = entry[0].size()
+                self.size += entry[1]
+                self._trim()
+                return
+
+        entry = [command, command.size()]
+        self._done.append(entry)
+        self.size += entry[1]
+        self._trim()
+
+    def undo(self, graph):
+        if not self._done:
+            return None
+        entry = self._done.pop()
+        entry[0].revert(graph)
+        self._undone.append(entry)
+        return entry[0]
+
+    def redo(self, graph):
+        if not self._undone:
+            return None
+        entry = self._undone.pop()
+        entry[0].apply(graph)
+        self._done.append(entry)
+        return entry[0]
+
+    def clear(self):
+        self._done.clear()
+        self._undone.clear()
+        self.size = 0
+
+    def _trim(self):
+        while self.size > self.max_bytes and len(self._done) > 1:
+            self.size -= self._done.popleft()[1]
@@ -0,0 +1,251 @@
+# Salvamento incremental em diário (journal).
+#
+# Um projeto salvo é formado por dois arquivos:
+#   historia.flow          -> retrato completo (JSON) do último compactamento
+#   historia.flow.journal  -> uma linha JSON por alteração feita depois dele
+#
+# Cada registro do diário descreve o estado final de uma bolha (ou das ligações
+# que saem dela), então reaplicar o mesmo registro duas vezes não muda nada.
+# Isso permite compactar sem medo: se o programa cair entre gravar o novo
+# retrato e esvaziar o diário, a próxima leitura só reaplica registros repetidos.
+#
+# request_close() não espera a thread do diário terminar. Quem for ler o mesmo
+# projeto depois disso (load_project, reabrir um capítulo descarregado) passa
+# por wait_closed(), que espera os diários desse caminho que ainda estão
+# gravando; sem isso a leitura pegaria o arquivo no meio de um compactamento.
+
+import os
+import queue
+import threading
+import time
+
+from flowstory.graph import StoryGraph
+from flowstory.metrics import METRICS
+
+FORMAT_NAME = 'flowstory'
+FORMAT_VERSION = 1
+JOURNAL_SUFFIX = '.journal'
+COMPACT_BYTES = 1024 * 1024
+
+# Caminho -> diários que receberam request_close() e ainda não terminaram
+_closing = {}
+_closing_lock = threading.Lock()
+
+
+def _dump_line(record):
+    # json só é importado quando há algo para gravar ou ler (abertura mais leve)
+    import json
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def encode_changes(graph, project=None):
+    # Roda na thread do Tk: custa proporcional ao que mudou, não ao tamanho da história
+    changed_nodes, changed_edges = graph.pop_changes()
+    lines = []
+    if project is not None:
+        lines.append(_dump_line({'op': 'project', 'data': project}))
+    for node_id in sorted(changed_nodes):
+        node = graph.get(node_id)
+        if node is None:
+            lines.append(_dump_line({'op': 'del', 'id': node_id}))
+        else:
+            lines.append(_dump_line({'op': 'node', 'node': node.to_dict()}))
+    for src in sorted(changed_edges):
+        if src in graph:
+            edges = [[edge.dst, edge.label] for edge in graph.out_edges(src)]
+            lines.append(_dump_line({'op': 'edges', 'src': src, 'edges': edges}))
+    return ''.join(lines).encode('utf-8')
+
+
+def apply_record(graph, project, record):
+    op = record.get('op')
+    if op == 'project':
+        project.update(record['data'])
+    elif op == 'node':
+        data = record['node']
+        node = graph.get(data['id'])
+        if node is None:
+            graph.add_node(data['kind'], data.get('text', ''), data.get('x', 0),
+                           data.get('y', 0), data.get('chapter', 0), node_id=data['id'])
+        else:
+            node.kind = data['kind']
+            node.text = data.get('text', '')
+            node.x = data.get('x', 0)
+            node.y = data.get('y', 0)
+            node.chapter = data.get('chapter', 0)
+    elif op == 'del':
+        if record['id'] in graph:
+            graph.remove_node(record['id'])
+    elif op == 'edges':
+        src = record['src']
+        if src not in graph:
+            return
+        for edge in list(graph.out_edges(src)):
+            graph.disconnect(edge.src, edge.dst, edge.label)
+        for dst, label in record['edges']:
+            if dst in graph:
+                graph.connect(src, dst, label)
+
+
+def read_journal(journal_path):
+    import json
+    try:
+        handle = open(journal_path, 'r', encoding='utf-8')
+    except FileNotFoundError:
+        return
+    with handle:
+        for line in handle:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # Última linha cortada por uma queda: o resto do diário é descartado
+                return
+
+
+def wait_closed(path):
+    with _closing_lock:
+        writers = list(_closing.get(os.path.abspath(path), ()))
+    for writer in writers:
+        # O próprio diário compactando lê o projeto: não espera por si mesmo
+        if writer._thread is not threading.current_thread():
+            writer._thread.join()
+
+
+def load_project(path):
+    import json
+    wait_closed(path)
+    project = {}
+    graph = StoryGraph()
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as handle:
+            data = json.load(handle)
+        project.update(data.get('project', {}))
+        graph = StoryGraph.from_dict(data.get('graph', {}))
+    for record in read_journal(path + JOURNAL_SUFFIX):
+        apply_record(graph, project, record)
+    graph.pop_changes()
+    return project, graph
+
+
+def write_snapshot(path, project, graph):
+    import json
+    data = {
+        'format': FORMAT_NAME,
+        'version': FORMAT_VERSION,
+        'project': project,
+        'graph': graph.to_dict(),
+    }
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as handle:
+        json.dump(data, handle, ensure_ascii=False, separators=(',', ':'))
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, path)
+
+
+def compact(path):
+    project, graph = load_project(path)
+    write_snapshot(path, project, graph)
+    open(path + JOURNAL_SUFFIX, 'w').close()
+
+
+class JournalWriter:
+    # Grava o diário numa thread própria, para o canvas nunca esperar pelo disco
+
+    def __init__(self, path, reset=False, compact_bytes=COMPACT_BYTES):
+        self.path = path
+        self.journal_path = path + JOURNAL_SUFFIX
+        self.compact_bytes = compact_bytes
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._pending_bytes = 0
+        self._saved_at = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name='flowstory-journal', daemon=True)
+        self._thread.start()
+        if reset:
+            self._queue.put(('reset', None))
+
+    def submit(self, payload):
+        if not payload:
+            return
+        with self._lock:
+            self._pending_bytes += len(payload)
+        self._queue.put(('append', payload))
+
+    def request_compact(self):
+        self._queue.put(('compact', None))
+
+    def status(self):
+        with self._lock:
+            return self._saved_at, self._pending_bytes, self._error
+
+    def flush(self):
+        self._queue.join()
+
+    def request_close(self):
+        # Termina de gravar o que já está na fila e encerra a thread sem esperar
+        with _closing_lock:
+            _closing.setdefault(os.path.abspath(self.path), set()).add(self)
+        self._queue.put(None)
+
+    def _closed(self):
+        with _closing_lock:
+            writers = _closing.get(os.path.abspath(self.path))
+            if writers is not None:
+                writers.discard(self)
+                if not writers:
+                    del _closing[os.path.abspath(self.path)]
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    self._closed()
+                    return
+                kind, payload = job
+                if kind == 'reset':
+                    self._reset()
+                elif kind == 'append':
+                    with METRICS.timer('save.disk'):
+                        self._append(payload)
+                elif kind == 'compact':
+                    compact(self.path)
+            except Exception as error:
+                # Qualquer falha (disco, retrato corrompido no compactamento) vai
+                # para a barra de status; a thread continua atendendo a fila
+                with self._lock:
+                    self._error = error
+            finally:
+                if job is not None and job[0] == 'append':
+                    with self._lock:
+                        self._pending_bytes -= len(job[1])
+                self._queue.task_done()
+
+    def _reset(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        for name in (self.path, self.journal_path):
+            if os.path.exists(name):
+                os.remove(name)
+
+    def _append(self, payload):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.journal_path, 'ab') as handle:
+            handle.write(payload)
+            handle.flush()
+            os.fsync(handle.fileno())
+            size = handle.tell()
+        with self._lock:
+            self._saved_at = time.time()
+            self._error = None
+        if size >= self.compact_bytes:
+            compact(self.path)
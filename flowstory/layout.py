@@ -0,0 +1,260 @@
+# Organização automática da Mesa de Trabalho em camadas (estilo Sugiyama).
+#
+#   1. laços: as ligações que voltam para trás (achadas numa busca em
+#      profundidade) são invertidas só para a conta
+#   2. camadas: cada bolha fica uma camada abaixo da mais baixa que liga até
+#      ela, então a história corre de cima para baixo
+#   3. ordem: dentro de cada camada as bolhas são ordenadas pelo baricentro
+#      das vizinhas, com algumas passadas para baixo e para cima, o que
+#      desfaz a maior parte dos cruzamentos
+#   4. posições: coluna e camada viram x e y; partes soltas da história
+#      ficam lado a lado
+#
+# relayout() é a versão incremental: só as bolhas indicadas (e as filhas
+# que ficariam por cima delas) ganham lugar novo, encaixadas embaixo das
+# bolhas que ligam até elas; o resto da Mesa não se mexe.
+#
+# As funções recebem e devolvem só ids e números, para rodarem em outro
+# processo (LayoutWorker) sem copiar o grafo inteiro.
+
+from collections import Counter, deque
+
+from flowstory.graph import BUBBLE_WIDTH, BUBBLE_HEIGHT
+
+COLUMN_STEP = BUBBLE_WIDTH + 40
+ROW_STEP = BUBBLE_HEIGHT + 50
+MARGIN = 40
+SWEEPS = 4
+
+
+def graph_snapshot(graph):
+    # (bolhas [(id, x, y)], ligações [(origem, destino)]) para mandar ao processo de organização
+    nodes = [(node.id, node.x, node.y) for node in graph]
+    edges = [(edge.src, edge.dst) for edge in graph.edges()]
+    return nodes, edges
+
+
+def _slot(x, y):
+    # Posição na Mesa -> (linha, coluna) da grade usada pelas duas organizações
+    return round((y - MARGIN) / ROW_STEP), round((x - MARGIN) / COLUMN_STEP)
+
+
+def _place(row, column):
+    return MARGIN + column * COLUMN_STEP, MARGIN + row * ROW_STEP
+
+
+def _acyclic(count, successors):
+    # Busca em profundidade sem recursão; ligações para quem ainda está na pilha são invertidas
+    state = [0] * count          # 0 = não visto, 1 = na pilha, 2 = terminado
+    forward = [[] for _ in range(count)]
+    for root in range(count):
+        if state[root]:
+            continue
+        state[root] = 1
+        stack = [(root, iter(successors[root]))]
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                if state[child] == 1:
+                    if child != node:
+                        forward[child].append(node)
+                elif state[child] == 0:
+                    forward[node].append(child)
+                    state[child] = 1
+                    stack.append((child, iter(successors[child])))
+                    break
+                else:
+                    forward[node].append(child)
+            else:
+                state[node] = 2
+                stack.pop()
+    return forward
+
+
+def _layers(count, forward):
+    indegree = [0] * count
+    for children in forward:
+        for child in children:
+            indegree[child] += 1
+    layer = [0] * count
+    queue = deque(node for node in range(count) if not indegree[node])
+    while queue:
+        node = queue.popleft()
+        for child in forward[node]:
+            if layer[node] + 1 > layer[child]:
+                layer[child] = layer[node] + 1
+            indegree[child] -= 1
+            if not indegree[child]:
+                queue.append(child)
+    return layer
+
+
+def _components(count, forward):
+    neighbours = [list(children) for children in forward]
+    for node, children in enumerate(forward):
+        for child in children:
+            neighbours[child].append(node)
+    component = [-1] * count
+    groups = []
+    for root in range(count):
+        if component[root] >= 0:
+            continue
+        component[root] = len(groups)
+        members = [root]
+        stack = [root]
+        while stack:
+            for other in neighbours[stack.pop()]:
+                if component[other] < 0:
+                    component[other] = len(groups)
+                    members.append(other)
+                    stack.append(other)
+        groups.append(members)
+    return groups
+
+
+def _order(members, layer, forward, backward, seed):
+    # Camadas da parte -> listas ordenadas, começando pela ordem de seed (x atual)
+    rows = {}
+    for node in sorted(members, key=seed.__getitem__):
+        rows.setdefault(layer[node], []).append(node)
+    depth = max(rows) + 1
+    rows = [rows.get(level, []) for level in range(depth)]
+    position = {}
+    for row in rows:
+        for index, node in enumerate(row):
+            position[node] = index
+
+    def sweep(levels, neighbours):
+        for level in levels:
+            row = rows[level]
+            keys = {}
+            for index, node in enumerate(row):
+                linked = neighbours[node]
+                keys[node] = (sum(position[other] for other in linked) / len(linked)
+                              if linked else index)
+            row.sort(key=keys.__getitem__)
+            for index, node in enumerate(row):
+                position[node] = index
+
+    for _ in range(SWEEPS):
+        sweep(range(1, depth), backward)
+        sweep(range(depth - 2, -1, -1), forward)
+    return rows
+
+
+def layout(nodes, edges):
+    # Organização completa -> {id: (x, y)} só das bolhas que mudam de lugar
+    ids = [node_id for node_id, _, _ in nodes]
+    index = {node_id: position for position, node_id in enumerate(ids)}
+    count = len(ids)
+    successors = [[] for _ in range(count)]
+    for src, dst in edges:
+        successors[index[src]].append(index[dst])
+    forward = _acyclic(count, successors)
+    backward = [[] for _ in range(count)]
+    for node, children in enumerate(forward):
+        for child in children:
+            backward[child].append(node)
+    layer = _layers(count, forward)
+    # A ordem de partida é a da Mesa: quem estava à esquerda tende a continuar à esquerda
+    seed = [x for _, x, _ in nodes]
+
+    moves = {}
+    left = 0
+    groups = _components(count, forward)
+    groups.sort(key=lambda members: min(seed[node] for node in members))
+    for members in groups:
+        rows = _order(members, layer, forward, backward, seed)
+        width = max(len(row) for row in rows)
+        for level, row in enumerate(rows):
+            # Camadas mais curtas ficam centralizadas embaixo das mais largas
+            shift = (width - len(row)) // 2
+            for column, node in enumerate(row):
+                x, y = _place(level, left + shift + column)
+                _, old_x, old_y = nodes[node]
+                if (x, y) != (old_x, old_y):
+                    moves[ids[node]] = (x, y)
+        left += width + 1
+    return moves
+
+
+def relayout(nodes, edges, affected):
+    # Organização incremental: só as bolhas de affected (e filhas que elas cobririam) se movem
+    where = {node_id: (x, y) for node_id, x, y in nodes}
+    parents = {}
+    children = {}
+    for src, dst in edges:
+        if src != dst:
+            parents.setdefault(dst, []).append(src)
+            children.setdefault(src, []).append(dst)
+    pending = deque(node_id for node_id in sorted(affected) if node_id in where)
+    moving = set(pending)
+    # Lugares ocupados por quem não vai se mexer, em (linha, coluna) da grade
+    taken = Counter(_slot(x, y) for node_id, (x, y) in where.items() if node_id not in moving)
+
+    moves = {}
+    placed = set()
+    waited = 0
+    while pending:
+        node_id = pending.popleft()
+        if node_id in placed:
+            continue
+        # Mãe que também vai se mexer entra antes; num laço, alguém acaba indo primeiro
+        if waited <= len(pending) and any(parent in moving and parent not in placed
+                                          for parent in parents.get(node_id, ())
+                                          if parent != node_id):
+            pending.append(node_id)
+            waited += 1
+            continue
+        waited = 0
+        placed.add(node_id)
+        above = [where[parent] for parent in parents.get(node_id, ()) if parent != node_id]
+        if above:
+            y = max(py for _, py in above) + ROW_STEP
+            x = sum(px for px, _ in above) / len(above)
+        else:
+            x, y = where[node_id]
+        row, column = _slot(x, y)
+        row = max(0, row)
+        # Primeiro lugar livre na linha, alternando direita e esquerda
+        for distance in range(len(where) + 1):
+            candidates = (column + distance, column - distance) if distance else (column,)
+            free = [slot for slot in candidates if slot >= 0 and not taken[row, slot]]
+            if free:
+                column = free[0]
+                break
+        taken[row, column] += 1
+        new = _place(row, column)
+        if new != where[node_id]:
+            moves[node_id] = new
+            where[node_id] = new
+        # Filhas que ficariam por cima da bolha que desceu entram na fila também
+        for child in children.get(node_id, ()):
+            if child not in placed and where[child][1] < new[1] + ROW_STEP:
+                if child not in moving:
+                    moving.add(child)
+                    taken[_slot(*where[child])] -= 1
+                pending.append(child)
+    return moves
+
+
+class LayoutWorker:
+    # Um processo só para organizar, criado na primeira vez; devolve concurrent.futures.Future
+
+    def __init__(self):
+        self._pool = None
+
+    def submit(self, function, *args):
+        if self._pool is None:
+            # multiprocessing só é importado aqui: a abertura do editor não paga por ele
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # spawn: o processo novo não herda as threads de rede e do diário
+            self._pool = ProcessPoolExecutor(max_workers=1,
+                                             mp_context=multiprocessing.get_context('spawn'))
+        return self._pool.submit(function, *args)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,140 @@
+# Marcação das falas no editor de texto das bolhas.
+#
+#   Ana: Bom dia!                       -> quem fala vem antes dos dois-pontos
+#   Ana [feliz]: Que surpresa!          -> expressão do personagem nesta fala
+#   Bento: Você tem {moedas} moedas.    -> variável definida num "Contexto"
+#   Clara: [baixinho] Vem comigo.       -> indicação de cena no meio da fala
+#
+# Cada linha é lida sozinha (nada passa de uma linha para a outra), então
+# uma edição só obriga a reler as linhas que ela tocou. LineStates guarda,
+# por linha, se ela ainda precisa ser relida e quantos problemas tem; o
+# editor avisa as edições com inserted()/deleted() e depois pede lotes de
+# linhas sujas com take(), começando pelas que estão na tela.
+
+import re
+from bisect import bisect_left, bisect_right, insort
+
+SPEAKER_PATTERN = re.compile(
+    r'\s*(?P<speaker>[^\s:\[\]{}][^:\[\]{}]{0,39}?)\s*(?P<cue>\[[^\]\n]*\])?\s*:')
+TOKEN_PATTERN = re.compile(r'\{(?P<variable>\w+)\}|(?P<brace>\{[^}]*\}?)|(?P<cue>\[[^\]]*\]?)')
+
+TAG_SPEAKER = 'speaker'
+TAG_CUE = 'cue'
+TAG_VARIABLE = 'variable'
+TAG_ERROR = 'error'
+TAGS = (TAG_SPEAKER, TAG_CUE, TAG_VARIABLE, TAG_ERROR)
+
+
+def tokenize(line):
+    # -> ([(início, fim, tag)], [(coluna, problema)]) com colunas dentro da linha
+    spans = []
+    problems = []
+    start = 0
+    match = SPEAKER_PATTERN.match(line)
+    if match:
+        spans.append((match.start('speaker'), match.end('speaker'), TAG_SPEAKER))
+        cue = match.group('cue')
+        if cue is not None:
+            if cue[1:-1].strip():
+                spans.append((match.start('cue'), match.end('cue'), TAG_CUE))
+            else:
+                spans.append((match.start('cue'), match.end('cue'), TAG_ERROR))
+                problems.append((match.start('cue'), "Expressão vazia"))
+        start = match.end()
+    if '{' not in line and '[' not in line:
+        return spans, problems
+    for match in TOKEN_PATTERN.finditer(line, start):
+        if match.group('variable') is not None:
+            spans.append((match.start(), match.end(), TAG_VARIABLE))
+        elif match.group('brace') is not None:
+            spans.append((match.start(), match.end(), TAG_ERROR))
+            problems.append((match.start(), "Variável mal escrita: use {nome}"))
+        elif match.group('cue').endswith(']') and len(match.group('cue')) > 2:
+            spans.append((match.start(), match.end(), TAG_CUE))
+        else:
+            spans.append((match.start(), match.end(), TAG_ERROR))
+            problems.append((match.start(), "Colchete sem fechar" if not match.group('cue').endswith(']')
+                             else "Indicação vazia"))
+    return spans, problems
+
+
+def check_text(text):
+    # Todos os problemas de um texto: [(linha a partir de 1, coluna, problema)]
+    found = []
+    for number, line in enumerate(text.split('\n'), 1):
+        for column, problem in tokenize(line)[1]:
+            found.append((number, column, problem))
+    return found
+
+
+class LineStates:
+    # Por linha (a partir de 0): precisa ser relida? quantos problemas tem?
+    # As linhas com problema ficam também numa lista ordenada, para o primeiro
+    # problema sair sem percorrer o texto todo; só uma quebra de linha nova ou
+    # apagada desloca as entradas que vêm depois dela.
+
+    def __init__(self, count=1):
+        self.dirty = bytearray(b'\1') * count
+        self.problems = [0] * count
+        self.total = 0
+        self._problem_lines = []
+
+    def __len__(self):
+        return len(self.problems)
+
+    def pending(self):
+        return self.dirty.count(1)
+
+    def _shift(self, line, amount):
+        # Linhas com problema depois de line andam amount linhas
+        lines = self._problem_lines
+        position = bisect_right(lines, line)
+        if position < len(lines):
+            lines[position:] = [number + amount for number in lines[position:]]
+
+    def inserted(self, line, added):
+        # Texto inserido a partir da linha line, com added quebras de linha novas
+        self.dirty[line] = 1
+        if added:
+            self.dirty[line + 1:line + 1] = b'\1' * added
+            self.problems[line + 1:line + 1] = [0] * added
+            self._shift(line, added)
+
+    def deleted(self, line, removed):
+        # Texto apagado a partir da linha line, levando removed quebras de linha
+        if removed:
+            gone = self.problems[line + 1:line + 1 + removed]
+            self.total -= sum(gone)
+            del self.problems[line + 1:line + 1 + removed]
+            del self.dirty[line + 1:line + 1 + removed]
+            lines = self._problem_lines
+            del lines[bisect_right(lines, line):bisect_right(lines, line + removed)]
+            self._shift(line, -removed)
+        self.dirty[line] = 1
+
+    def take(self, limit, first=0, last=None):
+        # Até limit linhas sujas, primeiro as de first..last (a parte visível); ficam limpas
+        taken = []
+        dirty = self.dirty
+        if last is None:
+            last = len(dirty) - 1
+        for low, high in ((first, last + 1), (0, len(dirty))):
+            position = dirty.find(1, low, high)
+            while position >= 0 and len(taken) < limit:
+                dirty[position] = 0
+                taken.append(position)
+                position = dirty.find(1, position + 1, high)
+        return taken
+
+    def set_problems(self, line, count):
+        old = self.problems[line]
+        self.total += count - old
+        self.problems[line] = count
+        if bool(old) != bool(count):
+            if count:
+                insort(self._problem_lines, line)
+            else:
+                del self._problem_lines[bisect_left(self._problem_lines, line)]
+
+    def first_problem(self):
+        return self._problem_lines[0] if self._problem_lines else None
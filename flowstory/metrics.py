@@ -0,0 +1,171 @@
+# Medições internas: quanto tempo os caminhos quentes do editor levam.
+#
+# Cada nome ("canvas.click", "save.flush", "search.query"...) tem um
+# histograma de latência com baldes em potências de 2 microssegundos: gravar
+# uma medida é achar o balde com bit_length() e somar 1, sem guardar as
+# amostras. METRICS é o registro do programa inteiro; timed() decora métodos
+# e METRICS.timer() mede um trecho com "with". LagMonitor mede o atraso do
+# laço do Tk: agenda um after() e anota quanto ele rodou depois da hora.
+
+import functools
+import os
+import threading
+import time
+
+BUCKETS = 32          # balde i: até 2**i µs; o último junta tudo acima de ~36 min
+LAG_INTERVAL_MS = 100
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total_us = 0
+        self.max_us = 0
+        self._lock = threading.Lock()
+
+    def record(self, microseconds):
+        microseconds = int(microseconds)
+        bucket = min(microseconds.bit_length(), BUCKETS - 1)
+        with self._lock:
+            self.counts[bucket] += 1
+            self.count += 1
+            self.total_us += microseconds
+            if microseconds > self.max_us:
+                self.max_us = microseconds
+
+    def percentile(self, fraction):
+        # Limite de cima do balde onde cai a fração pedida (estimativa, não valor exato)
+        if not self.count:
+            return 0
+        wanted = fraction * self.count
+        seen = 0
+        for bucket, amount in enumerate(self.counts):
+            seen += amount
+            if seen >= wanted:
+                return min(2 ** bucket, self.max_us)
+        return self.max_us
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self.counts)
+            count, total, largest = self.count, self.total_us, self.max_us
+        return {
+            'count': count,
+            'mean_ms': round(total / count / 1000, 3) if count else 0.0,
+            'p50_ms': self.percentile(0.5) / 1000,
+            'p90_ms': self.percentile(0.9) / 1000,
+            'p99_ms': self.percentile(0.99) / 1000,
+            'max_ms': largest / 1000,
+            'buckets_us': {2 ** bucket: amount for bucket, amount in enumerate(counts) if amount},
+        }
+
+
+class _Timer:
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.record((time.perf_counter_ns() - self.started) // 1000)
+        return False
+
+
+class Metrics:
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, LatencyHistogram())
+        return histogram
+
+    def timer(self, name):
+        return _Timer(self.histogram(name))
+
+    def record(self, name, seconds):
+        self.histogram(name).record(seconds * 1_000_000)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.counters = {}
+            self.started = time.time()
+
+    def snapshot(self):
+        return {
+            'started': self.started,
+            'taken': time.time(),
+            'pid': os.getpid(),
+            'timings': {name: histogram.snapshot()
+                        for name, histogram in sorted(self.histograms.items())},
+            'counters': dict(sorted(self.counters.items())),
+        }
+
+    def dump(self, path):
+        # Só na janela de diagnóstico e no --metrics-dump: json fica fora da abertura
+        import json
+        with open(path, 'w', encoding='utf-8') as handle:
+            json.dump(self.snapshot(), handle, ensure_ascii=False, indent=2)
+
+
+METRICS = Metrics()
+
+
+def timed(name, metrics=METRICS):
+    # @timed("canvas.click"): mede cada chamada do método decorado
+    def decorate(function):
+        histogram = metrics.histogram(name)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.record((time.perf_counter_ns() - started) // 1000)
+        return wrapper
+    return decorate
+
+
+class LagMonitor:
+    # O atraso de um after() é o tempo em que o Tk ficou ocupado sem atender eventos
+
+    def __init__(self, root, metrics=METRICS, interval=LAG_INTERVAL_MS, name='tk.lag'):
+        self.root = root
+        self.interval = interval
+        self.histogram = metrics.histogram(name)
+        self._job = None
+        self._expected = None
+
+    def start(self):
+        if self._job is None:
+            self._schedule()
+
+    def _schedule(self):
+        self._expected = time.perf_counter() + self.interval / 1000
+        self._job = self.root.after(self.interval, self._tick)
+
+    def _tick(self):
+        late = time.perf_counter() - self._expected
+        self.histogram.record(max(0.0, late) * 1_000_000)
+        self._schedule()
+
+    def stop(self):
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
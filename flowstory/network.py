@@ -0,0 +1,283 @@
+# Rede da Flow: um laço asyncio numa thread própria, longe da thread do Tk.
+#
+#   AsyncLoop       -> a thread com o laço; submit() agenda uma corrotina de qualquer thread
+#   FlowClient      -> pedidos à Flow com tempo limite, novas tentativas com espera
+#                      crescente e pedidos de leitura iguais juntados num só
+#   TkBridge        -> devolve os resultados para a thread do Tk com root.after
+#   LocalFlowServer -> servidor local que faz o papel da Flow, sobre o FlowRepository
+#
+# O protocolo é uma linha JSON de pedido e uma linha JSON de resposta por
+# conexão. Cada pedido leva um id; se a resposta se perder e o cliente tentar
+# de novo, o servidor devolve a mesma resposta em vez de publicar duas vezes,
+# mesmo que a primeira execução ainda não tenha terminado.
+
+import asyncio
+import json
+import queue
+import random
+import sys
+import threading
+import uuid
+from collections import OrderedDict
+
+DEFAULT_TIMEOUT = 5.0
+MAX_ATTEMPTS = 3
+BACKOFF_BASE = 0.2
+BACKOFF_MAX = 2.0
+POLL_MS = 30
+REPLAY_SIZE = 1024
+MAX_LINE = 16 * 1024 * 1024
+
+# Pedidos de leitura: dois iguais ao mesmo tempo viram um só na rede
+IDEMPOTENT_ACTIONS = frozenset(('list_jams', 'list_stories', 'stories', 'stories_by_author',
+                                'stories_by_category', 'chat_poll', 'chat_history'))
+
+
+class FlowError(Exception):
+    # Erro devolvido pela Flow (nick em uso, campo faltando...); não adianta tentar de novo
+    pass
+
+
+class AsyncLoop:
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name='flowstory-network', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coroutine):
+        # Devolve um concurrent.futures.Future, que qualquer thread pode consultar
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def close(self, timeout=5.0):
+        if not self.loop.is_running():
+            return
+        self.submit(self._shutdown()).result(timeout)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        self.loop.close()
+
+    async def _shutdown(self):
+        current = asyncio.current_task()
+        tasks = [task for task in asyncio.all_tasks() if task is not current]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class TkBridge:
+    # As threads de rede só enfileiram; quem chama os callbacks é o after() do Tk
+
+    def __init__(self, root, interval=POLL_MS):
+        self.root = root
+        self.interval = interval
+        self._ready = queue.Queue()
+        self._pending = 0      # futures ainda sem resposta (só a thread do Tk mexe)
+        self._job = None
+
+    def watch(self, future, on_done=None, on_error=None):
+        def finished(done):
+            self._ready.put((done, on_done, on_error))
+        self._pending += 1
+        future.add_done_callback(finished)
+        if self._job is None:
+            self._job = self.root.after(self.interval, self._drain)
+
+    def _drain(self):
+        self._job = None
+        while True:
+            try:
+                future, on_done, on_error = self._ready.get_nowait()
+            except queue.Empty:
+                break
+            self._pending -= 1
+            if future.cancelled():
+                continue
+            error = future.exception()
+            try:
+                if error is not None:
+                    if on_error is not None:
+                        on_error(error)
+                elif on_done is not None:
+                    on_done(future.result())
+            except Exception:
+                # Um callback com defeito não pode segurar as respostas que vêm depois
+                # dele; o erro vai para o relatório padrão do Tk
+                self.root.report_callback_exception(*sys.exc_info())
+        # Sem nada esperando, o Tk fica em paz até o próximo watch()
+        if self._pending > 0 and self._job is None:
+            self._job = self.root.after(self.interval, self._drain)
+
+    def stop(self):
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+
+
+class FlowClient:
+    def __init__(self, host, port, timeout=DEFAULT_TIMEOUT, attempts=MAX_ATTEMPTS):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.attempts = attempts
+        self._inflight = {}    # chave do pedido -> Future compartilhado (só no laço)
+        self.sent = 0          # pedidos que foram de fato para a rede
+
+    async def request(self, action, **payload):
+        if action not in IDEMPOTENT_ACTIONS:
+            return await self._send(action, payload)
+        key = (action, json.dumps(payload, sort_keys=True))
+        shared = self._inflight.get(key)
+        if shared is None:
+            shared = asyncio.ensure_future(self._send(action, payload))
+            self._inflight[key] = shared
+            shared.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: se um dos interessados desistir, o pedido continua para os outros
+        return await asyncio.shield(shared)
+
+    async def _send(self, action, payload):
+        message = {'id': uuid.uuid4().hex, 'action': action, 'payload': payload}
+        line = (json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8')
+        for attempt in range(self.attempts):
+            try:
+                return await asyncio.wait_for(self._exchange(line), self.timeout)
+            except asyncio.TimeoutError as error:
+                if attempt == self.attempts - 1:
+                    raise TimeoutError(f"A Flow não respondeu a {action}") from error
+            except (OSError, asyncio.IncompleteReadError):
+                if attempt == self.attempts - 1:
+                    raise
+            # Espera crescente com um pouco de sorteio, para os clientes não voltarem juntos
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+            await asyncio.sleep(delay * (0.5 + random.random() / 2))
+
+    async def _exchange(self, line):
+        self.sent += 1
+        reader, writer = await asyncio.open_connection(self.host, self.port, limit=MAX_LINE)
+        try:
+            writer.write(line)
+            await writer.drain()
+            response = json.loads(await reader.readuntil(b'\n'))
+        finally:
+            writer.close()
+        if not response.get('ok'):
+            raise FlowError(response.get('error', "Erro desconhecido na Flow"))
+        return response.get('result')
+
+
+class LocalFlowServer:
+    # Faz o papel da Flow na própria máquina, guardando tudo no FlowRepository
+
+    def __init__(self, repository, host='127.0.0.1', port=0):
+        self.repository = repository
+        self.host = host
+        self.port = port
+        self.chat = []          # (id, nick, mensagem)
+        self._server = None
+        self._replies = OrderedDict()   # id do pedido -> Future da resposta (pronta ou ainda rodando)
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port,
+                                                  limit=MAX_LINE)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        try:
+            message = json.loads(await reader.readuntil(b'\n'))
+            request_id = message.get('id')
+            pending = self._replies.get(request_id) if request_id is not None else None
+            if pending is None:
+                # Guardado antes de rodar: uma nova tentativa que chegue durante uma
+                # gravação lenta espera por esta mesma execução em vez de repetir a ação
+                pending = asyncio.ensure_future(
+                    self._dispatch(message.get('action'), message.get('payload') or {}))
+                if request_id is not None:
+                    self._replies[request_id] = pending
+                    if len(self._replies) > REPLAY_SIZE:
+                        self._replies.popitem(last=False)
+            # shield: a conexão que desiste não cancela a ação para as outras tentativas
+            reply = await asyncio.shield(pending)
+            writer.write((json.dumps(reply, ensure_ascii=False) + '\n').encode('utf-8'))
+            await writer.drain()
+        except (OSError, ValueError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, action, payload):
+        handler = getattr(self, 'do_' + str(action), None)
+        if handler is None:
+            return {'ok': False, 'error': f"Ação desconhecida: {action}"}
+        try:
+            result = await handler(**payload)
+        except (ValueError, TypeError, KeyError) as error:
+            return {'ok': False, 'error': str(error)}
+        except Exception as error:
+            # sqlite3.Error e afins: responde com erro em vez de derrubar a conexão
+            # (o cliente tentaria de novo uma ação que pode já ter sido feita)
+            return {'ok': False, 'error': f"Erro interno da Flow: {error}"}
+        return {'ok': True, 'result': result}
+
+    async def _call(self, function, *args):
+        # O banco é síncrono: roda nas threads do repositório, não no laço
+        return await asyncio.wrap_future(self.repository.submit(function, *args))
+
+    async def do_login(self, nick, password):
+        user = await self._call(self.repository.authenticate, nick, password)
+        if user is None:
+            raise ValueError("Nick ou senha incorretos")
+        return user
+
+    async def do_create_account(self, nick, password, email):
+        return await self._call(self.repository.create_user, nick, password, email)
+
+    async def do_update_profile(self, nick, new_nick, bio):
+        await self._call(self.repository.update_profile, nick, new_nick, bio)
+
+    async def do_publish_story(self, story):
+        await self._call(self.repository.publish_story, story)
+
+    async def do_post_update(self, nick, text):
+        self.repository.post_update(nick, text)
+
+    async def do_list_jams(self, text='', order='recent', limit=50, offset=0):
+        return await self._call(self.repository.list_jams, text, order, limit, offset)
+
+    async def do_join_jam(self, jam_id, nick):
+        return await self._call(self.repository.join_jam, jam_id, nick)
+
+    async def do_stories(self, after=0, limit=1000):
+        return await self._call(self.repository.stories_page, after, limit)
+
+    async def do_list_stories(self, author=None, category=None, text='', order='recent',
+                              limit=50, offset=0):
+        return await self._call(self.repository.list_stories, author, category, text, order,
+                                limit, offset)
+
+    async def do_stories_by_author(self, author):
+        return await self._call(self.repository.stories_by_author, author)
+
+    async def do_stories_by_category(self, category, limit=20, offset=0):
+        return await self._call(self.repository.stories_by_category, category, limit, offset)
+
+    async def do_chat_send(self, nick, text):
+        message_id = len(self.chat) + 1
+        self.chat.append((message_id, nick, text))
+        return message_id
+
+    async def do_chat_poll(self, since=0, limit=500):
+        # Os ids são a posição na lista + 1
+        return self.chat[since:since + limit]
+
+    async def do_chat_history(self, before=None, limit=50):
+        end = len(self.chat) if before is None else max(0, before - 1)
+        return self.chat[max(0, end - limit):end]
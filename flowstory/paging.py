@@ -0,0 +1,88 @@
+# Fonte de dados paginada para listas longas (Minha Banca, Jams).
+#
+# A lista na tela só pergunta "qual é a linha i?". Se a página dessa linha
+# ainda não chegou, a fonte pede a página ao carregador e devolve None (a
+# linha mostra "Carregando..."); quando a página chega, on_change() avisa
+# para redesenhar. Só as últimas páginas usadas ficam na memória. Trocar a
+# ordem ou o filtro começa uma nova geração: respostas atrasadas da geração
+# anterior são ignoradas.
+
+from collections import OrderedDict
+
+PAGE_ROWS = 50
+MAX_PAGES = 20
+
+
+class PagedSource:
+    # loader(ordem, filtro, início, quantidade, pronto, falhou) -> chama pronto({'total', 'rows'})
+    # ou falhou(erro); a página que falhou pode ser pedida de novo
+
+    def __init__(self, loader, on_change=None, page_rows=PAGE_ROWS, max_pages=MAX_PAGES,
+                 order='recent', text=''):
+        self.loader = loader
+        self.on_change = on_change
+        self.page_rows = page_rows
+        self.max_pages = max_pages
+        self.order = order
+        self.text = text
+        self.total = None          # None até a primeira página chegar
+        self.generation = 0
+        self._pages = OrderedDict()   # número da página -> linhas
+        self._loading = set()
+
+    def __len__(self):
+        return self.total or 0
+
+    def set_query(self, order=None, text=None):
+        if order is not None:
+            self.order = order
+        if text is not None:
+            self.text = text
+        self.reload()
+
+    def reload(self):
+        self.generation += 1
+        self.total = None
+        self._pages.clear()
+        self._loading.clear()
+        self._request(0)
+
+    def row(self, index):
+        page, position = divmod(index, self.page_rows)
+        rows = self._pages.get(page)
+        if rows is None:
+            self._request(page)
+            return None
+        self._pages.move_to_end(page)
+        return rows[position] if position < len(rows) else None
+
+    def prefetch(self, first, last):
+        # Pede de uma vez as páginas que cobrem as linhas first..last
+        for page in range(first // self.page_rows, last // self.page_rows + 1):
+            if page not in self._pages:
+                self._request(page)
+
+    def _request(self, page):
+        if page in self._loading:
+            return
+        if self.total is not None and page * self.page_rows >= self.total:
+            return
+        self._loading.add(page)
+        generation = self.generation
+
+        def ready(result):
+            if generation != self.generation:
+                return
+            self._loading.discard(page)
+            self.total = result['total']
+            self._pages[page] = result['rows']
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+            if self.on_change is not None:
+                self.on_change()
+
+        def failed(error=None):
+            if generation == self.generation:
+                self._loading.discard(page)
+
+        self.loader(self.order, self.text, page * self.page_rows, self.page_rows, ready, failed)
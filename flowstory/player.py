@@ -0,0 +1,457 @@
+# Jogo compilado: a história vira uma tabela de cenas compacta para o navegador.
+#
+# Cada capítulo é compilado pelo runtime.compile_story (saltos já resolvidos)
+# e empacotado em JSON sem espaços:
+#
+#   s     -> textos sem repetição (falas, nomes de personagens, cenários...)
+#   t     -> 5 inteiros por instrução: código, a, b, próxima, alternativa
+#            (a e b são índices em s, ou o número que a instrução usa)
+#   r     -> escolhas: quantidade, depois pares (texto, destino); a instrução
+#            de escolha guarda em "a" onde a sua começa
+#   x     -> condições e atribuições em notação pós-fixa
+#   start -> primeira instrução
+#
+# O pacote .zip traz index.html, story.js (lista de capítulos) e um arquivo
+# por capítulo em chapters/. O jogo carrega só o primeiro capítulo para
+# começar e pede o seguinte enquanto o atual está sendo jogado.
+#
+# Capítulos iguais aos da última exportação não são recompilados: a tabela
+# fica num cache em disco, com a chave tirada do conteúdo (posições das
+# bolhas na Mesa não contam).
+
+import ast
+import hashlib
+import json
+import os
+import zipfile
+
+from flowstory.graph import StoryGraph
+from flowstory.journal import JOURNAL_SUFFIX, load_project, wait_closed
+from flowstory.runtime import (compile_story, StoryError, END, OP_LINE, OP_SHOW, OP_HIDE,
+                               OP_MOVE, OP_EXPRESSION, OP_BACKGROUND, OP_SCENE, OP_CHAPTER,
+                               OP_FOCUS, OP_WAIT, OP_TRANSITION, OP_IF, OP_SET, OP_CHOICE,
+                               OP_END, OP_NOP)
+from flowstory.export import (CHUNK_SIZE, ExportJob, _Progress, _finish, copy_assets, snapshot,
+                              zip_entry)
+
+TABLE_VERSION = 2
+CACHE_FILES = 256
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+_BINARY_SYMBOLS = {
+    ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.Div: '/', ast.FloorDiv: '//', ast.Mod: '%',
+}
+_COMPARE_SYMBOLS = {
+    ast.Eq: '==', ast.NotEq: '!=', ast.Lt: '<', ast.LtE: '<=', ast.Gt: '>', ast.GtE: '>=',
+}
+_CONSTANTS = {'verdadeiro': True, 'falso': False, 'true': True, 'false': False}
+
+
+# Expressões em notação pós-fixa ---------------------------------------------
+
+def expression_rpn(source):
+    # Mesmas regras do runtime.compile_expression, mas em lista para o jogo avaliar numa pilha
+    source = source.strip()
+    if not source:
+        return [['c', True]]
+    try:
+        tree = ast.parse(source, mode='eval')
+    except SyntaxError as error:
+        raise StoryError(f"Expressão inválida: {source}") from error
+    out = []
+    _rpn(tree.body, source, out)
+    return out
+
+
+def _rpn(node, source, out):
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str, bool)):
+        out.append(['c', node.value])
+    elif isinstance(node, ast.Name):
+        if node.id.lower() in _CONSTANTS:
+            out.append(['c', _CONSTANTS[node.id.lower()]])
+        else:
+            out.append(['v', node.id])
+    elif isinstance(node, ast.BoolOp):
+        symbol = '&&' if isinstance(node.op, ast.And) else '||'
+        _rpn(node.values[0], source, out)
+        for value in node.values[1:]:
+            _rpn(value, source, out)
+            out.append([symbol])
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.USub)):
+        _rpn(node.operand, source, out)
+        out.append(['!' if isinstance(node.op, ast.Not) else '~'])
+    elif isinstance(node, ast.BinOp) and type(node.op) in _BINARY_SYMBOLS:
+        _rpn(node.left, source, out)
+        _rpn(node.right, source, out)
+        out.append([_BINARY_SYMBOLS[type(node.op)]])
+    elif isinstance(node, ast.Compare) and all(type(op) in _COMPARE_SYMBOLS for op in node.ops):
+        # a < b < c vira (a < b) && (b < c)
+        left = node.left
+        for position, (op, right) in enumerate(zip(node.ops, node.comparators)):
+            _rpn(left, source, out)
+            _rpn(right, source, out)
+            out.append([_COMPARE_SYMBOLS[type(op)]])
+            if position:
+                out.append(['&&'])
+            left = right
+    else:
+        raise StoryError(f"Expressão não suportada: {source}")
+
+
+def assignments_rpn(text):
+    # "Contexto": [[nome, '+', '-' ou '=', expressão], ...], como runtime.compile_assignments
+    assignments = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        for symbol in ('+=', '-=', '='):
+            name, found, expression = line.partition(symbol)
+            if found and name.strip().isidentifier():
+                assignments.append([name.strip(), symbol[0], expression_rpn(expression)])
+                break
+        else:
+            raise StoryError(f"Atribuição inválida: {line}")
+    return assignments
+
+
+# Tabela de cenas ------------------------------------------------------------
+
+def pack_story(graph):
+    # Grafo -> dicionário da tabela de cenas de um capítulo
+    program = compile_story(graph)
+    strings = {}
+
+    def intern(text):
+        index = strings.get(text)
+        if index is None:
+            index = strings[text] = len(strings)
+        return index
+
+    table = []
+    routes = []
+    conditions = []
+    for position, (op, arg, forward, alternative) in enumerate(program.code):
+        a = b = 0
+        if op == OP_LINE:
+            # A expressão da fala ("Ana [feliz]: ...") não aparece no jogo do navegador
+            a, b = intern(arg[0]), intern(arg[1])
+        elif op in (OP_MOVE, OP_EXPRESSION):
+            a, b = intern(arg[0]), intern(arg[1])
+        elif op == OP_WAIT:
+            a = int(round(arg * 1000))
+        elif op in (OP_IF, OP_SET):
+            # As funções compiladas não vão para o jogo: a condição sai de novo do texto da bolha
+            text = graph.nodes[program.node_ids[position]].text
+            a = len(conditions)
+            conditions.append(expression_rpn(text) if op == OP_IF else assignments_rpn(text))
+        elif op == OP_CHOICE:
+            a = len(routes)
+            routes.append(len(arg))
+            for label, target in zip(arg, alternative):
+                routes.extend((intern(label), target))
+            alternative = END
+        elif op in (OP_SHOW, OP_HIDE, OP_FOCUS, OP_BACKGROUND, OP_SCENE, OP_CHAPTER,
+                    OP_TRANSITION, OP_NOP):
+            a = intern(arg)
+        table.extend((op, a, b, forward, alternative))
+    return {
+        'v': TABLE_VERSION,
+        's': list(strings),
+        't': table,
+        'r': routes,
+        'x': conditions,
+        'start': program.start,
+    }
+
+
+def content_key(nodes, edges):
+    # Chave do cache: só o que muda o jogo (tipo, texto e ligações), não a posição na Mesa.
+    # Sem ordenar: a ordem do grafo só muda com desfazer/refazer, e aí o cache só erra uma vez
+    text = _encoder.encode([
+        TABLE_VERSION,
+        [node[:3] for node in nodes],
+        edges,
+    ])
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def file_key(path):
+    # Capítulo no disco: o conteúdo dos arquivos já basta, sem ler o grafo
+    digest = hashlib.sha1(f"flowstory-file-{TABLE_VERSION}\n".encode('utf-8'))
+    for name in (path, path + JOURNAL_SUFFIX):
+        try:
+            with open(name, 'rb') as handle:
+                for chunk in iter(lambda: handle.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+        except FileNotFoundError:
+            pass
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class SceneCache:
+    # Tabelas já compiladas, um arquivo por chave; os mais antigos saem quando passa do limite
+
+    def __init__(self, directory, max_files=CACHE_FILES):
+        self.directory = directory
+        self.max_files = max_files
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as handle:
+                text = handle.read()
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Marca como usado, para a limpeza não levar o que acabou de servir
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+        return text
+
+    def put(self, key, text):
+        os.makedirs(self.directory, exist_ok=True)
+        # Nome temporário por processo: a exportação em lote grava o cache em paralelo
+        tmp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as handle:
+            handle.write(text)
+        os.replace(tmp_path, self._path(key))
+        self._trim()
+
+    def _trim(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json'):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    continue
+        if len(entries) <= self.max_files:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.max_files]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+# Capítulos de entrada --------------------------------------------------------
+
+def chapter_from_graph(title, graph):
+    # Capítulo aberto no editor: copia o conteúdo agora, na thread do Tk
+    return (title, 'graph', snapshot(graph))
+
+
+def chapter_from_file(title, path):
+    # Capítulo fechado de uma websérie: lido do disco só se não estiver no cache
+    return (title, 'file', path)
+
+
+def _graph_from_snapshot(nodes, edges):
+    graph = StoryGraph()
+    for node_id, kind, text, x, y, chapter in nodes:
+        graph.add_node(kind, text, x, y, chapter, node_id=node_id)
+    for src, dst, label in edges:
+        if src in graph and dst in graph:
+            graph.connect(src, dst, label)
+    return graph
+
+
+def compile_chapter(chapter, cache=None):
+    # -> (texto JSON da tabela, veio do cache?)
+    title, kind, source = chapter
+    if kind == 'graph':
+        nodes, edges, _ = source
+        key = content_key(nodes, edges)
+    else:
+        # Capítulo descarregado há pouco: o diário dele pode ainda estar gravando
+        wait_closed(source)
+        key = file_key(source)
+    if cache is not None:
+        text = cache.get(key)
+        if text is not None:
+            return text, True
+    if kind == 'graph':
+        graph = _graph_from_snapshot(nodes, edges)
+    else:
+        _, graph = load_project(source)
+    text = _encoder.encode(pack_story(graph))
+    if cache is not None:
+        cache.put(key, text)
+    return text, False
+
+
+def export_player(path, project, chapters, assets=(), cache_dir=None, progress=None, cancel=None):
+    # chapters: saídas de chapter_from_graph / chapter_from_file, na ordem do jogo
+    assets = list(assets)
+    cache = SceneCache(cache_dir) if cache_dir else None
+    asset_chunks = sum(os.path.getsize(source) // CHUNK_SIZE + 1 for _, source in assets)
+    tracker = _Progress(len(chapters) + 1 + asset_chunks, progress, cancel)
+    tmp_path = path + '.part'
+
+    def work():
+        with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as bundle:
+            manifest = []
+            for number, chapter in enumerate(chapters):
+                text, _ = compile_chapter(chapter, cache)
+                name = f"chapters/{number + 1:04d}.js"
+                bundle.writestr(zip_entry(name), f"FLOWSTORY_CHAPTER({number},{text});\n")
+                manifest.append({'title': chapter[0], 'file': name})
+                tracker.advance(message=f"Compilando {chapter[0]}")
+            game = {'title': project.get('title') or "FlowStory", 'chapters': manifest}
+            bundle.writestr(zip_entry('story.js'), f"window.FLOWSTORY_GAME={_encoder.encode(game)};\n")
+            bundle.writestr(zip_entry('index.html'), PLAYER_HTML)
+            copy_assets(bundle, assets, tracker)
+
+    _finish(tmp_path, path, work)
+    if progress is not None:
+        progress(1.0, "Exportação concluída")
+    return cache
+
+
+class PlayerExportJob(ExportJob):
+    # Igual ao ExportJob, mas monta o jogo compilado a partir de vários capítulos
+
+    def __init__(self, path, project, chapters, assets=(), cache_dir=None):
+        self._setup(path)
+        self._start(export_player, path, project, list(chapters), list(assets), cache_dir)
+
+
+PLAYER_JS = """(function () {
+  var game = window.FLOWSTORY_GAME, tables = {}, waiting = {};
+  var LINE = %(OP_LINE)d, SHOW = %(OP_SHOW)d, HIDE = %(OP_HIDE)d, BACKGROUND = %(OP_BACKGROUND)d,
+      SCENE = %(OP_SCENE)d, CHAPTER = %(OP_CHAPTER)d, IF = %(OP_IF)d, SET = %(OP_SET)d,
+      CHOICE = %(OP_CHOICE)d, END = %(OP_END)d;
+  var OPS = {
+    '+': function (a, b) { return a + b; }, '-': function (a, b) { return a - b; },
+    '*': function (a, b) { return a * b; }, '/': function (a, b) { return a / b; },
+    '//': function (a, b) { return Math.floor(a / b); },
+    '%%': function (a, b) { return ((a %% b) + b) %% b; },
+    '==': function (a, b) { return a === b; }, '!=': function (a, b) { return a !== b; },
+    '<': function (a, b) { return a < b; }, '<=': function (a, b) { return a <= b; },
+    '>': function (a, b) { return a > b; }, '>=': function (a, b) { return a >= b; },
+    '&&': function (a, b) { return a && b; }, '||': function (a, b) { return a || b; }
+  };
+  window.FLOWSTORY_CHAPTER = function (n, table) {
+    tables[n] = table;
+    var done = waiting[n];
+    delete waiting[n];
+    if (done) done(table);
+  };
+  function load(n, done) {
+    if (tables[n]) { if (done) done(tables[n]); return; }
+    if (n in waiting) {
+      var before = waiting[n];
+      waiting[n] = function (t) { if (before) before(t); if (done) done(t); };
+      return;
+    }
+    waiting[n] = done;
+    var script = document.createElement('script');
+    script.src = game.chapters[n].file;
+    document.head.appendChild(script);
+  }
+  var $ = function (id) { return document.getElementById(id); }, next = $('next');
+  var vars = {}, people = {}, chapter = -1, s, c, r, x, pc = -1;
+  function show(speaker, text) { $('speaker').textContent = speaker; $('line').textContent = text; }
+  function evaluate(rpn) {
+    var stack = [];
+    for (var i = 0; i < rpn.length; i++) {
+      var token = rpn[i], b;
+      if (token[0] === 'c') stack.push(token[1]);
+      else if (token[0] === 'v') stack.push(token[1] in vars ? vars[token[1]] : 0);
+      else if (token[0] === '!') stack.push(!stack.pop());
+      else if (token[0] === '~') stack.push(-stack.pop());
+      else { b = stack.pop(); stack.push(OPS[token[0]](stack.pop(), b)); }
+    }
+    return stack.pop();
+  }
+  function fill(text) {
+    if (text.indexOf('{') < 0) return text;
+    return text.replace(/\\{(\\w+)\\}/g, function (m, name) { return name in vars ? String(vars[name]) : ''; });
+  }
+  function finish() { show('', '— Fim —'); next.disabled = true; pc = -1; }
+  function begin(n, table) {
+    chapter = n; s = table.s; c = table.t; r = table.r; x = table.x; pc = table.start;
+    if (n + 1 < game.chapters.length) load(n + 1);
+  }
+  function nextChapter() {
+    if (chapter + 1 >= game.chapters.length) return finish();
+    next.disabled = true;
+    load(chapter + 1, function (table) { begin(chapter + 1, table); next.disabled = false; step(); });
+  }
+  function step() {
+    var choices = $('choices');
+    choices.innerHTML = '';
+    for (var silent = 0; silent < 1000000; silent++) {
+      if (pc < 0) return nextChapter();
+      var i = pc * 5, op = c[i], a = c[i + 1], b = c[i + 2];
+      pc = c[i + 3];
+      if (op === LINE) { show(s[a], fill(s[b])); return; }
+      if (op === IF) { if (!evaluate(x[a])) pc = c[i + 4]; continue; }
+      if (op === SET) {
+        x[a].forEach(function (item) {
+          var value = evaluate(item[2]), old = item[0] in vars ? vars[item[0]] : 0;
+          vars[item[0]] = item[1] === '+' ? old + value : item[1] === '-' ? old - value : value;
+        });
+        continue;
+      }
+      if (op === CHOICE) {
+        next.disabled = true;
+        for (var k = 0; k < r[a]; k++) {
+          (function (label, target) {
+            var button = document.createElement('button');
+            button.textContent = label;
+            button.onclick = function () { pc = target; next.disabled = false; step(); };
+            choices.appendChild(button);
+          })(s[r[a + 1 + 2 * k]], r[a + 2 + 2 * k]);
+        }
+        return;
+      }
+      if (op === SHOW) people[s[a]] = true;
+      else if (op === HIDE) delete people[s[a]];
+      else if (op === BACKGROUND || op === SCENE) $('scene').textContent = s[a];
+      else if (op === CHAPTER) { show('', s[a]); return; }
+      else if (op === END) return finish();
+      $('people').textContent = Object.keys(people).join(' · ');
+    }
+    show('', 'A história ficou presa num laço sem nenhum evento');
+    next.disabled = true;
+  }
+  next.onclick = step;
+  load(0, function (table) { begin(0, table); step(); });
+})();
+""" % {name: value for name, value in globals().items() if name.startswith('OP_')}
+
+PLAYER_HTML = """<!DOCTYPE html>
+<html lang="pt-br">
+<head>
+<meta charset="UTF-8">
+<title>FlowStory</title>
+<style>
+body { font-family: Arial, sans-serif; background: #f5f0ff; margin: 0; }
+#stage { max-width: 720px; margin: 40px auto; background: white; border-radius: 12px; padding: 24px; }
+#scene, #people { color: #9370db; font-size: 13px; min-height: 16px; }
+#line { min-height: 80px; font-size: 18px; }
+#speaker { color: #6a5acd; font-weight: bold; }
+button { background: #d8bfd8; border: none; border-radius: 8px; padding: 8px 16px; margin: 4px; cursor: pointer; }
+</style>
+</head>
+<body>
+<div id="stage"><div id="scene"></div><div id="people"></div><div id="speaker"></div>
+<div id="line"></div><div id="choices"></div><button id="next">Avançar ▶</button></div>
+<script src="story.js"></script>
+<script>
+""" + PLAYER_JS + """</script>
+</body>
+</html>
+"""
@@ -0,0 +1,304 @@
+# Desenho da Mesa de Trabalho só com o que está na tela.
+#
+# Em vez de um oval e um texto permanentes por bolha, o renderizador cria
+# itens apenas para as bolhas dentro (ou perto) da área visível e devolve os
+# itens de quem saiu da tela para uma reserva, de onde são reaproveitados.
+# Com zoom baixo as bolhas viram retângulos simples, sem texto nem setas.
+
+from flowstory.graph import BUBBLE_WIDTH, BUBBLE_HEIGHT
+from flowstory.metrics import timed
+
+BUBBLE_COLOR = '#ffd8b1'
+EDGE_COLOR = '#9370db'
+SELECTED_COLOR = '#6a5acd'
+
+MIN_SCALE = 0.1
+MAX_SCALE = 3.0
+
+# Níveis de detalhe
+LOD_FULL = 2     # oval + texto + setas
+LOD_SHAPES = 1   # oval + setas, sem texto
+LOD_BLOCKS = 0   # só retângulos
+LOD_SHAPES_SCALE = 0.6
+LOD_BLOCKS_SCALE = 0.3
+
+# Folga em volta da tela (em pixels) para o arraste não mostrar bordas vazias
+VIEW_MARGIN = 200
+MIN_EXTENT = 1000
+
+
+def scan_query(graph):
+    # Consulta sem índice: percorre todas as bolhas
+    def query(x1, y1, x2, y2):
+        return [node.id for node in graph
+                if node.x < x2 and node.x + BUBBLE_WIDTH > x1
+                and node.y < y2 and node.y + BUBBLE_HEIGHT > y1]
+    return query
+
+
+class BubbleRenderer:
+    def __init__(self, canvas, graph, query=None):
+        self.canvas = canvas
+        self.graph = graph
+        self.query = query or scan_query(graph)
+        self.scale = 1.0
+        self.selected = set()
+
+        self.node_items = {}   # id da bolha -> itens do canvas
+        self.edge_items = {}   # aresta -> linha
+        self.item_nodes = {}   # item do canvas -> id da bolha
+        self._free = {'oval': [], 'text': [], 'rectangle': [], 'line': []}
+        self._dirty = set()
+        self._lod = self.level()
+        self._job = None
+        self.extent = [MIN_EXTENT, MIN_EXTENT]
+        self._extent_changed = False
+
+        graph.listeners.append(self.on_graph_event)
+        # Grafo que já chega com bolhas (capítulo lido do disco)
+        if len(graph):
+            for node in graph:
+                self._grow_extent(node)
+            self.update_scrollregion()
+            self.schedule()
+
+    # Coordenadas ------------------------------------------------------------
+
+    def level(self):
+        if self.scale < LOD_BLOCKS_SCALE:
+            return LOD_BLOCKS
+        if self.scale < LOD_SHAPES_SCALE:
+            return LOD_SHAPES
+        return LOD_FULL
+
+    def to_world(self, x, y):
+        # Posição de um evento do mouse -> coordenadas da história
+        return (self.canvas.canvasx(x) / self.scale, self.canvas.canvasy(y) / self.scale)
+
+    def viewport(self, margin=VIEW_MARGIN):
+        left = self.canvas.canvasx(0) - margin
+        top = self.canvas.canvasy(0) - margin
+        right = left + self.canvas.winfo_width() + 2 * margin
+        bottom = top + self.canvas.winfo_height() + 2 * margin
+        return (left / self.scale, top / self.scale, right / self.scale, bottom / self.scale)
+
+    def _grow_extent(self, node):
+        grew = False
+        if node.x + BUBBLE_WIDTH + VIEW_MARGIN > self.extent[0]:
+            self.extent[0] = node.x + BUBBLE_WIDTH + VIEW_MARGIN
+            grew = True
+        if node.y + BUBBLE_HEIGHT + VIEW_MARGIN > self.extent[1]:
+            self.extent[1] = node.y + BUBBLE_HEIGHT + VIEW_MARGIN
+            grew = True
+        return grew
+
+    def update_scrollregion(self):
+        self.canvas.configure(scrollregion=(0, 0, self.extent[0] * self.scale,
+                                            self.extent[1] * self.scale))
+
+    # Rolagem e zoom ---------------------------------------------------------
+
+    def xview(self, *args):
+        self.canvas.xview(*args)
+        self.schedule()
+
+    def yview(self, *args):
+        self.canvas.yview(*args)
+        self.schedule()
+
+    def set_scale(self, scale):
+        scale = min(MAX_SCALE, max(MIN_SCALE, scale))
+        if scale == self.scale:
+            return
+        # Manter o centro da tela no mesmo ponto da história
+        left, top, right, bottom = self.viewport(margin=0)
+        center_x = (left + right) / 2
+        center_y = (top + bottom) / 2
+        self.scale = scale
+        self.release_all()
+        self.update_scrollregion()
+        width = self.extent[0] * scale
+        height = self.extent[1] * scale
+        self.canvas.xview_moveto(max(0, center_x * scale - self.canvas.winfo_width() / 2) / width)
+        self.canvas.yview_moveto(max(0, center_y * scale - self.canvas.winfo_height() / 2) / height)
+        self.refresh()
+
+    def set_selection(self, node_ids):
+        changed = self.selected.symmetric_difference(node_ids)
+        self.selected = set(node_ids)
+        for node_id in changed:
+            items = self.node_items.get(node_id)
+            if items is not None:
+                self._style_node(node_id, items[0])
+
+    # Eventos do grafo -------------------------------------------------------
+
+    def on_graph_event(self, event, *args):
+        if event == 'remove':
+            node, edges = args
+            self._release_node(node.id)
+            for edge in edges:
+                self._release_edge(edge)
+            self.selected.discard(node.id)
+        elif event == 'disconnect':
+            self._release_edge(args[0])
+        elif event == 'clear':
+            self.canvas.delete('all')
+            self.node_items.clear()
+            self.edge_items.clear()
+            self.item_nodes.clear()
+            for pool in self._free.values():
+                pool.clear()
+            self._dirty.clear()
+            self.selected.clear()
+            self.extent = [MIN_EXTENT, MIN_EXTENT]
+            self.update_scrollregion()
+            return
+        elif event in ('add', 'move', 'text'):
+            node = args[0]
+            self._dirty.add(node.id)
+            # A área de rolagem é ajustada uma vez só no próximo refresh()
+            if self._grow_extent(node):
+                self._extent_changed = True
+        elif event == 'connect':
+            self._dirty.add(args[0].src)
+        self.schedule()
+
+    # Desenho ----------------------------------------------------------------
+
+    def schedule(self):
+        # Várias mudanças seguidas viram um único redesenho quando o Tk ficar livre
+        if self._job is None:
+            self._job = self.canvas.after_idle(self.refresh)
+
+    @timed('render.refresh')
+    def refresh(self):
+        if self._job is not None:
+            self.canvas.after_cancel(self._job)
+            self._job = None
+        if self._extent_changed:
+            self._extent_changed = False
+            self.update_scrollregion()
+
+        lod = self.level()
+        if lod != self._lod:
+            self.release_all()
+            self._lod = lod
+
+        wanted = set(self.query(*self.viewport()))
+        for node_id in [n for n in self.node_items if n not in wanted]:
+            self._release_node(node_id)
+
+        dirty = self._dirty
+        for node_id in wanted:
+            node = self.graph.get(node_id)
+            items = self.node_items.get(node_id)
+            if items is None:
+                self._acquire_node(node)
+            elif node_id in dirty:
+                self._place_node(node, items)
+
+        if lod == LOD_BLOCKS:
+            for edge in list(self.edge_items):
+                self._release_edge(edge)
+        else:
+            wanted_edges = set()
+            for node_id in wanted:
+                wanted_edges.update(self.graph.out_edges(node_id))
+                wanted_edges.update(self.graph.in_edges(node_id))
+            for edge in [e for e in self.edge_items if e not in wanted_edges]:
+                self._release_edge(edge)
+            for edge in wanted_edges:
+                line_id = self.edge_items.get(edge)
+                if line_id is None:
+                    self._acquire_edge(edge)
+                elif edge.src in dirty or edge.dst in dirty:
+                    self.canvas.coords(line_id, *self._edge_coords(edge))
+
+        self._dirty = set()
+
+    def detach(self):
+        # Larga o grafo e o canvas (ao trocar de capítulo); o dono apaga os itens
+        if self._job is not None:
+            self.canvas.after_cancel(self._job)
+            self._job = None
+        if self.on_graph_event in self.graph.listeners:
+            self.graph.listeners.remove(self.on_graph_event)
+
+    def release_all(self):
+        for node_id in list(self.node_items):
+            self._release_node(node_id)
+        for edge in list(self.edge_items):
+            self._release_edge(edge)
+
+    def _take(self, kind, *coords, **options):
+        # Reaproveita um item escondido; só cria um novo se a reserva estiver vazia
+        pool = self._free[kind]
+        if pool:
+            item = pool.pop()
+            self.canvas.coords(item, *coords)
+            self.canvas.itemconfigure(item, state='normal', **options)
+            return item
+        return getattr(self.canvas, 'create_' + kind)(*coords, **options)
+
+    def _give_back(self, kind, item):
+        self.canvas.itemconfigure(item, state='hidden')
+        self._free[kind].append(item)
+
+    def _node_coords(self, node):
+        s = self.scale
+        return (node.x * s, node.y * s, (node.x + BUBBLE_WIDTH) * s, (node.y + BUBBLE_HEIGHT) * s)
+
+    def _edge_coords(self, edge):
+        src = self.graph.get(edge.src)
+        dst = self.graph.get(edge.dst)
+        s = self.scale
+        return ((src.x + BUBBLE_WIDTH / 2) * s, (src.y + BUBBLE_HEIGHT) * s,
+                (dst.x + BUBBLE_WIDTH / 2) * s, dst.y * s)
+
+    def _style_node(self, node_id, shape):
+        if node_id in self.selected:
+            self.canvas.itemconfigure(shape, outline=SELECTED_COLOR, width=3)
+        else:
+            self.canvas.itemconfigure(shape, outline='black', width=1)
+
+    def _acquire_node(self, node):
+        x1, y1, x2, y2 = self._node_coords(node)
+        if self._lod == LOD_BLOCKS:
+            items = (self._take('rectangle', x1, y1, x2, y2, fill=BUBBLE_COLOR, tags=('bubble',)),)
+        elif self._lod == LOD_SHAPES:
+            items = (self._take('oval', x1, y1, x2, y2, fill=BUBBLE_COLOR, tags=('bubble',)),)
+        else:
+            items = (self._take('oval', x1, y1, x2, y2, fill=BUBBLE_COLOR, tags=('bubble',)),
+                     self._take('text', (x1 + x2) / 2, (y1 + y2) / 2, text=node.kind, tags=('bubble',)))
+        self.node_items[node.id] = items
+        for item in items:
+            self.item_nodes[item] = node.id
+        self._style_node(node.id, items[0])
+
+    def _place_node(self, node, items):
+        x1, y1, x2, y2 = self._node_coords(node)
+        self.canvas.coords(items[0], x1, y1, x2, y2)
+        if len(items) > 1:
+            self.canvas.coords(items[1], (x1 + x2) / 2, (y1 + y2) / 2)
+            self.canvas.itemconfigure(items[1], text=node.kind)
+
+    def _release_node(self, node_id):
+        items = self.node_items.pop(node_id, None)
+        if items is None:
+            return
+        kinds = ('rectangle',) if self._lod == LOD_BLOCKS else ('oval', 'text')
+        for kind, item in zip(kinds, items):
+            self.item_nodes.pop(item, None)
+            self._give_back(kind, item)
+
+    def _acquire_edge(self, edge):
+        line_id = self._take('line', *self._edge_coords(edge), arrow='last',
+                             fill=EDGE_COLOR, tags=('edge',))
+        self.canvas.tag_lower(line_id)
+        self.edge_items[edge] = line_id
+
+    def _release_edge(self, edge):
+        line_id = self.edge_items.pop(edge, None)
+        if line_id is not None:
+            self._give_back('line', line_id)
@@ -0,0 +1,355 @@
+# Dados da Flow (contas, histórias publicadas, atualizações e jams) em SQLite.
+#
+# O banco roda em modo WAL: leituras não esperam pelas gravações. As conexões
+# ficam num pool e podem ser usadas de qualquer thread; cada consulta é um
+# texto fixo, então o cache de comandos do sqlite3 reaproveita o comando já
+# preparado. As atualizações da banca entram numa fila e são gravadas em lote,
+# numa transação só. Para não travar o Tk, a interface chama submit(), que
+# roda o trabalho numa thread e devolve um Future.
+
+import hashlib
+import os
+import queue
+import secrets
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+POOL_SIZE = 4
+BATCH_SIZE = 200
+BATCH_DELAY = 0.5
+PASSWORD_ROUNDS = 100_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    nick TEXT NOT NULL,
+    email TEXT NOT NULL,
+    bio TEXT NOT NULL DEFAULT '',
+    joined TEXT NOT NULL,
+    salt BLOB NOT NULL,
+    password BLOB NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS users_by_nick ON users (nick COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS stories (
+    id INTEGER PRIMARY KEY,
+    author TEXT NOT NULL,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    category TEXT NOT NULL DEFAULT '',
+    tags TEXT NOT NULL DEFAULT '',
+    dialogue TEXT NOT NULL DEFAULT '',
+    published TEXT NOT NULL,
+    UNIQUE (author, title)
+);
+CREATE INDEX IF NOT EXISTS stories_by_author ON stories (author, id);
+CREATE INDEX IF NOT EXISTS stories_by_category ON stories (category, id);
+
+CREATE TABLE IF NOT EXISTS updates (
+    id INTEGER PRIMARY KEY,
+    author TEXT NOT NULL,
+    text TEXT NOT NULL,
+    posted TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS updates_by_author ON updates (author, id);
+
+CREATE TABLE IF NOT EXISTS jams (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    theme TEXT NOT NULL,
+    date TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS jam_members (
+    jam_id INTEGER NOT NULL REFERENCES jams (id),
+    nick TEXT NOT NULL,
+    PRIMARY KEY (jam_id, nick)
+);
+CREATE INDEX IF NOT EXISTS jams_by_name ON jams (name COLLATE NOCASE);
+"""
+
+DEFAULT_JAMS = [
+    ("Jam de Verão 2024", "Férias Inesquecíveis", "01-15/07/2024"),
+    ("Halloween Jam", "Terror e Mistério", "20-31/10/2024"),
+    ("Natal Mágico", "Histórias de Natal", "01-25/12/2024"),
+]
+
+STORY_COLUMNS = "id, author, title, description, category, tags, dialogue, published"
+
+SQL_INSERT_USER = ("INSERT INTO users (nick, email, bio, joined, salt, password) "
+                   "VALUES (?, ?, ?, ?, ?, ?)")
+SQL_USER_BY_NICK = "SELECT nick, email, bio, joined, salt, password FROM users WHERE nick = ? COLLATE NOCASE"
+SQL_NICK = "SELECT nick FROM users WHERE nick = ? COLLATE NOCASE"
+SQL_UPDATE_PROFILE = "UPDATE users SET nick = ?, bio = ? WHERE nick = ?"
+# O nick é o autor nas outras tabelas: trocar de nick leva tudo junto, na mesma transação
+SQL_RENAME_AUTHOR = (
+    "UPDATE stories SET author = ? WHERE author = ?",
+    "UPDATE updates SET author = ? WHERE author = ?",
+    "UPDATE jam_members SET nick = ? WHERE nick = ?",
+)
+SQL_PUBLISH_STORY = (
+    "INSERT INTO stories (author, title, description, category, tags, dialogue, published) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (author, title) DO UPDATE SET description = excluded.description, "
+    "category = excluded.category, tags = excluded.tags, dialogue = excluded.dialogue, "
+    "published = excluded.published")
+SQL_STORIES_BY_AUTHOR = f"SELECT {STORY_COLUMNS} FROM stories WHERE author = ? ORDER BY id DESC"
+SQL_STORIES_BY_CATEGORY = (f"SELECT {STORY_COLUMNS} FROM stories WHERE category = ? "
+                           "ORDER BY id DESC LIMIT ? OFFSET ?")
+SQL_ALL_STORIES = f"SELECT {STORY_COLUMNS} FROM stories WHERE id > ? ORDER BY id LIMIT ?"
+SQL_INSERT_UPDATE = "INSERT INTO updates (author, text, posted) VALUES (?, ?, ?)"
+SQL_UPDATES_BY_AUTHOR = "SELECT text, posted FROM updates WHERE author = ? ORDER BY id DESC LIMIT ?"
+SQL_INSERT_JAM = "INSERT OR IGNORE INTO jams (name, theme, date) VALUES (?, ?, ?)"
+SQL_JOIN_JAM = "INSERT OR IGNORE INTO jam_members (jam_id, nick) VALUES (?, ?)"
+
+# Listas paginadas: a ordem e o filtro são feitos no banco. Os pedaços são
+# fixos, então cada combinação vira sempre o mesmo comando preparado.
+STORY_ORDERS = {'recent': "id DESC", 'oldest': "id", 'title': "title COLLATE NOCASE, id"}
+JAM_ORDERS = {'recent': "j.id DESC", 'name': "j.name COLLATE NOCASE, j.id",
+              'members': "members DESC, j.id"}
+SQL_JAM_LIST = ("SELECT j.id, j.name, j.theme, j.date, "
+                "(SELECT COUNT(*) FROM jam_members m WHERE m.jam_id = j.id) AS members "
+                "FROM jams j")
+
+
+class RepositoryError(ValueError):
+    pass
+
+
+def _now():
+    return datetime.now().strftime("%d/%m/%Y %H:%M")
+
+
+def _hash_password(password, salt):
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, PASSWORD_ROUNDS)
+
+
+def _like(text):
+    # Trecho digitado -> padrão do LIKE, sem deixar % e _ virarem curingas
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+def _story(row):
+    story_id, author, title, description, category, tags, dialogue, published = row
+    return {'id': story_id, 'author': author, 'title': title, 'description': description,
+            'category': category, 'tags': tags.split(',') if tags else [],
+            'dialogue': dialogue, 'published': published}
+
+
+class ConnectionPool:
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self._idle = queue.LifoQueue()
+        self._all = []
+        for _ in range(size):
+            connection = sqlite3.connect(path, check_same_thread=False, timeout=10,
+                                         cached_statements=64)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            self._all.append(connection)
+            self._idle.put(connection)
+
+    @contextmanager
+    def connection(self):
+        # Empresta uma conexão; com "with" ela vira uma transação
+        connection = self._idle.get()
+        try:
+            with connection:
+                yield connection
+        finally:
+            self._idle.put(connection)
+
+    def close(self):
+        for connection in self._all:
+            connection.close()
+        self._all = []
+
+
+class FlowRepository:
+    def __init__(self, path, pool_size=POOL_SIZE):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.pool = ConnectionPool(path, pool_size)
+        with self.pool.connection() as db:
+            db.executescript(SCHEMA)
+            db.executemany(SQL_INSERT_JAM, DEFAULT_JAMS)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='flowstory-db')
+        # Fila das atualizações da banca, gravadas em lote por uma thread própria
+        self._updates = queue.Queue()
+        self.write_error = None
+        self._writer = threading.Thread(target=self._write_updates, name='flowstory-db-writer',
+                                        daemon=True)
+        self._writer.start()
+
+    def submit(self, function, *args):
+        # Para a interface: roda fora da thread do Tk e devolve um Future
+        return self._executor.submit(function, *args)
+
+    # Contas -------------------------------------------------------------------
+
+    def create_user(self, nick, password, email):
+        salt = secrets.token_bytes(16)
+        user = {'nick': nick, 'email': email, 'bio': "Novo usuário da Flow!",
+                'joined': datetime.now().strftime("%d/%m/%Y")}
+        try:
+            with self.pool.connection() as db:
+                db.execute(SQL_INSERT_USER, (nick, email, user['bio'], user['joined'], salt,
+                                             _hash_password(password, salt)))
+        except sqlite3.IntegrityError:
+            raise RepositoryError(f"O nick {nick} já está em uso")
+        return user
+
+    def authenticate(self, nick, password):
+        with self.pool.connection() as db:
+            row = db.execute(SQL_USER_BY_NICK, (nick,)).fetchone()
+        if row is None:
+            return None
+        nick, email, bio, joined, salt, stored = row
+        if not secrets.compare_digest(_hash_password(password, salt), stored):
+            return None
+        return {'nick': nick, 'email': email, 'bio': bio, 'joined': joined}
+
+    def update_profile(self, nick, new_nick, bio):
+        # Atualizações da banca ainda na fila seriam gravadas com o nick antigo
+        self._updates.join()
+        try:
+            with self.pool.connection() as db:
+                # Trava a escrita já na leitura: ninguém troca o nick entre o SELECT e os UPDATEs
+                db.execute("BEGIN IMMEDIATE")
+                row = db.execute(SQL_NICK, (nick,)).fetchone()
+                if row is None:
+                    raise RepositoryError(f"Usuário {nick} não encontrado")
+                old_nick = row[0]
+                db.execute(SQL_UPDATE_PROFILE, (new_nick, bio, old_nick))
+                if new_nick != old_nick:
+                    for statement in SQL_RENAME_AUTHOR:
+                        db.execute(statement, (new_nick, old_nick))
+        except sqlite3.IntegrityError:
+            raise RepositoryError(f"O nick {new_nick} já está em uso")
+
+    # Histórias ----------------------------------------------------------------
+
+    def publish_story(self, story):
+        row = (story['author'], story['title'], story.get('description', ''),
+               story.get('category', ''), ','.join(story.get('tags', ())),
+               story.get('dialogue', ''), _now())
+        with self.pool.connection() as db:
+            db.execute(SQL_PUBLISH_STORY, row)
+
+    def stories_by_author(self, author):
+        with self.pool.connection() as db:
+            return [_story(row) for row in db.execute(SQL_STORIES_BY_AUTHOR, (author,))]
+
+    def stories_by_category(self, category, limit=20, offset=0):
+        with self.pool.connection() as db:
+            return [_story(row) for row in db.execute(SQL_STORIES_BY_CATEGORY,
+                                                      (category, limit, offset))]
+
+    def stories_page(self, after=0, limit=1000):
+        # Histórias com id maior que "after", em ordem; o último id é o início da próxima página
+        with self.pool.connection() as db:
+            return [_story(row) for row in db.execute(SQL_ALL_STORIES, (after, limit))]
+
+    def iter_stories(self, batch=1000):
+        # Todas as histórias em blocos, sem segurar uma conexão entre eles
+        last = 0
+        while True:
+            stories = self.stories_page(last, batch)
+            if not stories:
+                return
+            yield from stories
+            last = stories[-1]['id']
+
+    def list_stories(self, author=None, category=None, text='', order='recent', limit=50, offset=0):
+        # -> {'total': quantas passam no filtro, 'rows': a página pedida}
+        conditions, args = [], []
+        if author is not None:
+            conditions.append("author = ?")
+            args.append(author)
+        if category:
+            conditions.append("category = ?")
+            args.append(category)
+        if text:
+            conditions.append("title LIKE ? ESCAPE '\\'")
+            args.append(_like(text))
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        order_by = STORY_ORDERS.get(order, STORY_ORDERS['recent'])
+        with self.pool.connection() as db:
+            total = db.execute("SELECT COUNT(*) FROM stories" + where, args).fetchone()[0]
+            rows = db.execute(f"SELECT {STORY_COLUMNS} FROM stories{where} ORDER BY {order_by} "
+                              "LIMIT ? OFFSET ?", args + [limit, offset]).fetchall()
+        return {'total': total, 'rows': [_story(row) for row in rows]}
+
+    # Atualizações da banca ----------------------------------------------------
+
+    def post_update(self, author, text):
+        # Não espera o disco: entra na fila do gravador
+        self._updates.put((author, text, _now()))
+
+    def recent_updates(self, author, limit=20):
+        self._updates.join()
+        with self.pool.connection() as db:
+            return db.execute(SQL_UPDATES_BY_AUTHOR, (author, limit)).fetchall()
+
+    def _write_updates(self):
+        while True:
+            first = self._updates.get()
+            if first is None:
+                self._updates.task_done()
+                return
+            rows = [first]
+            stop = False
+            # Junta o que chegar logo em seguida numa transação só
+            while len(rows) < BATCH_SIZE:
+                try:
+                    row = self._updates.get(timeout=BATCH_DELAY)
+                except queue.Empty:
+                    break
+                if row is None:
+                    stop = True
+                    break
+                rows.append(row)
+            try:
+                with self.pool.connection() as db:
+                    db.executemany(SQL_INSERT_UPDATE, rows)
+            except sqlite3.Error as error:
+                # Fica registrado para a interface mostrar; o gravador continua
+                self.write_error = error
+            finally:
+                for _ in range(len(rows) + stop):
+                    self._updates.task_done()
+            if stop:
+                return
+
+    # Jams ---------------------------------------------------------------------
+
+    def list_jams(self, text='', order='recent', limit=50, offset=0):
+        where, args = "", []
+        if text:
+            where = " WHERE j.name LIKE ? ESCAPE '\\' OR j.theme LIKE ? ESCAPE '\\'"
+            args = [_like(text)] * 2
+        order_by = JAM_ORDERS.get(order, JAM_ORDERS['recent'])
+        with self.pool.connection() as db:
+            total = db.execute("SELECT COUNT(*) FROM jams j" + where, args).fetchone()[0]
+            rows = db.execute(f"{SQL_JAM_LIST}{where} ORDER BY {order_by} LIMIT ? OFFSET ?",
+                              args + [limit, offset]).fetchall()
+        return {'total': total,
+                'rows': [{'id': jam_id, 'name': name, 'theme': theme, 'date': date,
+                          'members': members}
+                         for jam_id, name, theme, date, members in rows]}
+
+    def join_jam(self, jam_id, nick):
+        with self.pool.connection() as db:
+            return db.execute(SQL_JOIN_JAM, (jam_id, nick)).rowcount == 1
+
+    def close(self):
+        self._updates.put(None)
+        self._writer.join()
+        self._executor.shutdown(wait=True)
+        self.pool.close()
@@ -0,0 +1,378 @@
+# Interpretador da história, sem Tk.
+#
+# O grafo é compilado uma vez numa tabela plana de instruções
+# (código, argumento, próxima, alternativa), com os saltos já resolvidos para
+# índices da tabela. Executar um passo é só ler uma linha da tabela: o texto das
+# bolhas, as expressões dos "Se" e as escolhas das rotas já foram preparados.
+
+import ast
+import operator
+import re
+
+from flowstory.graph import (EDGE_NEXT, EDGE_THEN, EDGE_ELSE, EDGE_ROUTE, EDGE_CHAPTER)
+
+END = -1
+
+OP_NOP = 0
+OP_LINE = 1
+OP_SHOW = 2
+OP_HIDE = 3
+OP_MOVE = 4
+OP_EXPRESSION = 5
+OP_BACKGROUND = 6
+OP_SCENE = 7
+OP_CHAPTER = 8
+OP_FOCUS = 9
+OP_WAIT = 10
+OP_TRANSITION = 11
+OP_IF = 12
+OP_SET = 13
+OP_CHOICE = 14
+OP_END = 15
+
+KIND_OPS = {
+    "Diálogo": OP_LINE,
+    "Personagem": OP_SHOW,
+    "Trazer Personagem": OP_SHOW,
+    "Esconder Personagem": OP_HIDE,
+    "Mover Personagem": OP_MOVE,
+    "Mudar Expressão": OP_EXPRESSION,
+    "Cenário": OP_BACKGROUND,
+    "Cena": OP_SCENE,
+    "Novo Capítulo": OP_CHAPTER,
+    "Mudar Foco": OP_FOCUS,
+    "Tempo de Slide": OP_WAIT,
+    "Transição Súbita": OP_TRANSITION,
+    "Se": OP_IF,
+    "Contexto": OP_SET,
+    "Parar Tudo": OP_END,
+}
+
+# Ordem de preferência das ligações para seguir adiante numa bolha comum
+FORWARD_LABELS = (EDGE_NEXT, EDGE_CHAPTER, EDGE_THEN, EDGE_ELSE)
+
+VARIABLE_PATTERN = re.compile(r'\{(\w+)\}')
+# "Ana [feliz]: ..." -> fala da Ana já com a expressão "feliz"
+CUE_PATTERN = re.compile(r'(.*?)\s*\[([^\]]*)\]$')
+
+# Instruções seguidas sem nenhum evento antes de considerar a história travada
+SILENT_LIMIT = 1000000
+
+
+class StoryError(ValueError):
+    pass
+
+
+# Expressões ------------------------------------------------------------------
+
+_BINARY = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+    ast.Div: operator.truediv, ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod,
+}
+_COMPARE = {
+    ast.Eq: operator.eq, ast.NotEq: operator.ne, ast.Lt: operator.lt,
+    ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge,
+}
+_CONSTANTS = {'verdadeiro': True, 'falso': False, 'true': True, 'false': False}
+
+
+def compile_expression(source):
+    # Transforma o texto de um "Se" em uma função env -> valor, sem usar eval
+    source = source.strip()
+    if not source:
+        return lambda env: True
+    try:
+        tree = ast.parse(source, mode='eval')
+    except SyntaxError as error:
+        raise StoryError(f"Expressão inválida: {source}") from error
+    return _build(tree.body, source)
+
+
+def _build(node, source):
+    if isinstance(node, ast.Constant):
+        value = node.value
+        return lambda env: value
+    if isinstance(node, ast.Name):
+        name = node.id
+        if name.lower() in _CONSTANTS:
+            value = _CONSTANTS[name.lower()]
+            return lambda env: value
+        return lambda env: env.get(name, 0)
+    if isinstance(node, ast.BoolOp):
+        parts = [_build(value, source) for value in node.values]
+        if isinstance(node.op, ast.And):
+            return lambda env: all(part(env) for part in parts)
+        return lambda env: any(part(env) for part in parts)
+    if isinstance(node, ast.UnaryOp):
+        operand = _build(node.operand, source)
+        if isinstance(node.op, ast.Not):
+            return lambda env: not operand(env)
+        if isinstance(node.op, ast.USub):
+            return lambda env: -operand(env)
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+        func = _BINARY[type(node.op)]
+        left = _build(node.left, source)
+        right = _build(node.right, source)
+        return lambda env: func(left(env), right(env))
+    if isinstance(node, ast.Compare) and all(type(op) in _COMPARE for op in node.ops):
+        first = _build(node.left, source)
+        pairs = [(_COMPARE[type(op)], _build(value, source))
+                 for op, value in zip(node.ops, node.comparators)]
+
+        def compare(env):
+            left = first(env)
+            for func, right in pairs:
+                value = right(env)
+                if not func(left, value):
+                    return False
+                left = value
+            return True
+        return compare
+    raise StoryError(f"Expressão não suportada: {source}")
+
+
+def compile_assignments(text):
+    # "Contexto": uma atribuição por linha, como "coragem = coragem + 1"
+    assignments = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        for symbol, func in (('+=', operator.add), ('-=', operator.sub), ('=', None)):
+            name, found, expression = line.partition(symbol)
+            if found and name.strip().isidentifier():
+                assignments.append((name.strip(), func, compile_expression(expression), line))
+                break
+        else:
+            raise StoryError(f"Atribuição inválida: {line}")
+    return tuple(assignments)
+
+
+# Compilação ------------------------------------------------------------------
+
+def _split_pair(text, default):
+    first, _, rest = text.strip().partition(' ')
+    return (first or default, rest.strip())
+
+
+def _compile_arg(op, node):
+    text = node.text.strip()
+    if op == OP_LINE:
+        speaker, found, line = text.partition(':')
+        if not found:
+            speaker, line = '', text
+        speaker = speaker.strip()
+        expression = None
+        cue = CUE_PATTERN.match(speaker)
+        if cue:
+            speaker, expression = cue.group(1), cue.group(2).strip() or None
+        line = line.strip()
+        return (speaker, line, bool(VARIABLE_PATTERN.search(line)), expression)
+    if op in (OP_SHOW, OP_HIDE, OP_FOCUS):
+        return text or 'Personagem'
+    if op in (OP_MOVE, OP_EXPRESSION):
+        return _split_pair(text, 'Personagem')
+    if op == OP_WAIT:
+        try:
+            return float(text.replace(',', '.')) if text else 1.0
+        except ValueError as error:
+            raise StoryError(f"Tempo inválido na bolha {node.id}: {text}") from error
+    if op == OP_IF:
+        # O texto vai junto só para a mensagem de erro na execução
+        return (compile_expression(text), text)
+    if op == OP_SET:
+        return compile_assignments(text)
+    if op == OP_CHAPTER:
+        return text or f"Capítulo {node.id}"
+    return text or node.kind
+
+
+class Program:
+    __slots__ = ('code', 'node_index', 'node_ids', 'start')
+
+    def __init__(self, code, node_index, node_ids, start):
+        self.code = code              # tuplas (op, arg, próxima, alternativa)
+        self.node_index = node_index  # id da bolha -> índice na tabela
+        self.node_ids = node_ids      # índice na tabela -> id da bolha (ou None)
+        self.start = start
+
+    def __len__(self):
+        return len(self.code)
+
+
+def compile_story(graph, start=None):
+    nodes = sorted(graph.nodes)
+    index = {node_id: position for position, node_id in enumerate(nodes)}
+    code = [None] * len(nodes)
+    node_ids = list(nodes)
+    extra = []
+
+    for node_id in nodes:
+        node = graph.nodes[node_id]
+        op = KIND_OPS.get(node.kind, OP_NOP)
+        arg = _compile_arg(op, node)
+        edges = graph.out_edges(node_id)
+
+        by_label = {}
+        for edge in edges:
+            by_label.setdefault(edge.label, edge.dst)
+
+        if op == OP_END:
+            code[index[node_id]] = (op, arg, END, END)
+            continue
+
+        forward = END
+        for label in FORWARD_LABELS:
+            if label in by_label:
+                forward = index[by_label[label]]
+                break
+
+        if op == OP_IF:
+            then_target = by_label.get(EDGE_THEN, by_label.get(EDGE_NEXT))
+            else_target = by_label.get(EDGE_ELSE, by_label.get(EDGE_NEXT))
+            code[index[node_id]] = (op, arg,
+                                    END if then_target is None else index[then_target],
+                                    END if else_target is None else index[else_target])
+            continue
+
+        routes = [edge.dst for edge in edges if edge.label == EDGE_ROUTE]
+        if routes:
+            # As rotas viram uma instrução de escolha logo depois da bolha
+            labels = tuple(graph.nodes[dst].text.strip() or f"Rota {number}"
+                           for number, dst in enumerate(routes, 1))
+            targets = tuple(index[dst] for dst in routes)
+            forward = len(nodes) + len(extra)
+            extra.append((OP_CHOICE, labels, END, targets))
+            node_ids.append(None)
+
+        code[index[node_id]] = (op, arg, forward, END)
+
+    code.extend(extra)
+
+    if start is None:
+        start = graph.start_node()
+    start_index = END if start is None else index[start]
+    return Program(tuple(code), index, tuple(node_ids), start_index)
+
+
+# Execução --------------------------------------------------------------------
+
+class StoryRunner:
+    def __init__(self, program, variables=None):
+        self.program = program
+        self.code = program.code
+        self.pc = program.start
+        self.variables = dict(variables or {})
+        self.characters = {}   # nome -> (posição, expressão)
+        self.background = None
+        self.chapter = None
+        self.choices = None    # alvos da escolha pendente
+        self.steps = 0
+        self.finished = self.pc == END
+
+    def choose(self, option):
+        if self.choices is None:
+            raise StoryError("Nenhuma escolha pendente")
+        self.pc = self.choices[option]
+        self.choices = None
+
+    def stop(self):
+        self.pc = END
+        self.finished = True
+
+    def step(self):
+        # Executa até o próximo evento visível e o devolve; None quando a história acaba
+        if self.choices is not None:
+            raise StoryError("Escolha pendente: chame choose() antes de continuar")
+        code = self.code
+        variables = self.variables
+        silent = 0
+        while True:
+            pc = self.pc
+            if pc == END:
+                self.finished = True
+                return None
+            op, arg, forward, alternative = code[pc]
+            self.steps += 1
+            self.pc = forward
+            silent += 1
+            if silent > SILENT_LIMIT:
+                raise StoryError("A história ficou presa num laço sem nenhum evento")
+
+            if op == OP_LINE:
+                speaker, line, has_variables, expression = arg
+                if expression is not None:
+                    self.characters[speaker] = (self.characters.get(speaker, ('centro', None))[0],
+                                                expression)
+                if has_variables:
+                    line = VARIABLE_PATTERN.sub(lambda m: str(variables.get(m.group(1), '')), line)
+                return ('line', speaker, line)
+            if op == OP_NOP:
+                continue
+            if op == OP_IF:
+                condition, source = arg
+                try:
+                    passed = condition(variables)
+                except Exception as error:
+                    # Divisão por zero, texto comparado com número, ...
+                    raise StoryError(f"Erro na condição ({error}): {source}") from error
+                if not passed:
+                    self.pc = alternative
+                continue
+            if op == OP_SET:
+                for name, func, expression, source in arg:
+                    try:
+                        value = expression(variables)
+                        variables[name] = value if func is None else func(variables.get(name, 0), value)
+                    except Exception as error:
+                        raise StoryError(f"Erro na atribuição ({error}): {source}") from error
+                continue
+            if op == OP_CHOICE:
+                self.choices = alternative
+                return ('choice', arg)
+            if op == OP_SHOW:
+                self.characters.setdefault(arg, ('centro', None))
+                return ('show', arg)
+            if op == OP_HIDE:
+                self.characters.pop(arg, None)
+                return ('hide', arg)
+            if op == OP_MOVE:
+                name, position = arg
+                self.characters[name] = (position, self.characters.get(name, (None, None))[1])
+                return ('move', name, position)
+            if op == OP_EXPRESSION:
+                name, expression = arg
+                self.characters[name] = (self.characters.get(name, ('centro', None))[0], expression)
+                return ('expression', name, expression)
+            if op == OP_BACKGROUND:
+                self.background = arg
+                return ('background', arg)
+            if op == OP_CHAPTER:
+                self.chapter = arg
+                return ('chapter', arg)
+            if op == OP_SCENE:
+                return ('scene', arg)
+            if op == OP_FOCUS:
+                return ('focus', arg)
+            if op == OP_WAIT:
+                return ('wait', arg)
+            if op == OP_TRANSITION:
+                return ('transition', arg)
+            if op == OP_END:
+                # "Parar Tudo"
+                self.stop()
+                return ('end',)
+
+    def run(self, chooser=None, max_steps=None):
+        # Executa sem parar, escolhendo rotas com chooser(opções) -> índice (padrão: a primeira)
+        events = 0
+        while not self.finished:
+            if max_steps is not None and self.steps >= max_steps:
+                break
+            event = self.step()
+            if event is None:
+                break
+            events += 1
+            if event[0] == 'choice':
+                self.choose(chooser(event[1]) if chooser else 0)
+        return events
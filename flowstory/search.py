@@ -0,0 +1,291 @@
+# Busca da aba Explorar: índice invertido sobre título, descrição, falas e tags.
+#
+# As palavras são normalizadas sem acento e em minúsculas ("Mistério" e
+# "misterio" viram o mesmo termo). Cada termo guarda a lista das histórias onde
+# aparece, em arrays compactos, então um milhão de histórias cabe na memória e
+# publicar uma história nova só acrescenta no fim das listas. O vocabulário
+# fica ordenado para a busca por prefixo ("mist" acha "misterio" e "mistica").
+#
+# Além das listas em ordem de doc (para achar o peso de um doc com busca
+# binária), cada termo guarda os docs agrupados por peso. Assim uma palavra
+# pode ser lida da maior pontuação para a menor, e a busca é o Threshold
+# Algorithm (Fagin): as palavras são lidas em rodízio, cada doc novo tem a
+# pontuação completada pelas outras palavras, e um doc sai assim que nenhum
+# doc ainda não lido pode passar dele. A primeira página custa o que ela lê,
+# não o tamanho das listas; as seguintes continuam de onde a anterior parou.
+# A navegação por categoria lê o array da categoria de trás para frente, só
+# até onde a página pede.
+
+import heapq
+import math
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left, insort
+from itertools import islice
+
+# Peso de cada campo na pontuação
+FIELD_WEIGHTS = {'title': 8, 'tags': 6, 'description': 3, 'dialogue': 1}
+MIN_PREFIX = 2
+MAX_PREFIX_TERMS = 200
+PAGE_SIZE = 20
+
+STOPWORDS = frozenset("""
+a o e é as os um uma uns umas de do da dos das em no na nos nas por para com
+sem que se ao aos à às ou mas como mais seu sua seus suas ele ela eles elas
+eu tu você voce nós nos me te lhe isso isto esse essa este esta aquele aquela
+""".split())
+
+_word = re.compile(r"\w+")
+
+
+def fold(text):
+    # Minúsculas e sem acentos
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    return [word for word in _word.findall(fold(text)) if word not in STOPWORDS]
+
+
+class SearchResults:
+    # Resultado de uma busca: docs tirados aos poucos de um iterador que já sai
+    # na ordem final. estimate é o total exato (exact) ou um limite superior
+
+    def __init__(self, index, docs, estimate, exact):
+        self.index = index
+        self._docs = docs
+        self._ranked = []
+        self.estimate = estimate
+        self.exact = exact
+
+    def _fill(self, count):
+        ranked = self._ranked
+        if self._docs is None or len(ranked) >= count:
+            return
+        ranked.extend(islice(self._docs, count - len(ranked)))
+        if len(ranked) < count:
+            # O iterador acabou: agora o total é conhecido
+            self._docs = None
+            self.estimate = len(ranked)
+            self.exact = True
+
+    def page(self, number, size=PAGE_SIZE):
+        start = number * size
+        self._fill(start + size)
+        return [self.index.document(doc) for doc in self._ranked[start:start + size]]
+
+
+def _impact_run(idf, impacts):
+    # Um termo da maior pontuação para a menor; no mesmo peso, o doc mais novo primeiro
+    for weight in sorted(impacts, reverse=True):
+        score = idf * weight
+        for doc in reversed(impacts[weight]):
+            yield score, doc
+
+
+def _stream(terms):
+    # (pontuação, doc) de uma palavra em ordem decrescente; com vários termos
+    # (prefixo), cada doc sai uma vez, com a maior pontuação entre eles
+    runs = [_impact_run(idf, impacts) for idf, _, _, impacts in terms]
+    if len(runs) == 1:
+        yield from runs[0]
+        return
+    seen = set()
+    for score, doc in heapq.merge(*runs, reverse=True):
+        if doc not in seen:
+            seen.add(doc)
+            yield score, doc
+
+
+def _token_score(terms, doc):
+    # Pontuação de um doc numa palavra, por busca binária; None se não aparece
+    best = None
+    for idf, docs, weights, _ in terms:
+        position = bisect_left(docs, doc)
+        if position < len(docs) and docs[position] == doc:
+            score = idf * weights[position]
+            if best is None or score > best:
+                best = score
+    return best
+
+
+class SearchIndex:
+    def __init__(self):
+        self._keys = []          # doc -> chave da história (None se foi substituída)
+        self._records = []       # doc -> dados da história
+        self._docs = {}          # chave -> doc atual
+        self._postings = {}      # termo -> (array de docs, array de pesos, peso -> array de docs)
+        self._vocabulary = []    # termos em ordem alfabética
+        self._categories = {}    # categoria sem acento -> array de docs
+        self._doc_category = []  # doc -> categoria sem acento
+        self._category_live = {} # categoria sem acento -> histórias vivas
+        self.live = 0
+
+    def __len__(self):
+        return self.live
+
+    def __contains__(self, key):
+        return key in self._docs
+
+    def document(self, doc):
+        return self._records[doc]
+
+    def records(self):
+        # Histórias vivas, na ordem em que foram publicadas
+        for key, record in zip(self._keys, self._records):
+            if key is not None:
+                yield key, record
+
+    def get(self, key):
+        doc = self._docs.get(key)
+        return None if doc is None else self._records[doc]
+
+    def add(self, key, record):
+        # record: title, description, dialogue, tags, category (todos opcionais)
+        # Republicar a mesma chave substitui a versão anterior
+        self.remove(key)
+        doc = len(self._keys)
+        self._keys.append(key)
+        self._records.append(record)
+        self._docs[key] = doc
+        self.live += 1
+
+        weights = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            value = record.get(field)
+            if not value:
+                continue
+            if not isinstance(value, str):
+                value = ' '.join(value)
+            for term in tokenize(value):
+                weights[term] = weights.get(term, 0) + weight
+
+        for term, weight in weights.items():
+            weight = min(weight, 0xFFFF)
+            entry = self._postings.get(term)
+            if entry is None:
+                entry = self._postings[term] = (array('I'), array('H'), {})
+                insort(self._vocabulary, term)
+            entry[0].append(doc)
+            entry[1].append(weight)
+            impact = entry[2].get(weight)
+            if impact is None:
+                impact = entry[2][weight] = array('I')
+            impact.append(doc)
+
+        category = fold(record.get('category') or '')
+        self._doc_category.append(category)
+        if category:
+            self._categories.setdefault(category, array('I')).append(doc)
+            self._category_live[category] = self._category_live.get(category, 0) + 1
+        return doc
+
+    def remove(self, key):
+        # Só marca como apagada; as listas são filtradas na busca
+        doc = self._docs.pop(key, None)
+        if doc is None:
+            return False
+        self._keys[doc] = None
+        self.live -= 1
+        category = self._doc_category[doc]
+        if category:
+            self._category_live[category] -= 1
+        return True
+
+    def _expand(self, token, prefix):
+        # Termos do vocabulário que servem para um pedaço da busca
+        if not prefix or len(token) < MIN_PREFIX:
+            return [token] if token in self._postings else []
+        vocabulary = self._vocabulary
+        position = bisect_left(vocabulary, token)
+        terms = []
+        while position < len(vocabulary) and len(terms) < MAX_PREFIX_TERMS:
+            term = vocabulary[position]
+            if not term.startswith(token):
+                break
+            terms.append(term)
+            position += 1
+        return terms
+
+    def _terms(self, token, prefix):
+        # [(idf, docs, pesos, grupos por peso)] dos termos que servem para a palavra
+        total = max(1, self.live)
+        terms = []
+        for term in self._expand(token, prefix):
+            docs, weights, impacts = self._postings[term]
+            # Termos raros valem mais; completar a palavra vale metade
+            idf = math.log(1 + total / len(docs))
+            if term != token:
+                idf *= 0.5
+            terms.append((idf, docs, weights, impacts))
+        return terms
+
+    def _browse(self, docs):
+        # Das mais novas para as mais antigas, sem montar a lista inteira
+        keys = self._keys
+        for position in range(len(docs) - 1, -1, -1):
+            doc = docs[position]
+            if keys[doc] is not None:
+                yield doc
+
+    def _ranked(self, per_token, category):
+        keys = self._keys
+        categories = self._doc_category
+        streams = [_stream(terms) for terms in per_token]
+        last = [None] * len(streams)
+        seen = set()
+        ready = []      # heap de (-pontuação, -doc) com a pontuação completa
+        while True:
+            for position, stream in enumerate(streams):
+                item = next(stream, None)
+                if item is None:
+                    # Todo resultado aparece em todas as palavras: o que não saiu até aqui não sai mais
+                    while ready:
+                        yield -heapq.heappop(ready)[1]
+                    return
+                last[position] = item
+                score, doc = item
+                if doc in seen:
+                    continue
+                seen.add(doc)
+                if keys[doc] is None or (category and categories[doc] != category):
+                    continue
+                total = 0
+                for other, terms in enumerate(per_token):
+                    value = score if other == position else _token_score(terms, doc)
+                    if value is None:
+                        break
+                    total += value
+                else:
+                    heapq.heappush(ready, (-total, -doc))
+            # Um doc ainda não lido tem no máximo a soma das últimas pontuações e,
+            # se empatar, é mais antigo que o último doc lido em cada palavra
+            bound = (sum(item[0] for item in last), min(item[1] for item in last))
+            while ready and (-ready[0][0], -ready[0][1]) >= bound:
+                yield -heapq.heappop(ready)[1]
+
+    def search(self, query, category=None):
+        tokens = list(dict.fromkeys(tokenize(query)))
+        category = fold(category) if category else None
+
+        if not tokens:
+            # Sem texto: a categoria inteira, das mais novas para as mais antigas
+            if category:
+                return SearchResults(self, self._browse(self._categories.get(category, ())),
+                                     self._category_live.get(category, 0), True)
+            return SearchResults(self, self._browse(range(len(self._keys))), self.live, True)
+
+        # Só a última palavra é tratada como prefixo (ela ainda está sendo digitada)
+        per_token = [self._terms(token, position == len(tokens) - 1)
+                     for position, token in enumerate(tokens)]
+        if not all(per_token):
+            return SearchResults(self, iter(()), 0, True)
+        # Limite superior: a palavra com menos docs; exato com um termo só e nada apagado
+        estimate = min(sum(len(docs) for _, docs, _, _ in terms) for terms in per_token)
+        exact = len(per_token) == 1 and len(per_token[0]) == 1 and self.live == len(self._keys)
+        if category:
+            exact = False
+            estimate = min(estimate, self._category_live.get(category, 0))
+        return SearchResults(self, self._ranked(per_token, category), estimate, exact)
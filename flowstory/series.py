@@ -0,0 +1,179 @@
+# Websérie com capítulos carregados sob demanda.
+#
+#   minha-serie.flowseries/
+#       index.json                  -> projeto + lista de capítulos (só metadados)
+#       chapters/0001.flow          -> cada capítulo no formato de diário do journal.py
+#       chapters/0001.flow.journal
+#
+# Abrir a série lê só o index.json. Um capítulo só é lido do disco quando é
+# aberto na Mesa de Trabalho, e os menos usados são gravados e descarregados
+# quando passam de max_loaded capítulos na memória. O diário de um capítulo
+# descarregado termina de gravar em segundo plano; reabrir o capítulo espera
+# por ele (wait_closed) antes de ler os arquivos.
+
+import json
+import os
+from collections import OrderedDict
+
+from flowstory.graph import StoryGraph
+from flowstory.history import UndoHistory
+from flowstory.journal import (FORMAT_NAME, FORMAT_VERSION, JournalWriter, encode_changes, load_project,
+                               wait_closed)
+
+SERIES_SUFFIX = '.flowseries'
+INDEX_NAME = 'index.json'
+CHAPTERS_DIR = 'chapters'
+MAX_LOADED = 4
+
+
+class ChapterInfo:
+    __slots__ = ('id', 'title', 'episode', 'file', 'bubbles')
+
+    def __init__(self, chapter_id, title, episode, file, bubbles=0):
+        self.id = chapter_id
+        self.title = title
+        self.episode = episode
+        self.file = file
+        self.bubbles = bubbles
+
+    def to_dict(self):
+        return {'id': self.id, 'title': self.title, 'episode': self.episode,
+                'file': self.file, 'bubbles': self.bubbles}
+
+    def label(self):
+        return f"Ep. {self.episode} - {self.title}"
+
+
+class OpenChapter:
+    __slots__ = ('info', 'graph', 'history', 'writer')
+
+    def __init__(self, info, graph):
+        self.info = info
+        self.graph = graph
+        self.history = UndoHistory()
+        self.writer = None
+
+
+class SeriesLibrary:
+    def __init__(self, path, project, chapters, max_loaded=MAX_LOADED):
+        self.path = path
+        self.project = project
+        self.max_loaded = max(1, max_loaded)
+        self._chapters = OrderedDict((info.id, info) for info in chapters)
+        self._loaded = OrderedDict()   # id -> OpenChapter, do menos ao mais recente
+        self.index_dirty = False
+
+    @classmethod
+    def create(cls, path, project, max_loaded=MAX_LOADED):
+        os.makedirs(os.path.join(path, CHAPTERS_DIR), exist_ok=True)
+        library = cls(path, project, [], max_loaded)
+        library.save_index()
+        return library
+
+    @classmethod
+    def open(cls, path, max_loaded=MAX_LOADED):
+        # Só o cabeçalho: nenhum capítulo é lido aqui
+        with open(os.path.join(path, INDEX_NAME), 'r', encoding='utf-8') as handle:
+            data = json.load(handle)
+        chapters = [ChapterInfo(item['id'], item['title'], item['episode'], item['file'],
+                                item.get('bubbles', 0))
+                    for item in data.get('chapters', [])]
+        return cls(path, data.get('project', {}), chapters, max_loaded)
+
+    def __len__(self):
+        return len(self._chapters)
+
+    def chapters(self):
+        return list(self._chapters.values())
+
+    def chapter(self, chapter_id):
+        return self._chapters[chapter_id]
+
+    def is_loaded(self, chapter_id):
+        return chapter_id in self._loaded
+
+    def loaded(self, chapter_id):
+        # Capítulo na memória, sem mexer na ordem de descarte; None se estiver só no disco
+        return self._loaded.get(chapter_id)
+
+    def chapter_path(self, chapter_id):
+        return os.path.join(self.path, self._chapters[chapter_id].file)
+
+    def add_chapter(self, title, episode=None):
+        chapter_id = max(self._chapters, default=0) + 1
+        if episode is None:
+            episode = max((info.episode for info in self._chapters.values()), default=0) + 1
+        info = ChapterInfo(chapter_id, title, episode, f"{CHAPTERS_DIR}/{chapter_id:04d}.flow")
+        self._chapters[chapter_id] = info
+        self.save_index()
+        return info
+
+    def load(self, chapter_id):
+        chapter = self._loaded.get(chapter_id)
+        if chapter is not None:
+            self._loaded.move_to_end(chapter_id)
+            return chapter
+
+        info = self._chapters[chapter_id]
+        path = self.chapter_path(chapter_id)
+        # Descarregado há pouco: o diário dele pode ainda estar gravando ou compactando
+        wait_closed(path)
+        if os.path.exists(path) or os.path.exists(path + '.journal'):
+            _, graph = load_project(path)
+        else:
+            graph = StoryGraph()
+        chapter = OpenChapter(info, graph)
+        self._loaded[chapter_id] = chapter
+        self._evict()
+        return chapter
+
+    def _evict(self):
+        # O capítulo aberto por último nunca sai: ele está na Mesa de Trabalho
+        while len(self._loaded) > self.max_loaded:
+            _, chapter = self._loaded.popitem(last=False)
+            self.flush(chapter)
+            if chapter.writer is not None:
+                chapter.writer.request_close()
+                chapter.writer = None
+        if self.index_dirty:
+            self.save_index()
+
+    def flush(self, chapter):
+        graph = chapter.graph
+        if chapter.info.bubbles != len(graph):
+            chapter.info.bubbles = len(graph)
+            self.index_dirty = True
+        if graph.has_changes():
+            if chapter.writer is None:
+                chapter.writer = JournalWriter(os.path.join(self.path, chapter.info.file))
+            chapter.writer.submit(encode_changes(graph))
+
+    def flush_all(self):
+        for chapter in self._loaded.values():
+            self.flush(chapter)
+        if self.index_dirty:
+            self.save_index()
+
+    def save_index(self):
+        data = {
+            'format': FORMAT_NAME,
+            'version': FORMAT_VERSION,
+            'project': self.project,
+            'chapters': [info.to_dict() for info in self._chapters.values()],
+        }
+        tmp_path = os.path.join(self.path, INDEX_NAME + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as handle:
+            json.dump(data, handle, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, os.path.join(self.path, INDEX_NAME))
+        self.index_dirty = False
+
+    def close(self, wait=False):
+        self.flush_all()
+        for chapter in self._loaded.values():
+            if chapter.writer is not None:
+                if wait:
+                    chapter.writer.close()
+                else:
+                    chapter.writer.request_close()
+                chapter.writer = None
+        self._loaded.clear()
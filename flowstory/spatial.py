@@ -0,0 +1,149 @@
+# Índice espacial em grade uniforme sobre os retângulos das bolhas.
+#
+# Cada bolha fica registrada nas células da grade que ela toca. Um clique só
+# olha as bolhas da célula embaixo do mouse, e uma seleção por retângulo só as
+# células cobertas por ele. Mover uma bolha só mexe na grade quando ela troca
+# de célula, então arrastar continua barato mesmo com 10 mil bolhas.
+
+CELL_SIZE = 256
+_RINGS = []   # anel -> deslocamentos (i, j) da borda, do mais perto ao mais longe
+
+
+def _ring(ring):
+    while len(_RINGS) <= ring:
+        r = len(_RINGS)
+        offsets = [(i, j) for i in range(-r, r + 1) for j in range(-r, r + 1)
+                   if max(abs(i), abs(j)) == r]
+        offsets.sort(key=lambda offset: offset[0] ** 2 + offset[1] ** 2)
+        _RINGS.append(offsets)
+    return _RINGS[ring]
+
+
+class SpatialGrid:
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells = {}    # (coluna, linha) -> ids das bolhas
+        self._bounds = {}   # id -> (x1, y1, x2, y2)
+        self._spans = {}    # id -> (col1, lin1, col2, lin2)
+
+    def __len__(self):
+        return len(self._bounds)
+
+    def __contains__(self, item_id):
+        return item_id in self._bounds
+
+    def bounds(self, item_id):
+        return self._bounds[item_id]
+
+    def _span(self, x1, y1, x2, y2):
+        size = self.cell_size
+        return (int(x1 // size), int(y1 // size), int(x2 // size), int(y2 // size))
+
+    def _cells_in(self, span):
+        col1, row1, col2, row2 = span
+        for col in range(col1, col2 + 1):
+            for row in range(row1, row2 + 1):
+                yield (col, row)
+
+    def insert(self, item_id, bounds):
+        span = self._span(*bounds)
+        self._bounds[item_id] = bounds
+        self._spans[item_id] = span
+        for cell in self._cells_in(span):
+            self._cells.setdefault(cell, set()).add(item_id)
+
+    def remove(self, item_id):
+        span = self._spans.pop(item_id, None)
+        if span is None:
+            return
+        del self._bounds[item_id]
+        for cell in self._cells_in(span):
+            members = self._cells[cell]
+            members.discard(item_id)
+            if not members:
+                del self._cells[cell]
+
+    def update(self, item_id, bounds):
+        old_span = self._spans.get(item_id)
+        span = self._span(*bounds)
+        if old_span == span:
+            self._bounds[item_id] = bounds
+            return
+        self.remove(item_id)
+        self.insert(item_id, bounds)
+
+    def clear(self):
+        self._cells.clear()
+        self._bounds.clear()
+        self._spans.clear()
+
+    def query(self, x1, y1, x2, y2):
+        # Ids das bolhas que encostam no retângulo
+        found = set()
+        cells = self._cells
+        bounds = self._bounds
+        for cell in self._cells_in(self._span(x1, y1, x2, y2)):
+            for item_id in cells.get(cell, ()):
+                if item_id in found:
+                    continue
+                bx1, by1, bx2, by2 = bounds[item_id]
+                if bx1 < x2 and bx2 > x1 and by1 < y2 and by2 > y1:
+                    found.add(item_id)
+        return found
+
+    def occupied(self, x1, y1, x2, y2):
+        # Como query(), mas para na primeira bolha encontrada
+        cells = self._cells
+        bounds = self._bounds
+        for cell in self._cells_in(self._span(x1, y1, x2, y2)):
+            for item_id in cells.get(cell, ()):
+                bx1, by1, bx2, by2 = bounds[item_id]
+                if bx1 < x2 and bx2 > x1 and by1 < y2 and by2 > y1:
+                    return True
+        return False
+
+    def hit(self, x, y):
+        # Bolha embaixo do ponto; se houver várias, a de cima (a mais recente)
+        cell = (int(x // self.cell_size), int(y // self.cell_size))
+        best = None
+        for item_id in self._cells.get(cell, ()):
+            x1, y1, x2, y2 = self._bounds[item_id]
+            if x1 <= x <= x2 and y1 <= y <= y2 and (best is None or item_id > best):
+                best = item_id
+        return best
+
+    def free_spot(self, x, y, width, height, gap=20, max_rings=50):
+        # Canto de cima de um retângulo width x height que não encosta em nada, o mais
+        # perto possível de (x, y): testa posições em anéis cada vez maiores em volta
+        step_x = width + gap
+        step_y = height + gap
+        for ring in range(max_rings):
+            for i, j in _ring(ring):
+                left = x + i * step_x
+                top = y + j * step_y
+                if left < 0 or top < 0:
+                    continue
+                if not self.occupied(left - gap, top - gap, left + width + gap, top + height + gap):
+                    return left, top
+        return x, y
+
+    def overlaps(self, item_id):
+        found = self.query(*self._bounds[item_id])
+        found.discard(item_id)
+        return found
+
+    def attach(self, graph):
+        # Mantém a grade em dia com o grafo da história
+        for node in graph:
+            self.insert(node.id, node.bounds())
+        graph.listeners.append(self.on_graph_event)
+
+    def on_graph_event(self, event, *args):
+        if event == 'add':
+            self.insert(args[0].id, args[0].bounds())
+        elif event == 'move':
+            self.update(args[0].id, args[0].bounds())
+        elif event == 'remove':
+            self.remove(args[0].id)
+        elif event == 'clear':
+            self.clear()
@@ -0,0 +1,35 @@
+# Relatório de inicialização (python flowstory-1.0.1.py --profile-startup).
+#
+# O script anota um instante no topo do arquivo, antes de qualquer import, e
+# cada etapa da abertura marca o fim da sua parte com mark(). No primeiro
+# quadro desenhado, report() mostra quanto cada etapa levou e o acumulado.
+
+import time
+
+
+class StartupProfile:
+    def __init__(self, started=None, cpu_before=None):
+        self.started = time.perf_counter() if started is None else started
+        # CPU gasta antes da primeira linha do script: o próprio interpretador subindo
+        self.cpu_before = cpu_before
+        self.marks = []
+        self._last = self.started
+
+    def mark(self, name, at=None):
+        now = time.perf_counter() if at is None else at
+        self.marks.append((name, now - self._last))
+        self._last = now
+
+    def total(self):
+        return self._last - self.started
+
+    def report(self):
+        lines = ["Inicialização do FlowStory", f"{'etapa':<28}{'ms':>9}{'acumulado':>12}"]
+        if self.cpu_before is not None:
+            lines.append(f"{'(interpretador, CPU)':<28}{self.cpu_before * 1000:>9.1f}{'':>12}")
+        elapsed = 0.0
+        for name, seconds in self.marks:
+            elapsed += seconds
+            lines.append(f"{name:<28}{seconds * 1000:>9.1f}{elapsed * 1000:>12.1f}")
+        lines.append(f"{'total até o primeiro quadro':<28}{self.total() * 1000:>9.1f}")
+        return '\n'.join(lines)
@@ -0,0 +1,257 @@
+# Relógio único de quadros para o preview e a reprodução automática.
+#
+# Em vez de um root.after() por evento, tudo que tem hora marcada entra numa
+# fila de prioridade (heapq) de FrameScheduler, com o tempo de
+# time.monotonic(). TkFrameClock mantém um único after() ligado enquanto a
+# fila tem algo: a cada quadro roda o que já venceu, na ordem. Quadro que
+# chegou atrasado roda de uma vez tudo o que venceu nesse meio tempo; se o
+# quadro demorou mais que o intervalo, os quadros perdidos são pulados e o
+# próximo cai de volta na grade (origem + k * intervalo), sem acumular fila.
+#
+# Autoplay toca um StoryRunner sobre esse relógio. A hora de cada evento é a
+# hora do anterior mais a duração dele, e não "agora + duração": os atrasos
+# de um quadro não se somam ao longo de um episódio inteiro.
+
+import heapq
+import itertools
+import time
+
+from flowstory.metrics import METRICS
+from flowstory.runtime import StoryError
+
+FRAME_RATE = 60
+# Autoplay: tempo de leitura de uma fala e duração das transições, em segundos
+READ_BASE = 1.2
+READ_PER_CHAR = 0.045
+TRANSITION_SECONDS = 0.5
+# Atraso acima disso (tela presa, computador suspenso) não é recuperado: a linha do tempo recomeça de agora
+MAX_CATCH_UP = 0.25
+
+
+class FrameScheduler:
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._queue = []           # [hora, ordem, função, args, viva]
+        self._keys = {}            # chave -> entrada pendente com essa chave
+        self._order = itertools.count()
+        self.wake = None           # chamado quando a fila deixa de estar vazia
+
+    def __len__(self):
+        return sum(1 for entry in self._queue if entry[4])
+
+    def next_due(self):
+        queue = self._queue
+        while queue and not queue[0][4]:
+            heapq.heappop(queue)
+        return queue[0][0] if queue else None
+
+    def call_at(self, due, callback, *args, key=None):
+        # Com key, a entrada pendente de mesma chave é substituída (várias
+        # atualizações seguidas da mesma coisa viram uma só)
+        if key is not None:
+            self.cancel(self._keys.get(key))
+        entry = [due, next(self._order), callback, args, True]
+        if key is not None:
+            self._keys[key] = entry
+            entry.append(key)
+        heapq.heappush(self._queue, entry)
+        # Só quem passou a ser o primeiro da fila pode precisar de um quadro mais cedo
+        if self.wake is not None and self.next_due() is not None and self._queue[0] is entry:
+            self.wake()
+        return entry
+
+    def call_later(self, delay, callback, *args, key=None):
+        return self.call_at(self.clock() + delay, callback, *args, key=key)
+
+    def cancel(self, entry):
+        if entry is None or not entry[4]:
+            return
+        entry[4] = False
+        if len(entry) > 5 and self._keys.get(entry[5]) is entry:
+            del self._keys[entry[5]]
+
+    def clear(self):
+        for entry in self._queue:
+            entry[4] = False
+        self._queue = []
+        self._keys = {}
+
+    def tick(self, now=None):
+        # Roda tudo o que venceu até now; o que for agendado durante o quadro
+        # para uma hora já vencida roda no mesmo quadro
+        if now is None:
+            now = self.clock()
+        queue = self._queue
+        ran = 0
+        while queue and queue[0][0] <= now:
+            entry = heapq.heappop(queue)
+            if not entry[4]:
+                continue
+            self.cancel(entry)
+            entry[2](*entry[3])
+            ran += 1
+        return ran
+
+
+class TkFrameClock:
+    # Um único after() para o scheduler inteiro, alinhado à grade de quadros
+
+    def __init__(self, root, scheduler, frame_rate=FRAME_RATE, metrics=METRICS):
+        self.root = root
+        self.scheduler = scheduler
+        self.period = 1.0 / frame_rate
+        self.metrics = metrics
+        self.tick_time = metrics.histogram('timeline.tick')
+        self.origin = scheduler.clock()
+        self._job = None
+        self._job_due = None
+        self._ticking = False
+        scheduler.wake = self.wake
+
+    def _frame_for(self, when):
+        # Borda de quadro mais próxima de when (o evento aparece no quadro mais perto da hora dele)
+        frames = max(0, round((when - self.origin) / self.period))
+        return self.origin + frames * self.period
+
+    def wake(self):
+        due = self.scheduler.next_due()
+        if due is None or self._ticking:
+            # Durante um quadro, _frame() agenda o próximo ao terminar
+            return
+        frame = max(self._frame_for(due), self.scheduler.clock())
+        if self._job is not None:
+            if self._job_due <= frame:
+                return
+            self.root.after_cancel(self._job)
+        self._schedule(frame)
+
+    def _schedule(self, frame):
+        delay_ms = max(0, int(round((frame - self.scheduler.clock()) * 1000)))
+        self._job_due = frame
+        self._job = self.root.after(delay_ms, self._frame)
+
+    def _frame(self):
+        self._job = None
+        clock = self.scheduler.clock
+        started = clock()
+        # Meio quadro de folga: o after() do Tk tem resolução de 1 ms e pode chegar um pouco antes
+        self._ticking = True
+        try:
+            self.scheduler.tick(started + self.period / 2)
+        finally:
+            self._ticking = False
+        finished = clock()
+        self.tick_time.record((finished - started) * 1_000_000)
+
+        due = self.scheduler.next_due()
+        if due is None:
+            return          # fila vazia: o relógio dorme até o próximo wake()
+        # Próxima borda depois do fim deste quadro; se o quadro demorou mais que o
+        # intervalo, as bordas que passaram são puladas em vez de viradas em fila
+        frames = int((finished - self.origin) / self.period) + 1
+        skipped = frames - int((started - self.origin) / self.period) - 1
+        if skipped > 0:
+            self.metrics.count('timeline.skipped', skipped)
+        self._schedule(max(self.origin + frames * self.period, self._frame_for(due)))
+
+    def stop(self):
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+        self.scheduler.wake = None
+
+
+def reading_time(text, speed=1.0):
+    return (READ_BASE + READ_PER_CHAR * len(text)) / speed
+
+
+class Autoplay:
+    # Toca um StoryRunner no relógio do scheduler. present(evento) mostra cada
+    # evento do runner na tela, mais ('error', mensagem) se a história quebrar;
+    # as escolhas param a reprodução até choose()
+
+    def __init__(self, runner, scheduler, present, speed=1.0):
+        self.runner = runner
+        self.scheduler = scheduler
+        self.present = present
+        self.speed = speed
+        self.automatic = False     # falas avançam sozinhas
+        self.waiting = False       # há um "Tempo de Slide" ou transição correndo
+        self.cursor = None         # hora marcada do próximo evento
+        self._entry = None
+
+    def playing(self):
+        return self._entry is not None
+
+    def set_automatic(self, automatic):
+        self.automatic = automatic
+        if not automatic and not self.waiting:
+            # A fala na tela volta a esperar pelo botão
+            self.scheduler.cancel(self._entry)
+            self._entry = None
+        elif automatic and not self.playing() and not self.runner.finished \
+                and self.runner.choices is None:
+            self._at(self.scheduler.clock())
+
+    def advance(self):
+        # Botão "Avançar": passa a fala agora (não durante um tempo de slide)
+        if self.waiting or self.runner.choices is not None:
+            return
+        self.scheduler.cancel(self._entry)
+        self._entry = None
+        self.cursor = self.scheduler.clock()
+        self._step()
+
+    def choose(self, option):
+        self.runner.choose(option)
+        self.cursor = self.scheduler.clock()
+        self._step()
+
+    def stop(self):
+        self.scheduler.cancel(self._entry)
+        self._entry = None
+        self.waiting = False
+
+    def _at(self, due):
+        now = self.scheduler.clock()
+        if due < now - MAX_CATCH_UP:
+            due = now
+        self.cursor = due
+        self._entry = self.scheduler.call_at(due, self._fire)
+
+    def _fire(self):
+        self._entry = None
+        self.waiting = False
+        self._step()
+
+    def _step(self):
+        # Eventos sem duração saem no mesmo quadro; o primeiro com duração marca a próxima hora
+        while True:
+            try:
+                event = self.runner.step()
+            except Exception as error:
+                # Dentro de um after(): uma exceção solta só congelaria o preview
+                message = str(error) if isinstance(error, StoryError) \
+                    else f"{type(error).__name__}: {error}"
+                self.runner.stop()
+                self.present(('error', message))
+                return
+            if event is None:
+                self.present(('end',))
+                return
+            self.present(event)
+            kind = event[0]
+            if kind in ('end', 'choice'):
+                return
+            if kind == 'wait':
+                self.waiting = True
+                self._at(self.cursor + event[1] / self.speed)
+                return
+            if kind == 'transition':
+                self.waiting = True
+                self._at(self.cursor + TRANSITION_SECONDS / self.speed)
+                return
+            if kind == 'line':
+                if self.automatic:
+                    self._at(self.cursor + reading_time(event[2], self.speed))
+                return
@@ -0,0 +1,113 @@
+import time
+
+from flowstory.analysis import LiveAnalyzer, analyze
+from flowstory.bench import make_story
+from flowstory.graph import StoryGraph, EDGE_THEN, EDGE_ELSE
+
+
+def chain(graph, *kinds):
+    nodes = [graph.add_node(kind) for kind in kinds]
+    for src, dst in zip(nodes, nodes[1:]):
+        graph.connect(src.id, dst.id)
+    return nodes
+
+
+def wait_report(analyzer, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        report = analyzer.poll()
+        if report is not None:
+            return report
+        time.sleep(0.005)
+    raise AssertionError("a análise não terminou")
+
+
+def test_clean_story():
+    graph = StoryGraph()
+    chain(graph, "Cenário", "Diálogo", "Parar Tudo")
+    report = analyze(graph)
+    assert report.is_clean()
+    assert len(report.endings) == 1
+    assert report.summary() == "1 final(is)"
+
+
+def test_unreachable_and_dead_ends():
+    graph = StoryGraph()
+    start, middle, end = chain(graph, "Cenário", "Diálogo", "Parar Tudo")
+    loose, = chain(graph, "Diálogo")
+    graph.connect(loose.id, end.id)
+    stray = graph.add_node("Diálogo")
+    graph.connect(middle.id, stray.id)
+    report = analyze(graph, start=start.id)
+    assert report.unreachable == [loose.id]
+    assert report.dead_ends == [stray.id]
+    assert report.problem_nodes() == {loose.id, stray.id}
+    assert "1 inalcançável(is)" in report.summary() and "1 sem saída" in report.summary()
+
+
+def test_if_missing_a_branch_is_a_dead_end():
+    graph = StoryGraph()
+    test = graph.add_node("Se", "coragem > 1")
+    then_end = graph.add_node("Parar Tudo")
+    graph.connect(test.id, then_end.id, EDGE_THEN)
+    assert analyze(graph).dead_ends == [test.id]
+    else_end = graph.add_node("Parar Tudo")
+    graph.connect(test.id, else_end.id, EDGE_ELSE)
+    assert analyze(graph).is_clean()
+
+
+def test_loop_without_exit_is_trapped_but_loop_with_exit_is_not():
+    graph = StoryGraph()
+    start, a, b = chain(graph, "Cenário", "Diálogo", "Diálogo")
+    graph.connect(b.id, a.id)
+    report = analyze(graph)
+    assert report.trapped_cycles == [[a.id, b.id]]
+    assert report.dead_ends == []
+
+    end = graph.add_node("Parar Tudo")
+    graph.connect(b.id, end.id)
+    assert analyze(graph).is_clean()
+
+
+def test_self_loop_is_trapped():
+    graph = StoryGraph()
+    start, = chain(graph, "Cenário")
+    spin = graph.add_node("Diálogo")
+    graph.connect(start.id, spin.id)
+    graph.connect(spin.id, spin.id)
+    assert analyze(graph).trapped_cycles == [[spin.id]]
+
+
+def test_endings_are_counted_once_each():
+    graph = make_story(2000, seed=1)
+    report = analyze(graph)
+    assert report.is_clean()
+    assert len(report.endings) == 1
+    assert len(report.reachable) == len(graph)
+
+
+def test_live_analyzer_reanalyzes_only_after_structural_changes():
+    graph = StoryGraph()
+    a, b = chain(graph, "Cenário", "Diálogo")
+    analyzer = LiveAnalyzer(graph)
+    first = wait_report(analyzer)
+    assert first.dead_ends == [b.id]
+    graph.move_node(b.id, 10, 10)
+    graph.set_text(b.id, "Ana: oi")
+    assert analyzer.poll() is first
+    end = graph.add_node("Parar Tudo")
+    graph.connect(b.id, end.id)
+    assert analyzer.poll() is None
+    assert wait_report(analyzer).is_clean()
+
+
+def test_live_analyzer_drops_a_result_from_an_older_generation():
+    graph = make_story(20000, seed=2)
+    analyzer = LiveAnalyzer(graph)
+    assert analyzer.poll() is None
+    # Enquanto a thread analisa, a estrutura muda
+    extra = graph.add_node("Diálogo")
+    graph.connect(graph.start_node(), extra.id)
+    report = wait_report(analyzer, timeout=30)
+    assert extra.id in report.dead_ends
+    assert report is analyzer.refresh()
@@ -0,0 +1,61 @@
+import hashlib
+
+from flowstory import assets
+from flowstory.assets import AssetStore, ThumbnailCache, hash_file, open_buffer
+
+
+def test_same_content_is_stored_once(tmp_path):
+    store = AssetStore(str(tmp_path / 'assets'))
+    first = tmp_path / 'fundo.png'
+    copy = tmp_path / 'outro-nome.png'
+    first.write_bytes(b'imagem' * 100)
+    copy.write_bytes(b'imagem' * 100)
+    digest, new = store.import_file(str(first))
+    assert new and digest == hashlib.sha256(b'imagem' * 100).hexdigest()
+    assert store.import_file(str(copy)) == (digest, False)
+    assert digest in store and store.size(digest) == 600
+    assert store.path(digest).endswith(digest[2:])
+    assert 'f' * 64 not in store
+
+
+def test_large_files_are_mapped(tmp_path, monkeypatch):
+    monkeypatch.setattr(assets, 'MMAP_THRESHOLD', 1024)
+    small = tmp_path / 'pequeno.bin'
+    large = tmp_path / 'grande.bin'
+    small.write_bytes(b'a' * 100)
+    large.write_bytes(b'b' * 5000)
+    with open_buffer(str(small)) as data:
+        assert isinstance(data, bytes)
+    with open_buffer(str(large)) as data:
+        assert not isinstance(data, bytes) and data[:3] == b'bbb' and len(data) == 5000
+    assert hash_file(str(large)) == hashlib.sha256(b'b' * 5000).hexdigest()
+
+
+def test_thumbnail_cache_is_lru_by_bytes(tmp_path):
+    store = AssetStore(str(tmp_path))
+    decoded = []
+
+    def decoder(path, box):
+        decoded.append((path, box))
+        return (f"mini-{box}", 40)
+
+    cache = ThumbnailCache(store, decoder, max_bytes=100)
+    cache.get('a' * 64)
+    cache.get('b' * 64)
+    cache.get('a' * 64)
+    assert (cache.hits, cache.misses) == (1, 2)
+    # A terceira passa do limite: sai a usada há mais tempo ("b")
+    cache.get('c' * 64)
+    assert len(cache) == 2 and cache.size == 80
+    cache.get('a' * 64)
+    assert cache.hits == 2
+    cache.get('b' * 64)
+    assert cache.misses == 4
+    # Tamanhos diferentes são entradas diferentes
+    assert cache.get('a' * 64, box=48) == "mini-48"
+
+
+def test_undecodable_images_are_not_cached(tmp_path):
+    cache = ThumbnailCache(AssetStore(str(tmp_path)), lambda path, box: None)
+    assert cache.get('a' * 64) is None
+    assert len(cache) == 0 and cache.misses == 1
@@ -0,0 +1,78 @@
+import json
+import os
+
+from flowstory.batch import MANIFEST_NAME, find_projects, main, run
+from flowstory.graph import StoryGraph, EDGE_NEXT
+from flowstory.journal import write_snapshot
+from flowstory.series import SeriesLibrary
+
+
+def save(path, title, lines):
+    graph = StoryGraph()
+    nodes = [graph.add_node("Diálogo", f"Ana: {line}") for line in lines]
+    for src, dst in zip(nodes, nodes[1:]):
+        graph.connect(src.id, dst.id, EDGE_NEXT)
+    write_snapshot(path, {'title': title}, graph)
+
+
+def projects(root):
+    os.makedirs(root / 'pasta')
+    save(str(root / 'um.flow'), "Um", ["oi", "tchau"])
+    save(str(root / 'pasta' / 'dois.flow'), "Dois", ["olá"])
+    series = SeriesLibrary.create(str(root / 'serie.flowseries'), {'title': "Série"})
+    for title in ("Piloto", "Final"):
+        chapter = series.load(series.add_chapter(title).id)
+        chapter.graph.add_node("Diálogo", f"Bento: {title}")
+    series.close(wait=True)
+
+
+def test_finds_stories_and_series_without_entering_them(tmp_path):
+    projects(tmp_path)
+    assert find_projects(str(tmp_path)) == [os.path.join('pasta', 'dois.flow'), 'serie.flowseries',
+                                            'um.flow']
+
+
+def test_unchanged_projects_are_skipped(tmp_path):
+    source, output = tmp_path / 'src', tmp_path / 'out'
+    projects(source)
+    options = dict(jobs=1, assets_dir=str(tmp_path / 'assets'), cache_dir=str(tmp_path / 'cache'))
+    first = run(str(source), str(output), **options)
+    assert [result['status'] for result in first.values()] == ['ok', 'ok', 'ok']
+    assert first['serie.flowseries']['bubbles'] == 2
+    assert os.path.exists(output / 'serie.zip') and os.path.exists(output / 'pasta' / 'dois.zip')
+    with open(output / MANIFEST_NAME, encoding='utf-8') as handle:
+        assert sorted(json.load(handle)) == list(first)
+
+    save(str(source / 'um.flow'), "Um", ["mudou"])
+    second = run(str(source), str(output), **options)
+    assert {name: result['status'] for name, result in second.items()} == {
+        os.path.join('pasta', 'dois.flow'): 'pulado', 'serie.flowseries': 'pulado', 'um.flow': 'ok'}
+    forced = run(str(source), str(output), force=True, **options)
+    assert {result['status'] for result in forced.values()} == {'ok'}
+
+
+def test_a_broken_project_is_an_error_row(tmp_path):
+    source, output = tmp_path / 'src', tmp_path / 'out'
+    projects(source)
+    (source / 'quebrado.flow').write_text("[]", encoding='utf-8')
+    results = run(str(source), str(output), 'jsonl', jobs=1, assets_dir=str(tmp_path / 'assets'))
+    assert results['quebrado.flow']['status'] == 'erro' and results['quebrado.flow']['error']
+    # Websérie só sai como jogo
+    assert results['serie.flowseries']['status'] == 'erro'
+    assert results['um.flow']['status'] == 'ok'
+    with open(output / 'um.jsonl', encoding='utf-8') as handle:
+        assert len(handle.readlines()) == 4
+    with open(output / MANIFEST_NAME, encoding='utf-8') as handle:
+        assert sorted(json.load(handle)) == [os.path.join('pasta', 'dois.flow'), 'um.flow']
+
+
+def test_main_reports_and_fails_on_errors(tmp_path, capsys):
+    source = tmp_path / 'src'
+    projects(source)
+    summary = tmp_path / 'resumo.json'
+    code = main([str(source), str(tmp_path / 'out'), '--format', 'jsonl', '--jobs', '1',
+                 '--assets', str(tmp_path / 'assets'), '--summary', str(summary)])
+    assert code == 1
+    assert "3 projeto(s)" in capsys.readouterr().out
+    with open(summary, encoding='utf-8') as handle:
+        assert len(json.load(handle)['projects']) == 3
@@ -0,0 +1,62 @@
+from flowstory.chat import ChatEngine
+
+
+def messages(first, last, nick="ana"):
+    return [(number, nick, f"msg {number}") for number in range(first, last + 1)]
+
+
+def test_a_burst_becomes_one_frame():
+    chat = ChatEngine(capacity=10)
+    assert chat.receive(messages(1, 3))
+    assert len(chat) == 0
+    added, trimmed = chat.take_frame()
+    assert [m[0] for m in added] == [1, 2, 3] and trimmed == 0
+    assert chat.take_frame() == ([], 0)
+
+
+def test_repeated_ids_are_ignored():
+    chat = ChatEngine()
+    chat.receive(messages(1, 3))
+    chat.receive(messages(2, 5))
+    added, _ = chat.take_frame()
+    assert [m[0] for m in added] == [1, 2, 3, 4, 5]
+    # Mensagens locais sem id sempre entram
+    chat.receive([(None, "eu", "enviando...")])
+    assert chat.take_frame()[0] == [(None, "eu", "enviando...")]
+
+
+def test_the_window_is_a_fixed_ring():
+    chat = ChatEngine(capacity=10)
+    chat.receive(messages(1, 8))
+    chat.take_frame()
+    chat.receive(messages(9, 30))
+    added, trimmed = chat.take_frame()
+    assert [m[0] for m in added] == list(range(21, 31))
+    assert trimmed == 8 and len(chat) == 10 and chat.oldest_id() == 21
+
+
+def test_older_history_goes_on_top_and_stops_following_live():
+    chat = ChatEngine(capacity=10, page_size=5)
+    chat.receive(messages(20, 27))
+    chat.take_frame()
+    older, trimmed = chat.prepend(messages(14, 21))
+    assert [m[0] for m in older] == list(range(14, 20)) and trimmed == 4
+    assert [m[0] for m in chat.window] == list(range(14, 24))
+    assert not chat.live and chat.has_older
+
+    # Fora do ao vivo, o que chega espera sem mexer na tela
+    assert not chat.receive(messages(28, 29))
+    assert chat.take_frame() == ([], 0)
+
+    shown = chat.jump_to_latest(messages(20, 29))
+    assert [m[0] for m in shown] == list(range(20, 30)) and chat.live
+    chat.receive(messages(29, 31))
+    assert [m[0] for m in chat.take_frame()[0]] == [30, 31]
+
+
+def test_a_short_page_means_the_history_is_over():
+    chat = ChatEngine(page_size=50)
+    chat.receive(messages(10, 12))
+    chat.take_frame()
+    chat.prepend(messages(1, 9))
+    assert not chat.has_older and chat.oldest_id() == 1
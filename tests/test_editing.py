@@ -0,0 +1,86 @@
+from flowstory.editing import add_bubble, apply_positions
+from flowstory.editorbench import EditorCore, compare, main, measure
+from flowstory.graph import BUBBLE_HEIGHT, BUBBLE_WIDTH, EDGE_NEXT, EDGE_THEN, StoryGraph
+from flowstory.history import AddBubble, PlacedBubble, UndoHistory
+from flowstory.spatial import SpatialGrid
+
+
+def editor():
+    graph, spatial = StoryGraph(), SpatialGrid()
+    spatial.attach(graph)
+    return graph, spatial, UndoHistory()
+
+
+def overlaps(a, b):
+    return (abs(a.x - b.x) < BUBBLE_WIDTH and abs(a.y - b.y) < BUBBLE_HEIGHT)
+
+
+def test_new_bubbles_go_below_the_parent_without_overlapping():
+    graph, spatial, history = editor()
+    root = add_bubble(graph, spatial, history, "Se", drop_point=lambda: (100, 100))
+    assert (root.x, root.y) == (100, 100)
+    children = [add_bubble(graph, spatial, history, "Então", root.id) for _ in range(3)]
+    assert children[0].y > root.y
+    nodes = [root] + children
+    assert not any(overlaps(a, b) for a in nodes for b in nodes if a is not b)
+    assert [edge.label for edge in graph.out_edges(root.id)] == [EDGE_THEN] * 3
+    assert len(history) == 4 and type(history.undo(graph)) is AddBubble
+
+
+def test_end_bubbles_get_no_outgoing_link():
+    graph, spatial, history = editor()
+    end = add_bubble(graph, spatial, history, "Parar Tudo", drop_point=lambda: (0, 0))
+    after = add_bubble(graph, spatial, history, "Diálogo", end.id, placed=True)
+    assert graph.out_edges(end.id) == []
+    assert type(history.undo(graph)) is PlacedBubble and after.id not in graph
+
+
+def test_positions_are_applied_in_batches():
+    graph = StoryGraph()
+    nodes = [graph.add_node("Diálogo") for _ in range(5)]
+    positions = iter([(node.id, (10 * node.id, 0)) for node in nodes] + [(999, (0, 0))])
+    moves = {}
+    assert not apply_positions(graph, positions, moves, limit=2)
+    assert len(moves) == 2
+    assert not apply_positions(graph, positions, moves, limit=2)
+    assert not apply_positions(graph, positions, moves, limit=2)
+    # O último lote acabou exatamente no limite: só o próximo descobre que não sobrou nada
+    assert apply_positions(graph, positions, moves, limit=2)
+    assert len(moves) == 5
+    assert moves[nodes[4].id] == ((0, 0), (10 * nodes[4].id, 0))
+    assert graph.get(nodes[4].id).x == 10 * nodes[4].id
+
+
+def test_placing_with_auto_layout_is_one_undo_step():
+    core = EditorCore()
+    first = core.add_bubble("Diálogo", "Ana: oi")
+    core.auto_layout = True
+    placed = core.add_bubble("Diálogo")
+    steps = len(core.history)
+    core.place({placed.id})
+    assert len(core.history) == steps
+    core.history.undo(core.graph)
+    assert placed.id not in core.graph and core.graph.get(first.id).text == "Ana: oi"
+    assert [edge.label for edge in core.graph.out_edges(first.id)] == []
+    core.history.redo(core.graph)
+    assert [edge.dst for edge in core.graph.out_edges(first.id)] == [placed.id]
+    assert core.graph.out_edges(first.id)[0].label == EDGE_NEXT
+
+
+def test_benchmark_is_deterministic_and_compares_against_a_baseline(tmp_path, capsys):
+    first, second = measure(150, seed=3, memory=False), measure(150, seed=3, memory=False)
+    assert first['build']['canvas_items'] == second['build']['canvas_items']
+    assert first['save']['journal_kb'] == second['save']['journal_kb']
+    assert first['place']['undo_steps'] == second['place']['undo_steps']
+
+    baseline = {'100': {'drag': {'p50_ms': 10.0, 'max_ms': 1.0, 'steps': 1}}}
+    slower = {'100': {'drag': {'p50_ms': 20.0, 'max_ms': 100.0, 'steps': 9}}}
+    noise = {'100': {'drag': {'p50_ms': 11.9, 'max_ms': 100.0, 'steps': 9}}}
+    assert compare(slower, baseline, 0.25) == ["100 bolhas, drag: p50_ms 10.00 -> 20.00"]
+    assert compare(noise, baseline, 0.25) == []
+
+    path = tmp_path / 'atual.json'
+    assert main(['--sizes', '100', '--no-memory', '--json', str(path)]) == 0
+    assert main(['--sizes', '100', '--no-memory', '--baseline', str(path),
+                 '--tolerance', '1000']) == 0
+    assert "100 bolhas" in capsys.readouterr().out
@@ -0,0 +1,95 @@
+import json
+import threading
+import zipfile
+
+import pytest
+
+from flowstory.export import (ExportCancelled, ExportJob, export_bundle, export_jsonl, export_story,
+                              snapshot)
+from flowstory.graph import StoryGraph, EDGE_THEN
+
+
+def small_story():
+    graph = StoryGraph()
+    a = graph.add_node("Se", "coragem > 1", 10, 20)
+    b = graph.add_node("Diálogo", "Ana: Olá, ação!", 10, 120, chapter=1)
+    graph.connect(a.id, b.id, EDGE_THEN)
+    return graph
+
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as handle:
+        return [json.loads(line) for line in handle]
+
+
+def test_jsonl_has_header_nodes_and_edges(tmp_path):
+    path = str(tmp_path / 'historia.jsonl')
+    graph = small_story()
+    export_story(path, {'title': 'T'}, graph)
+    records = read_jsonl(path)
+    header = records[0]
+    assert header['type'] == 'header' and header['project'] == {'title': 'T'}
+    assert (header['start'], header['nodes'], header['edges']) == (1, 2, 1)
+    assert records[2] == {'id': 2, 'kind': 'Diálogo', 'text': 'Ana: Olá, ação!', 'x': 10,
+                          'y': 120, 'chapter': 1, 'type': 'node'}
+    assert records[3] == {'src': 1, 'dst': 2, 'label': 'then', 'type': 'edge'}
+
+
+def test_snapshot_is_not_affected_by_later_edits(tmp_path):
+    graph = small_story()
+    nodes, edges, start = snapshot(graph)
+    graph.set_text(2, "mudou depois")
+    graph.move_node(2, 999, 999)
+    graph.disconnect(1, 2)
+    path = str(tmp_path / 'historia.jsonl')
+    export_jsonl(path, {}, nodes, edges, start)
+    records = read_jsonl(path)
+    assert records[2]['text'] == "Ana: Olá, ação!" and records[2]['x'] == 10
+    assert len(records) == 4
+
+
+def test_bundle_holds_player_story_and_assets_and_is_deterministic(tmp_path):
+    image = tmp_path / 'fundo.png'
+    image.write_bytes(bytes(range(256)) * 1000)
+    graph = small_story()
+    paths = [str(tmp_path / name) for name in ('a.zip', 'b.zip')]
+    progress = []
+    for path in paths:
+        export_story(path, {'title': 'T'}, graph, [('fundo.png', str(image))],
+                     progress=lambda fraction, message: progress.append(fraction))
+    with zipfile.ZipFile(paths[0]) as bundle:
+        assert sorted(bundle.namelist()) == ['assets/fundo.png', 'index.html', 'story.js']
+        assert bundle.read('assets/fundo.png') == image.read_bytes()
+        story = bundle.read('story.js').decode('utf-8')
+        assert story.startswith('window.FLOWSTORY_DATA = [')
+        assert '"text":"Ana: Olá, ação!"' in story
+    with open(paths[0], 'rb') as first, open(paths[1], 'rb') as second:
+        assert first.read() == second.read()
+    assert progress[-1] == 1.0
+
+
+def test_cancel_leaves_no_file(tmp_path):
+    graph = StoryGraph()
+    for index in range(500):
+        graph.add_node("Diálogo", f"fala {index}")
+    nodes, edges, start = snapshot(graph)
+    cancel = threading.Event()
+    cancel.set()
+    path = tmp_path / 'historia.zip'
+    with pytest.raises(ExportCancelled):
+        export_bundle(str(path), {}, nodes, edges, start, cancel=cancel)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_export_job_reports_success_and_failure(tmp_path):
+    graph = small_story()
+    job = ExportJob(str(tmp_path / 'historia.jsonl'), {}, graph)
+    job.wait(10)
+    fraction, message, finished, error = job.status()
+    assert finished and error is None and fraction == 1.0
+
+    job = ExportJob(str(tmp_path / 'historia.zip'), {}, graph, [('x.png', str(tmp_path / 'falta.png'))])
+    job.wait(10)
+    fraction, message, finished, error = job.status()
+    assert finished and isinstance(error, OSError)
+    assert not (tmp_path / 'historia.zip').exists()
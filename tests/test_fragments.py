@@ -0,0 +1,62 @@
+import pytest
+
+from flowstory.fragments import (BUILTIN_TEMPLATES, FRAGMENT_VERSION, TemplateLibrary, check_fragment,
+                                 copy_fragment, fragment_size, stamp)
+from flowstory.graph import BUBBLE_HEIGHT, BUBBLE_WIDTH, EDGE_NEXT, EDGE_THEN, StoryGraph
+from flowstory.runtime import StoryRunner, compile_story
+
+
+def test_copy_keeps_relative_positions_and_inner_links():
+    graph = StoryGraph()
+    a = graph.add_node("Se", "x > 1", 100, 200)
+    b = graph.add_node("Então", "", 150, 300)
+    outside = graph.add_node("Diálogo", "fora", 0, 0)
+    graph.connect(a.id, b.id, EDGE_THEN)
+    graph.connect(b.id, outside.id, EDGE_NEXT)
+    fragment = copy_fragment(graph, [b.id, a.id, 999])
+    assert fragment['nodes'] == [["Se", "x > 1", 0, 0], ["Então", "", 50, 100]]
+    assert fragment['edges'] == [[0, 1, EDGE_THEN]]
+    assert fragment_size(fragment) == (50 + BUBBLE_WIDTH, 100 + BUBBLE_HEIGHT)
+    assert copy_fragment(graph, [999]) is None
+
+    nodes, edges = stamp(graph, fragment, 1000, 1000, chapter=2)
+    assert [(n.x, n.y, n.chapter) for n in nodes] == [(1000, 1000, 2), (1050, 1100, 2)]
+    assert [(e.src, e.dst) for e in edges] == [(nodes[0].id, nodes[1].id)]
+    assert len(graph) == 5
+
+
+@pytest.mark.parametrize('name', list(BUILTIN_TEMPLATES))
+def test_builtin_templates_compile_and_run(name):
+    fragment = check_fragment(BUILTIN_TEMPLATES[name]())
+    graph = StoryGraph()
+    stamp(graph, fragment, 0, 0)
+    runner = StoryRunner(compile_story(graph))
+    assert runner.run(max_steps=10000) > 0
+    assert runner.finished
+
+
+@pytest.mark.parametrize('data', [
+    None,
+    {'version': FRAGMENT_VERSION + 1, 'nodes': []},
+    {'version': FRAGMENT_VERSION, 'nodes': 'x'},
+    {'version': FRAGMENT_VERSION, 'nodes': [["Diálogo", "", -1, 0]]},
+    {'version': FRAGMENT_VERSION, 'nodes': [["Diálogo", 3, 0, 0]]},
+    {'version': FRAGMENT_VERSION, 'nodes': [["Diálogo", ""]]},
+    {'version': FRAGMENT_VERSION, 'nodes': [["Diálogo", "", 0, 0]], 'edges': [[0, 1, "next"]]},
+    {'version': FRAGMENT_VERSION, 'nodes': [["Diálogo", "", "0", 0]]},
+])
+def test_bad_fragments_are_rejected(data):
+    with pytest.raises(ValueError):
+        check_fragment(data)
+
+
+def test_library_saves_and_lists_templates(tmp_path):
+    library = TemplateLibrary(str(tmp_path / 'modelos'))
+    assert library.saved() == []
+    fragment = {'version': FRAGMENT_VERSION, 'nodes': [["Diálogo", "Oi", 0, 0]], 'edges': []}
+    library.save("Meu/modelo", fragment)
+    (tmp_path / 'modelos' / 'quebrado.json').write_text("{", encoding='utf-8')
+    assert library.saved() == ["Meu/modelo"]
+    assert library.names() == list(BUILTIN_TEMPLATES) + ["Meu/modelo"]
+    assert library.load("Meu/modelo")['nodes'] == fragment['nodes']
+    assert library.load(next(iter(BUILTIN_TEMPLATES)))['version'] == FRAGMENT_VERSION
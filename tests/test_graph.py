@@ -0,0 +1,134 @@
+import pytest
+
+from flowstory.graph import (StoryGraph, EDGE_NEXT, EDGE_THEN, EDGE_ELSE, EDGE_ROUTE,
+                             edge_label_for)
+
+
+def chain(graph, *kinds):
+    nodes = [graph.add_node(kind) for kind in kinds]
+    for src, dst in zip(nodes, nodes[1:]):
+        graph.connect(src.id, dst.id)
+    return nodes
+
+
+def test_ids_grow_and_explicit_ids_move_the_counter():
+    graph = StoryGraph()
+    first = graph.add_node("Diálogo")
+    second = graph.add_node("Diálogo")
+    assert (first.id, second.id) == (1, 2)
+    graph.add_node("Cena", node_id=10)
+    assert graph.add_node("Cena").id == 11
+    with pytest.raises(ValueError):
+        graph.add_node("Cena", node_id=10)
+
+
+def test_successor_and_predecessor_indexes():
+    graph = StoryGraph()
+    a, b, c = chain(graph, "Se", "Diálogo", "Parar Tudo")
+    graph.connect(a.id, c.id, EDGE_ELSE)
+    assert graph.successors(a.id) == [b.id, c.id]
+    assert graph.predecessors(c.id) == [b.id, a.id]
+    assert [edge.label for edge in graph.in_edges(c.id)] == [EDGE_NEXT, EDGE_ELSE]
+    assert graph.edge_count() == 3
+    assert len(list(graph.edges())) == 3
+
+
+def test_connect_to_a_missing_bubble_fails():
+    graph = StoryGraph()
+    node = graph.add_node("Diálogo")
+    with pytest.raises(KeyError):
+        graph.connect(node.id, 99)
+
+
+def test_disconnect_by_label():
+    graph = StoryGraph()
+    a, b = chain(graph, "Se", "Diálogo")
+    graph.connect(a.id, b.id, EDGE_THEN)
+    removed = graph.disconnect(a.id, b.id, EDGE_THEN)
+    assert removed.label == EDGE_THEN
+    assert [edge.label for edge in graph.out_edges(a.id)] == [EDGE_NEXT]
+    assert graph.predecessors(b.id) == [a.id]
+    assert graph.disconnect(a.id, b.id, EDGE_ROUTE) is None
+
+
+def test_remove_node_cleans_both_indexes_and_restore_brings_it_back():
+    graph = StoryGraph()
+    a, b, c = chain(graph, "Diálogo", "Diálogo", "Diálogo")
+    graph.connect(b.id, b.id)
+    node, edges = graph.remove_node(b.id)
+    assert b.id not in graph
+    assert graph.successors(a.id) == []
+    assert graph.predecessors(c.id) == []
+    # O laço da bolha nela mesma aparece uma vez só
+    assert len(edges) == 3
+
+    graph.restore_node(node, edges)
+    assert graph.successors(a.id) == [b.id]
+    assert graph.predecessors(c.id) == [b.id]
+    assert sorted(graph.successors(b.id)) == sorted([b.id, c.id])
+
+
+def test_restore_nodes_links_edges_between_restored_bubbles():
+    graph = StoryGraph()
+    a, b = chain(graph, "Diálogo", "Diálogo")
+    removed_b = graph.remove_node(b.id)
+    removed_a = graph.remove_node(a.id)
+    edges = removed_a[1] + removed_b[1]
+    graph.restore_nodes([removed_b[0], removed_a[0]], list(dict.fromkeys(edges)))
+    assert graph.successors(a.id) == [b.id]
+
+
+def test_start_node_is_the_oldest_root():
+    graph = StoryGraph()
+    assert graph.start_node() is None
+    a, b = chain(graph, "Diálogo", "Diálogo")
+    loose = graph.add_node("Cena")
+    assert graph.roots() == [a.id, loose.id]
+    assert graph.start_node() == a.id
+    # Só laços: começa pela bolha mais antiga
+    graph.connect(b.id, a.id)
+    graph.connect(loose.id, loose.id)
+    assert graph.start_node() == a.id
+
+
+def test_changes_are_tracked_until_popped():
+    graph = StoryGraph()
+    a, b = chain(graph, "Diálogo", "Diálogo")
+    assert graph.pop_changes() == ({a.id, b.id}, {a.id})
+    assert not graph.has_changes()
+    graph.move_node(b.id, 30, 40)
+    graph.set_text(a.id, "Ana: oi")
+    assert graph.pop_changes() == ({a.id, b.id}, set())
+    graph.remove_node(b.id)
+    assert graph.pop_changes() == ({b.id}, {a.id})
+
+
+def test_listeners_see_every_change():
+    graph = StoryGraph()
+    events = []
+    graph.listeners.append(lambda event, *args: events.append(event))
+    a, b = chain(graph, "Diálogo", "Diálogo")
+    graph.move_node(a.id, 1, 2)
+    graph.set_text(a.id, "x")
+    graph.disconnect(a.id, b.id)
+    graph.remove_node(b.id)
+    graph.clear()
+    assert events == ['add', 'add', 'connect', 'move', 'text', 'disconnect', 'remove', 'clear']
+
+
+def test_dict_round_trip_keeps_ids_positions_and_labels():
+    graph = StoryGraph()
+    a = graph.add_node("Se", "coragem > 2", 10, 20, chapter=1)
+    b = graph.add_node("Então", x=10, y=100, node_id=7)
+    graph.connect(a.id, b.id, EDGE_THEN)
+    copy = StoryGraph.from_dict(graph.to_dict())
+    assert copy.to_dict() == graph.to_dict()
+    assert copy.get(7).x == 10 and copy.get(a.id).chapter == 1
+    assert copy.next_id == 8
+
+
+def test_edge_label_for_bubble_kind():
+    assert edge_label_for("Então") == EDGE_THEN
+    assert edge_label_for("Senão") == EDGE_ELSE
+    assert edge_label_for("Criar Rota") == EDGE_ROUTE
+    assert edge_label_for("Diálogo") == EDGE_NEXT
@@ -0,0 +1,166 @@
+from flowstory.graph import StoryGraph
+from flowstory.history import (AddBubble, AddBubbles, Batch, DeleteBubble, MoveBubbles, PlacedBubble,
+                               SetText, UndoHistory)
+
+
+def add(graph, history, kind="Diálogo", parent=None):
+    node = graph.add_node(kind)
+    edges = [graph.connect(parent.id, node.id)] if parent is not None else []
+    history.record(AddBubble(node, edges))
+    return node
+
+
+def test_undo_and_redo_an_added_bubble_with_its_link():
+    graph, history = StoryGraph(), UndoHistory()
+    a = add(graph, history)
+    b = add(graph, history, parent=a)
+    before = graph.to_dict()
+    assert history.undo(graph).node is b
+    assert b.id not in graph and graph.successors(a.id) == []
+    history.redo(graph)
+    assert graph.to_dict() == before
+
+
+def test_delete_restores_links_from_both_sides():
+    graph, history = StoryGraph(), UndoHistory()
+    a = add(graph, history)
+    b = add(graph, history, parent=a)
+    c = add(graph, history, parent=b)
+    before = graph.to_dict()
+    node, edges = graph.remove_node(b.id)
+    history.record(DeleteBubble(node, edges))
+    history.undo(graph)
+    assert graph.successors(a.id) == [b.id] and graph.successors(b.id) == [c.id]
+    history.redo(graph)
+    assert b.id not in graph
+    history.undo(graph)
+    assert sorted(map(str, graph.to_dict()['edges'])) == sorted(map(str, before['edges']))
+
+
+def test_drag_steps_merge_into_one_move():
+    graph, history = StoryGraph(), UndoHistory()
+    a = add(graph, history)
+    for step in range(1, 6):
+        old = (a.x, a.y)
+        graph.move_node(a.id, step * 10, step * 5)
+        history.record(MoveBubbles({a.id: (old, (a.x, a.y))}), merge=True)
+    assert len(history) == 2
+    history.undo(graph)
+    assert (a.x, a.y) == (0, 0)
+    history.redo(graph)
+    assert (a.x, a.y) == (50, 25)
+
+
+def test_moves_of_different_bubbles_do_not_merge():
+    graph, history = StoryGraph(), UndoHistory()
+    a = add(graph, history)
+    b = add(graph, history)
+    history.record(MoveBubbles({a.id: ((0, 0), (5, 5))}), merge=True)
+    history.record(MoveBubbles({b.id: ((0, 0), (5, 5))}), merge=True)
+    assert len(history) == 4
+
+
+def test_typing_merges_per_bubble():
+    graph, history = StoryGraph(), UndoHistory()
+    a = add(graph, history)
+    for text in ("A", "An", "Ana"):
+        old = a.text
+        graph.set_text(a.id, text)
+        history.record(SetText(a.id, old, text), merge=True)
+    assert len(history) == 2
+    history.undo(graph)
+    assert a.text == ""
+
+
+def test_a_new_edit_drops_the_redo_branch():
+    graph, history = StoryGraph(), UndoHistory()
+    add(graph, history)
+    add(graph, history)
+    history.undo(graph)
+    assert history.can_redo()
+    add(graph, history)
+    assert not history.can_redo()
+    assert history.redo(graph) is None
+
+
+def test_paste_is_one_step_and_redo_keeps_later_links():
+    graph, history = StoryGraph(), UndoHistory()
+    old = add(graph, history)
+    pasted = [graph.add_node("Diálogo") for _ in range(3)]
+    edges = [graph.connect(pasted[0].id, pasted[1].id), graph.connect(pasted[1].id, pasted[2].id)]
+    history.record(AddBubbles(pasted, edges, "colar 3 bolhas"))
+    # Ligação feita depois, de uma bolha antiga até uma colada
+    graph.connect(old.id, pasted[0].id)
+    assert history.undo(graph).describe() == "colar 3 bolhas"
+    assert len(graph) == 1 and graph.successors(old.id) == []
+    history.redo(graph)
+    assert graph.successors(old.id) == [pasted[0].id]
+    assert graph.successors(pasted[1].id) == [pasted[2].id]
+
+
+def test_batch_reverts_in_reverse_order():
+    graph, history = StoryGraph(), UndoHistory()
+    a = add(graph, history)
+    graph.move_node(a.id, 10, 10)
+    graph.set_text(a.id, "novo")
+    history.record(Batch([MoveBubbles({a.id: ((0, 0), (10, 10))}), SetText(a.id, "", "novo")],
+                         "editar"))
+    history.undo(graph)
+    assert (a.x, a.y, a.text) == (0, 0, "")
+    history.redo(graph)
+    assert (a.x, a.y, a.text) == (10, 10, "novo")
+
+
+def test_memory_cap_drops_the_oldest_steps():
+    graph, history = StoryGraph(), UndoHistory(max_bytes=2000)
+    for _ in range(100):
+        add(graph, history)
+    assert history.size <= 2000
+    assert 1 < len(history) < 100
+    while history.undo(graph):
+        pass
+    # Os passos mais antigos não voltam mais
+    assert len(graph) > 0
+
+
+def test_size_accounting_returns_to_zero():
+    graph, history = StoryGraph(), UndoHistory()
+    for _ in range(5):
+        add(graph, history)
+    history.undo(graph)
+    add(graph, history)
+    assert history.size == sum(entry[1] for entry in history._done)
+    history.clear()
+    assert history.size == 0 and not history.can_undo()
+
+
+def test_placed_bubble_takes_the_layout_moves_into_the_same_step():
+    graph, history = StoryGraph(), UndoHistory()
+    parent = graph.add_node("Diálogo", x=0, y=0)
+    child = graph.add_node("Diálogo", x=0, y=100)
+    node = graph.add_node("Diálogo", x=0, y=100)
+    edge = graph.connect(parent.id, node.id)
+    history.record(PlacedBubble(node, [edge]))
+    # O encaixe chega depois, em dois lotes, e entra no passo da adição
+    graph.move_node(node.id, 0, 200)
+    history.record(MoveBubbles({node.id: ((0, 100), (0, 200)), child.id: ((0, 100), (0, 300))}),
+                   merge=True)
+    graph.move_node(child.id, 0, 300)
+    graph.move_node(node.id, 50, 200)
+    history.record(MoveBubbles({node.id: ((0, 200), (50, 200))}), merge=True)
+    assert len(history) == 1
+
+    history.undo(graph)
+    assert node.id not in graph and (child.x, child.y) == (0, 100)
+    history.redo(graph)
+    assert (graph.get(node.id).x, graph.get(node.id).y) == (50, 200)
+    assert (child.x, child.y) == (0, 300) and graph.successors(parent.id) == [node.id]
+
+
+def test_placed_bubble_ignores_moves_of_other_bubbles():
+    graph, history = StoryGraph(), UndoHistory()
+    node = graph.add_node("Diálogo")
+    other = graph.add_node("Diálogo")
+    history.record(PlacedBubble(node))
+    history.record(MoveBubbles({other.id: ((0, 0), (10, 10))}), merge=True)
+    assert len(history) == 2
@@ -0,0 +1,148 @@
+import json
+import os
+import threading
+
+from flowstory.graph import StoryGraph, EDGE_THEN
+from flowstory.journal import (JOURNAL_SUFFIX, JournalWriter, apply_record, compact, encode_changes,
+                               load_project, read_journal, wait_closed, write_snapshot)
+
+
+def save(writer, graph, project=None):
+    writer.submit(encode_changes(graph, project))
+    writer.flush()
+
+
+def test_journal_replay_rebuilds_the_story(tmp_path):
+    path = str(tmp_path / 'historia.flow')
+    graph = StoryGraph()
+    writer = JournalWriter(path, reset=True)
+    a = graph.add_node("Se", "coragem > 1", 10, 20)
+    b = graph.add_node("Então", x=10, y=100)
+    graph.connect(a.id, b.id, EDGE_THEN)
+    save(writer, graph, {'title': 'Teste'})
+    graph.set_text(b.id, "Ana: vamos")
+    graph.move_node(a.id, 50, 60)
+    c = graph.add_node("Diálogo")
+    graph.remove_node(c.id)
+    save(writer, graph)
+    writer.close()
+
+    assert not os.path.exists(path)
+    project, loaded = load_project(path)
+    assert project == {'title': 'Teste'}
+    assert loaded.to_dict() == graph.to_dict()
+    assert not loaded.has_changes()
+
+
+def test_encode_changes_only_writes_what_changed():
+    graph = StoryGraph()
+    a = graph.add_node("Diálogo")
+    graph.add_node("Diálogo")
+    encode_changes(graph)
+    graph.set_text(a.id, "Bento: oi")
+    records = [json.loads(line) for line in encode_changes(graph).decode('utf-8').splitlines()]
+    assert records == [{'op': 'node', 'node': a.to_dict()}]
+    assert encode_changes(graph) == b''
+
+
+def test_records_are_idempotent():
+    graph = StoryGraph()
+    project = {}
+    records = [
+        {'op': 'node', 'node': {'id': 1, 'kind': 'Diálogo', 'text': 'a'}},
+        {'op': 'node', 'node': {'id': 2, 'kind': 'Diálogo', 'text': 'b'}},
+        {'op': 'edges', 'src': 1, 'edges': [[2, 'next']]},
+        {'op': 'project', 'data': {'title': 'x'}},
+    ]
+    for record in records + records:
+        apply_record(graph, project, record)
+    assert graph.successors(1) == [2]
+    assert len(graph) == 2 and project == {'title': 'x'}
+    apply_record(graph, project, {'op': 'del', 'id': 2})
+    apply_record(graph, project, {'op': 'del', 'id': 2})
+    assert graph.successors(1) == [] and 2 not in graph
+
+
+def test_a_cut_last_line_is_dropped(tmp_path):
+    journal = tmp_path / ('historia.flow' + JOURNAL_SUFFIX)
+    journal.write_text('{"op":"project","data":{"a":1}}\n{"op":"node","no', encoding='utf-8')
+    assert list(read_journal(str(journal))) == [{'op': 'project', 'data': {'a': 1}}]
+    project, graph = load_project(str(tmp_path / 'historia.flow'))
+    assert project == {'a': 1} and len(graph) == 0
+
+
+def test_compact_folds_the_journal_into_the_snapshot(tmp_path):
+    path = str(tmp_path / 'historia.flow')
+    graph = StoryGraph()
+    writer = JournalWriter(path, reset=True)
+    for index in range(20):
+        graph.add_node("Diálogo", f"fala {index}")
+    save(writer, graph, {'title': 'T'})
+    writer.request_compact()
+    writer.close()
+    assert os.path.getsize(path + JOURNAL_SUFFIX) == 0
+    project, loaded = load_project(path)
+    assert project == {'title': 'T'} and loaded.to_dict() == graph.to_dict()
+
+
+def test_writer_compacts_by_itself_past_the_size_limit(tmp_path):
+    path = str(tmp_path / 'historia.flow')
+    graph = StoryGraph()
+    writer = JournalWriter(path, reset=True, compact_bytes=200)
+    for index in range(10):
+        graph.add_node("Diálogo", "x" * 50)
+        save(writer, graph)
+    writer.close()
+    assert os.path.getsize(path + JOURNAL_SUFFIX) < 200
+    assert len(load_project(path)[1]) == 10
+
+
+def test_writer_survives_a_broken_snapshot(tmp_path):
+    path = str(tmp_path / 'historia.flow')
+    with open(path, 'w', encoding='utf-8') as handle:
+        handle.write('{quebrado')
+    writer = JournalWriter(path)
+    writer.request_compact()
+    writer.flush()
+    saved_at, pending, error = writer.status()
+    assert isinstance(error, ValueError)
+    # A thread continua atendendo a fila e o erro some no próximo salvamento bom
+    graph = StoryGraph()
+    graph.add_node("Diálogo")
+    save(writer, graph)
+    saved_at, pending, error = writer.status()
+    assert error is None and pending == 0 and saved_at is not None
+    writer.close()
+
+
+def test_snapshot_write_is_atomic(tmp_path):
+    path = str(tmp_path / 'historia.flow')
+    graph = StoryGraph()
+    graph.add_node("Cena", "praia")
+    write_snapshot(path, {'title': 'T'}, graph)
+    assert not os.path.exists(path + '.tmp')
+    compact(path)
+    assert load_project(path)[1].to_dict() == graph.to_dict()
+
+
+def test_wait_closed_waits_for_a_closing_writer(tmp_path):
+    path = str(tmp_path / 'historia.flow')
+    writer = JournalWriter(path, reset=True)
+    gate = threading.Event()
+    # Segura a thread do diário até o teste liberar
+    original = writer._append
+    writer._append = lambda payload: (gate.wait(), original(payload))
+    graph = StoryGraph()
+    graph.add_node("Diálogo", "última fala")
+    writer.submit(encode_changes(graph))
+    writer.request_close()
+
+    loaded = []
+    reader = threading.Thread(target=lambda: loaded.append(load_project(path)[1]))
+    reader.start()
+    reader.join(0.2)
+    assert reader.is_alive()
+    gate.set()
+    reader.join(5)
+    assert len(loaded[0]) == 1
+    wait_closed(path)
@@ -0,0 +1,54 @@
+from flowstory.bench import make_story
+from flowstory.graph import StoryGraph
+from flowstory.layout import COLUMN_STEP, MARGIN, ROW_STEP, graph_snapshot, layout, relayout
+
+
+def positions(nodes, moves):
+    return {node_id: moves.get(node_id, (x, y)) for node_id, x, y in nodes}
+
+
+def test_snapshot_is_only_ids_and_numbers():
+    graph = StoryGraph()
+    a = graph.add_node("Diálogo", "oi", 5, 6)
+    b = graph.add_node("Diálogo", "tchau", 7, 8)
+    graph.connect(a.id, b.id)
+    assert graph_snapshot(graph) == ([(a.id, 5, 6), (b.id, 7, 8)], [(a.id, b.id)])
+
+
+def test_layers_run_top_to_bottom_and_loops_are_ignored():
+    # 1 -> 2 -> 3 -> 1 (laço) e 1 -> 3
+    nodes = [(1, 0, 0), (2, 0, 0), (3, 0, 0)]
+    edges = [(1, 2), (2, 3), (3, 1), (1, 3)]
+    where = positions(nodes, layout(nodes, edges))
+    assert [where[node][1] for node in (1, 2, 3)] == [MARGIN + row * ROW_STEP for row in range(3)]
+
+
+def test_every_bubble_gets_its_own_spot():
+    graph = make_story(600)
+    nodes, edges = graph_snapshot(graph)
+    where = positions(nodes, layout(nodes, edges))
+    assert len(set(where.values())) == len(nodes)
+    # Organizar de novo não muda nada
+    again = [(node_id,) + where[node_id] for node_id, _, _ in nodes]
+    assert layout(again, edges) == {}
+
+
+def test_loose_parts_sit_side_by_side():
+    nodes = [(1, 0, 0), (2, 0, 0), (3, 500, 0), (4, 500, 0)]
+    where = positions(nodes, layout(nodes, [(1, 2), (3, 4)]))
+    assert where[1] == (MARGIN, MARGIN) and where[2] == (MARGIN, MARGIN + ROW_STEP)
+    assert where[3] == (MARGIN + 2 * COLUMN_STEP, MARGIN)
+
+
+def test_relayout_moves_only_the_new_bubble_and_what_it_covers():
+    nodes = [(1, MARGIN, MARGIN), (2, MARGIN, MARGIN + ROW_STEP),
+             (3, MARGIN + COLUMN_STEP, MARGIN + ROW_STEP),
+             # A nova bolha caiu no topo, por cima da filha que ela vai ganhar
+             (4, MARGIN, MARGIN), (5, MARGIN + 5 * COLUMN_STEP, MARGIN)]
+    edges = [(1, 2), (1, 3), (1, 4), (4, 2)]
+    moves = relayout(nodes, edges, {4})
+    where = positions(nodes, moves)
+    assert set(moves) == {4, 2}
+    assert where[4][1] == MARGIN + ROW_STEP and where[4] not in (where[2], where[3])
+    assert where[2][1] == MARGIN + 2 * ROW_STEP
+    assert relayout(nodes, edges, {99}) == {}
@@ -0,0 +1,61 @@
+import random
+
+from flowstory.markup import (TAG_CUE, TAG_ERROR, TAG_SPEAKER, TAG_VARIABLE, LineStates, check_text,
+                              tokenize)
+
+SAMPLES = ["Ana: Bom dia!", "Ana [feliz]: Que {nome}?", "Bento []: oi", "texto {mal escrito",
+           "Clara: [baixinho", "Narração sem marcação", "Davi: [] e {x}", ""]
+
+
+def tags(line):
+    return [(line[start:end], tag) for start, end, tag in tokenize(line)[0]]
+
+
+def test_speaker_cue_and_variables():
+    assert tags("Ana [feliz]: Você tem {moedas} moedas. [pausa]") == [
+        ("Ana", TAG_SPEAKER), ("[feliz]", TAG_CUE), ("{moedas}", TAG_VARIABLE),
+        ("[pausa]", TAG_CUE)]
+    assert tags("Sem quem fala, {x}") == [("{x}", TAG_VARIABLE)]
+    assert tokenize("Linha comum")[0] == [] and tokenize("Linha comum")[1] == []
+
+
+def test_problems_point_at_the_column():
+    assert tokenize("Bento []: oi")[1] == [(6, "Expressão vazia")]
+    assert tokenize("Oi {mal escrito")[1] == [(3, "Variável mal escrita: use {nome}")]
+    assert tokenize("Clara: [baixinho")[1] == [(7, "Colchete sem fechar")]
+    assert tags("Davi: [] agora")[1] == ("[]", TAG_ERROR)
+    assert check_text("Ana: ok\nBento []: oi\n\nx {") == [
+        (2, 6, "Expressão vazia"), (4, 2, "Variável mal escrita: use {nome}")]
+
+
+def test_take_starts_with_the_visible_lines():
+    states = LineStates(10)
+    assert states.take(3, first=5, last=6) == [5, 6, 0]
+    assert states.pending() == 7
+    assert states.take(100) == [1, 2, 3, 4, 7, 8, 9]
+    states.inserted(2, 2)
+    assert len(states) == 12 and states.take(100) == [2, 3, 4]
+
+
+def test_line_states_follow_random_edits():
+    rng = random.Random(5)
+    lines = [rng.choice(SAMPLES) for _ in range(30)]
+    states = LineStates(len(lines))
+    for _ in range(400):
+        line = rng.randrange(len(lines))
+        if rng.random() < 0.5:
+            added = rng.randrange(3)
+            lines[line:line + 1] = [rng.choice(SAMPLES) for _ in range(added + 1)]
+            states.inserted(line, added)
+        else:
+            removed = rng.randrange(min(3, len(lines) - line))
+            lines[line:line + removed + 1] = [rng.choice(SAMPLES)]
+            states.deleted(line, removed)
+        for number in states.take(rng.randrange(1, 40)):
+            states.set_problems(number, len(tokenize(lines[number])[1]))
+        if not states.pending():
+            expected = [len(tokenize(text)[1]) for text in lines]
+            assert states.problems == expected
+            assert states.total == sum(expected)
+            assert states.first_problem() == next(
+                (number for number, count in enumerate(expected) if count), None)
@@ -0,0 +1,68 @@
+import json
+
+from flowstory.metrics import BUCKETS, LagMonitor, LatencyHistogram, Metrics, timed
+
+
+def test_histogram_buckets_are_powers_of_two():
+    histogram = LatencyHistogram()
+    for value in (0, 1, 3, 4, 1000, 1000, 5000):
+        histogram.record(value)
+    data = histogram.snapshot()
+    assert data['count'] == 7 and data['max_ms'] == 5.0
+    assert data['buckets_us'] == {1: 1, 2: 1, 4: 1, 8: 1, 1024: 2, 8192: 1}
+    # O percentil é o teto do balde, sem passar do maior valor visto
+    assert histogram.percentile(0.5) == 8
+    assert histogram.percentile(0.9) == 5000
+    histogram.record(10 ** 15)
+    assert histogram.counts[BUCKETS - 1] == 1
+    assert LatencyHistogram().snapshot()['p99_ms'] == 0
+
+
+def test_timed_and_timer_record_each_call(tmp_path):
+    metrics = Metrics()
+
+    @timed("teste.soma", metrics)
+    def add(a, b):
+        return a + b
+
+    assert add(1, 2) == 3 and add(2, 2) == 4 and add.__name__ == 'add'
+    with metrics.timer("teste.trecho"):
+        pass
+    metrics.record("teste.manual", 0.002)
+    metrics.count("salvos", 3)
+    metrics.count("salvos")
+
+    path = tmp_path / 'metricas.json'
+    metrics.dump(str(path))
+    data = json.loads(path.read_text(encoding='utf-8'))
+    assert data['timings']['teste.soma']['count'] == 2
+    assert data['timings']['teste.trecho']['count'] == 1
+    assert data['timings']['teste.manual']['max_ms'] == 2.0
+    assert data['counters'] == {'salvos': 4}
+
+    metrics.reset()
+    assert metrics.snapshot()['timings'] == {}
+
+
+class FakeRoot:
+    def __init__(self):
+        self.jobs = []
+
+    def after(self, delay, callback):
+        self.jobs.append(callback)
+        return callback
+
+    def after_cancel(self, job):
+        self.jobs.remove(job)
+
+
+def test_lag_monitor_records_each_tick():
+    root = FakeRoot()
+    monitor = LagMonitor(root, Metrics(), interval=0)
+    monitor.start()
+    monitor.start()
+    assert len(root.jobs) == 1
+    root.jobs.pop()()
+    assert monitor.histogram.count == 1 and len(root.jobs) == 1
+    monitor.stop()
+    assert root.jobs == []
@@ -0,0 +1,115 @@
+import asyncio
+from concurrent.futures import Future
+
+import pytest
+
+from flowstory import network, repository
+from flowstory.network import AsyncLoop, FlowClient, FlowError, LocalFlowServer, TkBridge
+from flowstory.repository import FlowRepository
+
+
+class SlowServer(LocalFlowServer):
+    # Uma ação que demora mais que o tempo limite do cliente
+    runs = 0
+
+    async def do_slow(self, value):
+        self.runs += 1
+        await asyncio.sleep(0.3)
+        return value * 2
+
+
+@pytest.fixture
+def flow(tmp_path, monkeypatch):
+    monkeypatch.setattr(repository, 'PASSWORD_ROUNDS', 1000)
+    monkeypatch.setattr(network, 'BACKOFF_BASE', 0.01)
+    repo = FlowRepository(str(tmp_path / 'flow.db'))
+    loop = AsyncLoop()
+    server = SlowServer(repo)
+    port = loop.submit(server.start()).result(5)
+    yield loop, server, port
+    loop.submit(server.stop()).result(5)
+    loop.close()
+    repo.close()
+
+
+def test_roundtrip_through_the_local_server(flow):
+    loop, _, port = flow
+    client = FlowClient('127.0.0.1', port)
+
+    def call(action, **payload):
+        return loop.submit(client.request(action, **payload)).result(5)
+
+    assert call('create_account', nick="ana", password="s", email="a@flow")['nick'] == "ana"
+    with pytest.raises(FlowError):
+        call('create_account', nick="ana", password="s", email="a@flow")
+    with pytest.raises(FlowError):
+        call('login', nick="ana", password="errada")
+    call('publish_story', story={'author': "ana", 'title': "Noite"})
+    assert [s['title'] for s in call('stories_by_author', author="ana")] == ["Noite"]
+    with pytest.raises(FlowError):
+        call('nao_existe')
+
+
+def test_a_retried_request_runs_once(flow):
+    loop, server, port = flow
+    client = FlowClient('127.0.0.1', port, timeout=0.1, attempts=10)
+    assert loop.submit(client.request('slow', value=21)).result(5) == 42
+    assert client.sent > 1
+    assert server.runs == 1
+
+
+def test_equal_reads_share_one_request(flow):
+    loop, server, port = flow
+    client = FlowClient('127.0.0.1', port)
+
+    async def both():
+        return await asyncio.gather(client.request('chat_history'),
+                                    client.request('chat_history'))
+
+    assert loop.submit(both()).result(5) == [[], []]
+    assert client.sent == 1
+
+
+class FakeRoot:
+    def __init__(self):
+        self.jobs = []
+        self.reported = []
+
+    def after(self, delay, callback):
+        self.jobs.append(callback)
+        return len(self.jobs)
+
+    def after_cancel(self, job):
+        pass
+
+    def report_callback_exception(self, kind, value, traceback):
+        self.reported.append(value)
+
+    def run(self):
+        jobs, self.jobs = self.jobs, []
+        for job in jobs:
+            job()
+
+
+def test_bridge_keeps_draining_after_a_bad_callback():
+    root = FakeRoot()
+    bridge = TkBridge(root)
+    results = []
+    first, second, failing = Future(), Future(), Future()
+
+    def broken(_):
+        raise RuntimeError("defeito")
+
+    bridge.watch(first, broken)
+    bridge.watch(second, results.append)
+    bridge.watch(failing, on_error=results.append)
+    first.set_result(1)
+    second.set_result(2)
+    root.run()
+    assert results == [2] and [str(error) for error in root.reported] == ["defeito"]
+    # Ainda falta uma resposta: o bridge continua agendado
+    assert len(root.jobs) == 1
+    error = ValueError("falhou")
+    failing.set_exception(error)
+    root.run()
+    assert results == [2, error] and root.jobs == []
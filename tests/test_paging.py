@@ -0,0 +1,67 @@
+from flowstory.paging import PagedSource
+
+
+class Loader:
+    # Guarda os pedidos; o teste decide quando cada um responde
+    def __init__(self, total=230):
+        self.total = total
+        self.calls = []
+
+    def __call__(self, order, text, start, count, ready, failed):
+        self.calls.append((order, text, start, count, ready, failed))
+
+    def answer(self, call):
+        order, text, start, count, ready, _ = call
+        ready({'total': self.total,
+               'rows': [f"{order}:{text}:{n}" for n in range(start, min(start + count, self.total))]})
+
+
+def test_rows_load_by_page_on_demand():
+    loader = Loader()
+    changes = []
+    source = PagedSource(loader, lambda: changes.append(1), page_rows=50)
+    source.reload()
+    assert len(source) == 0 and source.row(3) is None
+    # O mesmo pedido não sai duas vezes enquanto espera
+    assert len(loader.calls) == 1
+    loader.answer(loader.calls[0])
+    assert len(source) == 230 and source.row(3) == "recent::3" and changes == [1]
+
+    assert source.row(120) is None
+    loader.answer(loader.calls[-1])
+    assert loader.calls[-1][2] == 100 and source.row(120) == "recent::120"
+    # Além do total não há página para pedir
+    source.prefetch(200, 400)
+    assert [call[2] for call in loader.calls] == [0, 100, 200]
+
+
+def test_only_recent_pages_stay_in_memory():
+    loader = Loader(total=1000)
+    source = PagedSource(loader, page_rows=10, max_pages=3)
+    source.reload()
+    loader.answer(loader.calls[0])
+    for page in (1, 2, 3):
+        source.row(page * 10)
+        loader.answer(loader.calls[-1])
+    assert source.row(0) is None
+    assert source.row(35) == "recent::35"
+
+
+def test_late_answers_from_an_old_query_are_ignored():
+    loader = Loader()
+    source = PagedSource(loader, page_rows=50)
+    source.reload()
+    old = loader.calls[0]
+    source.set_query(order='title', text='casa')
+    loader.answer(old)
+    assert source.total is None
+    loader.answer(loader.calls[-1])
+    assert source.row(0) == "title:casa:0"
+
+
+def test_a_failed_page_can_be_requested_again():
+    loader = Loader()
+    source = PagedSource(loader, page_rows=50)
+    source.reload()
+    loader.calls[0][5](OSError("sem rede"))
+    assert source.row(0) is None and len(loader.calls) == 2
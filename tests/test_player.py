@@ -0,0 +1,165 @@
+import operator
+import zipfile
+
+import pytest
+
+from flowstory.graph import StoryGraph, EDGE_NEXT, EDGE_THEN, EDGE_ELSE, EDGE_ROUTE
+from flowstory.journal import JournalWriter, encode_changes
+from flowstory.player import (SceneCache, assignments_rpn, chapter_from_file, chapter_from_graph,
+                              compile_chapter, expression_rpn, export_player, pack_story)
+from flowstory.runtime import (OP_CHOICE, OP_END, OP_IF, OP_LINE, OP_SET, StoryError, StoryRunner,
+                               compile_expression, compile_story)
+
+OPS = {'+': operator.add, '-': operator.sub, '*': operator.mul, '/': operator.truediv,
+       '//': operator.floordiv, '%': operator.mod, '==': operator.eq, '!=': operator.ne,
+       '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+       '&&': lambda a, b: a and b, '||': lambda a, b: a or b}
+
+
+def evaluate(rpn, env):
+    # A mesma pilha do story.js, em Python
+    stack = []
+    for token in rpn:
+        if token[0] == 'c':
+            stack.append(token[1])
+        elif token[0] == 'v':
+            stack.append(env.get(token[1], 0))
+        elif token[0] == '!':
+            stack.append(not stack.pop())
+        elif token[0] == '~':
+            stack.append(-stack.pop())
+        else:
+            right = stack.pop()
+            stack.append(OPS[token[0]](stack.pop(), right))
+    return stack.pop()
+
+
+def play(table, pick):
+    # Percorre a tabela como o jogo do navegador e devolve as falas e escolhas
+    strings, code, routes, conditions = table['s'], table['t'], table['r'], table['x']
+    env, out, pc = {}, [], table['start']
+    while pc >= 0:
+        op, a, b, forward, alternative = code[pc * 5:pc * 5 + 5]
+        pc = forward
+        if op == OP_LINE:
+            out.append((strings[a], strings[b]))
+        elif op == OP_IF and not evaluate(conditions[a], env):
+            pc = alternative
+        elif op == OP_SET:
+            for name, kind, rpn in conditions[a]:
+                value, old = evaluate(rpn, env), env.get(name, 0)
+                env[name] = old + value if kind == '+' else old - value if kind == '-' else value
+        elif op == OP_CHOICE:
+            labels = [strings[routes[a + 1 + 2 * k]] for k in range(routes[a])]
+            out.append(tuple(labels))
+            pc = routes[a + 2 + 2 * pick(labels)]
+        elif op == OP_END:
+            break
+    return out
+
+
+def story():
+    graph = StoryGraph()
+    add = graph.add_node
+    setup = add("Contexto", "coragem = 1\nmoedas = 5")
+    choice = add("Criar Rota", "")
+    brave = add("Criar Rota", "Lutar")
+    flee = add("Criar Rota", "Fugir")
+    gain = add("Contexto", "coragem += 2\nmoedas -= 1")
+    check = add("Se", "coragem > 2 and not moedas < 3")
+    yes = add("Então", "")
+    no = add("Senão", "")
+    won = add("Diálogo", "Ana: Venci!")
+    lost = add("Diálogo", "Ana: Ainda não...")
+    end = add("Parar Tudo", "")
+    graph.connect(setup.id, choice.id, EDGE_NEXT)
+    graph.connect(choice.id, brave.id, EDGE_ROUTE)
+    graph.connect(choice.id, flee.id, EDGE_ROUTE)
+    graph.connect(brave.id, gain.id, EDGE_NEXT)
+    graph.connect(gain.id, check.id, EDGE_NEXT)
+    graph.connect(flee.id, check.id, EDGE_NEXT)
+    graph.connect(check.id, yes.id, EDGE_THEN)
+    graph.connect(check.id, no.id, EDGE_ELSE)
+    graph.connect(yes.id, won.id, EDGE_NEXT)
+    graph.connect(no.id, lost.id, EDGE_NEXT)
+    graph.connect(won.id, end.id, EDGE_NEXT)
+    graph.connect(lost.id, end.id, EDGE_NEXT)
+    return graph
+
+
+@pytest.mark.parametrize('source', [
+    "1 + 2 * 3", "-x + 4", "a < b <= 10", "not (a == 1) or b != 2", "7 // 2 % 3",
+    "verdadeiro and Falso", "x / 4 >= 0.5", "nome == 'Ana'", "",
+])
+def test_rpn_matches_the_runtime_expressions(source):
+    for env in ({}, {'a': 1, 'b': 2, 'x': 3}, {'a': 5, 'b': 12, 'x': -2, 'nome': 'Ana'}):
+        assert evaluate(expression_rpn(source), env) == compile_expression(source)(env)
+
+
+def test_unsupported_text_is_a_story_error():
+    with pytest.raises(StoryError):
+        expression_rpn("f(x)")
+    with pytest.raises(StoryError):
+        assignments_rpn("isto não é atribuição")
+    assert assignments_rpn("a += 1\n\nb = a * 2") == [['a', '+', [['c', 1]]],
+                                                    ['b', '=', [['v', 'a'], ['c', 2], ['*']]]]
+
+
+@pytest.mark.parametrize('route', [0, 1])
+def test_table_plays_like_the_runtime(route):
+    graph = story()
+    runner = StoryRunner(compile_story(graph))
+    expected = []
+    while True:
+        event = runner.step()
+        if event is None or event[0] == 'end':
+            break
+        if event[0] == 'line':
+            expected.append(event[1:3])
+        elif event[0] == 'choice':
+            expected.append(tuple(event[1]))
+            runner.choose(route)
+    table = pack_story(graph)
+    assert play(table, lambda labels: route) == expected
+    # Textos repetidos entram uma vez só
+    assert len(table['s']) == len(set(table['s']))
+
+
+def test_scene_cache_skips_unchanged_chapters(tmp_path):
+    graph = story()
+    cache = SceneCache(str(tmp_path / 'cache'))
+    text, cached = compile_chapter(chapter_from_graph("Um", graph), cache)
+    assert not cached
+    # Mexer só na posição não muda o jogo
+    first = next(iter(graph))
+    graph.move_node(first.id, 900, 900)
+    assert compile_chapter(chapter_from_graph("Um", graph), cache) == (text, True)
+    graph.set_text(first.id, "coragem = 3\nmoedas = 5")
+    assert not compile_chapter(chapter_from_graph("Um", graph), cache)[1]
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_cache_keeps_only_the_newest_files(tmp_path):
+    cache = SceneCache(str(tmp_path), max_files=2)
+    for key in 'abc':
+        cache.put(key, key)
+    assert len(list(tmp_path.glob('*.json'))) == 2
+
+
+def test_exported_game_is_deterministic(tmp_path):
+    path = str(tmp_path / 'cap2.flow')
+    writer = JournalWriter(path, reset=True)
+    writer.submit(encode_changes(story(), {'title': 'Dois'}))
+    writer.close()
+    chapters = [chapter_from_graph("Um", story()), chapter_from_file("Dois", path)]
+
+    first, second = str(tmp_path / 'a.zip'), str(tmp_path / 'b.zip')
+    export_player(first, {'title': 'Jogo'}, chapters)
+    cache = export_player(second, {'title': 'Jogo'}, chapters, cache_dir=str(tmp_path / 'c'))
+    with open(first, 'rb') as a, open(second, 'rb') as b:
+        assert a.read() == b.read()
+    assert cache.misses == 2
+    with zipfile.ZipFile(first) as bundle:
+        assert bundle.namelist() == ['chapters/0001.js', 'chapters/0002.js', 'story.js',
+                                     'index.html']
+        assert '"Um"' in bundle.read('story.js').decode('utf-8')
@@ -0,0 +1,181 @@
+from flowstory.graph import StoryGraph, BUBBLE_WIDTH
+from flowstory.render import BubbleRenderer, SELECTED_COLOR, VIEW_MARGIN
+
+
+class RecordingCanvas:
+    # Canvas de mentira que guarda o tipo, as coordenadas e as opções de cada item
+
+    def __init__(self, width=800, height=600):
+        self.width = width
+        self.height = height
+        self.left = 0
+        self.top = 0
+        self.items = {}
+        self.idle = {}
+        self._jobs = 0
+
+    def _creator(kind):
+        def create(self, *coords, **options):
+            item = len(self.items) + 1
+            self.items[item] = {'kind': kind, 'coords': coords, 'state': 'normal', **options}
+            return item
+        return create
+
+    create_oval = _creator('oval')
+    create_text = _creator('text')
+    create_rectangle = _creator('rectangle')
+    create_line = _creator('line')
+
+    def coords(self, item, *coords):
+        self.items[item]['coords'] = coords
+
+    def itemconfigure(self, item, **options):
+        self.items[item].update(options)
+
+    def configure(self, **options):
+        pass
+
+    def delete(self, tag):
+        self.items.clear()
+
+    def tag_lower(self, item):
+        pass
+
+    def xview_moveto(self, fraction):
+        pass
+
+    yview_moveto = xview_moveto
+
+    def canvasx(self, x):
+        return self.left + x
+
+    def canvasy(self, y):
+        return self.top + y
+
+    def winfo_width(self):
+        return self.width
+
+    def winfo_height(self):
+        return self.height
+
+    def after_idle(self, callback):
+        self._jobs += 1
+        self.idle[self._jobs] = callback
+        return self._jobs
+
+    def after_cancel(self, job):
+        self.idle.pop(job, None)
+
+    def run_idle(self):
+        while self.idle:
+            self.idle.popitem()[1]()
+
+    def shown(self, kind):
+        return [item for item, data in self.items.items()
+                if data['kind'] == kind and data['state'] == 'normal']
+
+
+def grid_story(columns=40, rows=40, step=200):
+    graph = StoryGraph()
+    previous = None
+    for row in range(rows):
+        for column in range(columns):
+            node = graph.add_node("Diálogo", x=column * step, y=row * step)
+            if previous is not None and column:
+                graph.connect(previous.id, node.id)
+            previous = node
+    return graph
+
+
+def visible_ids(graph, left, top, right, bottom):
+    return {node.id for node in graph if node.x < right and node.x + BUBBLE_WIDTH > left
+            and node.y < bottom and node.y + 60 > top}
+
+
+def test_only_bubbles_near_the_viewport_get_items():
+    graph = grid_story()
+    canvas = RecordingCanvas()
+    renderer = BubbleRenderer(canvas, graph)
+    canvas.run_idle()
+    expected = visible_ids(graph, -VIEW_MARGIN, -VIEW_MARGIN, 800 + VIEW_MARGIN, 600 + VIEW_MARGIN)
+    assert set(renderer.node_items) == expected
+    assert len(canvas.shown('oval')) == len(expected) < len(graph)
+    assert len(canvas.shown('text')) == len(expected)
+
+
+def test_scrolling_recycles_items_instead_of_creating_new_ones():
+    graph = grid_story()
+    canvas = RecordingCanvas()
+    renderer = BubbleRenderer(canvas, graph)
+    canvas.run_idle()
+    peak = len(canvas.items)
+    for step in range(1, 20):
+        canvas.left = canvas.top = step * 150
+        renderer.refresh()
+        shown = sum(1 for data in canvas.items.values() if data['state'] == 'normal')
+        peak = max(peak, shown)
+    # Quem sai da tela volta para a reserva antes de alguém entrar: nunca há mais
+    # itens criados do que o máximo que apareceu de uma vez
+    assert len(canvas.items) == peak
+    assert set(renderer.node_items) == visible_ids(
+        graph, canvas.left - VIEW_MARGIN, canvas.top - VIEW_MARGIN,
+        canvas.left + 800 + VIEW_MARGIN, canvas.top + 600 + VIEW_MARGIN)
+
+
+def test_edits_coalesce_into_one_refresh_and_move_the_items():
+    graph = StoryGraph()
+    canvas = RecordingCanvas()
+    renderer = BubbleRenderer(canvas, graph)
+    a = graph.add_node("Diálogo", x=10, y=10)
+    b = graph.add_node("Diálogo", x=10, y=200)
+    graph.connect(a.id, b.id)
+    assert len(canvas.idle) == 1
+    canvas.run_idle()
+    graph.move_node(b.id, 300, 200)
+    canvas.run_idle()
+    oval = renderer.node_items[b.id][0]
+    assert canvas.items[oval]['coords'] == (300, 200, 300 + BUBBLE_WIDTH, 260)
+    line = renderer.edge_items[graph.out_edges(a.id)[0]]
+    assert canvas.items[line]['coords'][2:] == (300 + BUBBLE_WIDTH / 2, 200)
+
+
+def test_removed_bubbles_give_their_items_back():
+    graph = StoryGraph()
+    canvas = RecordingCanvas()
+    renderer = BubbleRenderer(canvas, graph)
+    a = graph.add_node("Diálogo", x=10, y=10)
+    b = graph.add_node("Diálogo", x=10, y=200)
+    graph.connect(a.id, b.id)
+    canvas.run_idle()
+    graph.remove_node(b.id)
+    assert b.id not in renderer.node_items and not renderer.edge_items
+    assert len(canvas.shown('oval')) == 1 and not canvas.shown('line')
+    graph.add_node("Cena", x=400, y=10)
+    canvas.run_idle()
+    # A bolha nova usa o oval que ficou na reserva
+    assert len([item for item in canvas.items.values() if item['kind'] == 'oval']) == 2
+
+
+def test_low_zoom_draws_plain_blocks_without_edges():
+    graph = grid_story(10, 10)
+    canvas = RecordingCanvas()
+    renderer = BubbleRenderer(canvas, graph)
+    canvas.run_idle()
+    assert canvas.shown('line')
+    renderer.set_scale(0.2)
+    assert canvas.shown('rectangle')
+    assert not canvas.shown('oval') and not canvas.shown('text') and not canvas.shown('line')
+
+
+def test_selection_restyles_only_changed_bubbles():
+    graph = StoryGraph()
+    canvas = RecordingCanvas()
+    renderer = BubbleRenderer(canvas, graph)
+    a = graph.add_node("Diálogo", x=10, y=10)
+    b = graph.add_node("Diálogo", x=200, y=10)
+    canvas.run_idle()
+    renderer.set_selection({a.id})
+    assert canvas.items[renderer.node_items[a.id][0]]['outline'] == SELECTED_COLOR
+    renderer.set_selection({b.id})
+    assert canvas.items[renderer.node_items[a.id][0]]['outline'] == 'black'
+    assert canvas.items[renderer.node_items[b.id][0]]['outline'] == SELECTED_COLOR
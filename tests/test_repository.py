@@ -0,0 +1,89 @@
+import pytest
+
+from flowstory import repository
+from flowstory.repository import FlowRepository, RepositoryError
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    # Menos rodadas do PBKDF2: o teste é do banco, não do custo da senha
+    monkeypatch.setattr(repository, 'PASSWORD_ROUNDS', 1000)
+    flow = FlowRepository(str(tmp_path / 'flow' / 'flow.db'))
+    yield flow
+    flow.close()
+
+
+def story(author, title, **extra):
+    return dict({'author': author, 'title': title}, **extra)
+
+
+def test_accounts_and_passwords(repo):
+    repo.create_user("ana", "segredo", "ana@flow")
+    with pytest.raises(RepositoryError):
+        repo.create_user("ANA", "outra", "x@flow")
+    assert repo.authenticate("Ana", "segredo")['nick'] == "ana"
+    assert repo.authenticate("ana", "errada") is None
+    assert repo.authenticate("bia", "segredo") is None
+
+
+def test_renaming_carries_stories_updates_and_jams(repo):
+    repo.create_user("ana", "s", "ana@flow")
+    repo.create_user("bia", "s", "bia@flow")
+    repo.publish_story(story("ana", "Noite"))
+    repo.post_update("ana", "publiquei")
+    jam_id = repo.list_jams(order='oldest')['rows'][-1]['id']
+    assert repo.join_jam(jam_id, "ana") and not repo.join_jam(jam_id, "ana")
+
+    with pytest.raises(RepositoryError):
+        repo.update_profile("ana", "bia", "")
+    repo.update_profile("ANA", "aninha", "nova bio")
+    assert repo.stories_by_author("ana") == []
+    assert [s['title'] for s in repo.stories_by_author("aninha")] == ["Noite"]
+    assert [text for text, _ in repo.recent_updates("aninha")] == ["publiquei"]
+    assert repo.authenticate("aninha", "s")['bio'] == "nova bio"
+    assert not repo.join_jam(jam_id, "aninha")
+
+
+def test_republishing_updates_in_place(repo):
+    repo.publish_story(story("ana", "Noite", tags=["terror", "curta"], category="Terror"))
+    repo.publish_story(story("ana", "Noite", description="nova", category="Terror"))
+    stories = repo.stories_by_author("ana")
+    assert len(stories) == 1
+    assert stories[0]['description'] == "nova" and stories[0]['tags'] == []
+
+
+def test_story_lists_filter_order_and_page_in_the_database(repo):
+    for number in range(30):
+        repo.publish_story(story("ana" if number % 2 else "bia", f"História {number:02d}",
+                                 category="Terror" if number % 3 == 0 else "Romance"))
+    repo.publish_story(story("bia", "100% real_mente"))
+    page = repo.list_stories(category="Terror", order='oldest', limit=4, offset=2)
+    assert page['total'] == 10
+    assert [s['title'] for s in page['rows']] == [f"História {n:02d}" for n in (6, 9, 12, 15)]
+    assert repo.list_stories(author="ana", text="1")['total'] == 7
+    # % e _ são texto, não curinga
+    assert [s['title'] for s in repo.list_stories(text="0%")['rows']] == ["100% real_mente"]
+    assert repo.list_stories(text="_")['total'] == 1
+    assert [s['title'] for s in repo.list_stories(order='title', limit=1)['rows']] == ["100% real_mente"]
+
+    seen = [s['id'] for s in repo.iter_stories(batch=7)]
+    assert seen == sorted(seen) and len(seen) == 31
+
+
+def test_jams_are_counted_and_searched(repo):
+    jams = repo.list_jams(order='oldest')
+    assert jams['total'] == 3
+    first = jams['rows'][0]['id']
+    repo.join_jam(first, "ana")
+    repo.join_jam(first, "bia")
+    assert repo.list_jams(order='members')['rows'][0] == dict(jams['rows'][0], members=2)
+    assert [jam['name'] for jam in repo.list_jams(text="mistério")['rows']] == ["Halloween Jam"]
+
+
+def test_queued_updates_are_written_in_batches(repo):
+    for number in range(50):
+        repo.post_update("ana", f"nota {number}")
+    texts = [text for text, _ in repo.recent_updates("ana", limit=100)]
+    assert texts == [f"nota {number}" for number in reversed(range(50))]
+    assert repo.write_error is None
+    assert repo.submit(repo.stories_by_author, "ana").result(5) == []
@@ -0,0 +1,152 @@
+import pytest
+
+from flowstory import runtime
+from flowstory.bench import make_story
+from flowstory.graph import StoryGraph, EDGE_NEXT, EDGE_THEN, EDGE_ELSE, EDGE_ROUTE
+from flowstory.runtime import (StoryError, StoryRunner, compile_expression, compile_story, END)
+
+
+def chain(graph, *bubbles):
+    # bubbles: (tipo, texto); liga cada uma à seguinte com "next"
+    nodes = [graph.add_node(kind, text) for kind, text in bubbles]
+    for src, dst in zip(nodes, nodes[1:]):
+        graph.connect(src.id, dst.id, EDGE_NEXT)
+    return nodes
+
+
+def events(graph, chooser=None, variables=None):
+    runner = StoryRunner(compile_story(graph), variables)
+    found = []
+    while True:
+        event = runner.step()
+        if event is None:
+            return found
+        found.append(event)
+        if event[0] == 'choice':
+            runner.choose(chooser(event[1]) if chooser else 0)
+
+
+def test_lines_speakers_cues_and_variables():
+    graph = StoryGraph()
+    chain(graph, ("Contexto", "moedas = 3\nnome = 'Ana'"),
+          ("Diálogo", "Bento [feliz]: Você tem {moedas} moedas, {nome}."),
+          ("Diálogo", "Narração sem quem fala"))
+    runner = StoryRunner(compile_story(graph))
+    assert runner.step() == ('line', 'Bento', 'Você tem 3 moedas, Ana.')
+    assert runner.characters['Bento'] == ('centro', 'feliz')
+    assert runner.step() == ('line', '', 'Narração sem quem fala')
+    assert runner.step() is None and runner.finished
+
+
+def test_if_follows_then_or_else():
+    for courage, expected in ((5, "Ana: Vamos!"), (1, "Ana: Medo...")):
+        graph = StoryGraph()
+        test, = chain(graph, ("Se", "coragem > 3 and not medo"))
+        then_line, = chain(graph, ("Diálogo", "Ana: Vamos!"))
+        else_line, = chain(graph, ("Diálogo", "Ana: Medo..."))
+        graph.connect(test.id, then_line.id, EDGE_THEN)
+        graph.connect(test.id, else_line.id, EDGE_ELSE)
+        found = events(graph, variables={'coragem': courage, 'medo': False})
+        assert found == [('line', 'Ana', expected.split(': ')[1])]
+
+
+def test_if_without_else_ends_the_story():
+    graph = StoryGraph()
+    test, line = chain(graph, ("Se", "falso"), ("Diálogo", "Ana: nunca"))
+    graph.disconnect(test.id, line.id)
+    graph.connect(test.id, line.id, EDGE_THEN)
+    assert events(graph) == []
+
+
+def test_assignments_update_variables():
+    graph = StoryGraph()
+    chain(graph, ("Contexto", "a = 10\na += 5\na -= 2\nb = a * 2 // 3 % 5"))
+    runner = StoryRunner(compile_story(graph))
+    runner.run()
+    assert runner.variables == {'a': 13, 'b': 3}
+
+
+def test_routes_become_a_choice():
+    graph = StoryGraph()
+    question, = chain(graph, ("Diálogo", "Bento: Para onde?"))
+    targets = []
+    for name in ("Rio", "Montanha"):
+        route, line, end = chain(graph, ("Criar Rota", name), ("Diálogo", f"Clara: {name}"),
+                                 ("Parar Tudo", ""))
+        graph.connect(question.id, route.id, EDGE_ROUTE)
+        targets.append(line)
+    runner = StoryRunner(compile_story(graph))
+    assert runner.step() == ('line', 'Bento', 'Para onde?')
+    assert runner.step() == ('choice', ('Rio', 'Montanha'))
+    with pytest.raises(StoryError):
+        runner.step()
+    runner.choose(1)
+    assert runner.step() == ('line', 'Clara', 'Montanha')
+    assert runner.step() == ('end',)
+    assert runner.finished and runner.step() is None
+
+
+def test_staging_events_track_characters_and_background():
+    graph = StoryGraph()
+    chain(graph, ("Cenário", "praia"), ("Trazer Personagem", "Ana"),
+          ("Mover Personagem", "Ana esquerda"), ("Mudar Expressão", "Ana brava"),
+          ("Tempo de Slide", "1,5"), ("Esconder Personagem", "Ana"), ("Transição Súbita", ""))
+    runner = StoryRunner(compile_story(graph))
+    assert runner.step() == ('background', 'praia')
+    assert runner.step() == ('show', 'Ana')
+    assert runner.step() == ('move', 'Ana', 'esquerda')
+    assert runner.step() == ('expression', 'Ana', 'brava')
+    assert runner.characters == {'Ana': ('esquerda', 'brava')}
+    assert runner.step() == ('wait', 1.5)
+    assert runner.step() == ('hide', 'Ana')
+    assert runner.step() == ('transition', 'Transição Súbita')
+    assert runner.background == 'praia' and runner.characters == {}
+
+
+def test_compile_errors_are_story_errors():
+    for kind, text in (("Se", "coragem >"), ("Se", "abrir('x')"), ("Contexto", "sem igual"),
+                       ("Tempo de Slide", "rápido")):
+        graph = StoryGraph()
+        graph.add_node(kind, text)
+        with pytest.raises(StoryError):
+            compile_story(graph)
+
+
+def test_evaluation_errors_are_story_errors():
+    for kind, text in (("Contexto", "x = 1/0"), ("Se", "'a' > 1"), ("Contexto", "n = 'a'\nn -= 1")):
+        graph = StoryGraph()
+        chain(graph, (kind, text))
+        with pytest.raises(StoryError) as caught:
+            StoryRunner(compile_story(graph)).run()
+        assert text.splitlines()[-1] in str(caught.value)
+
+
+def test_expressions_never_reach_eval():
+    condition = compile_expression("x == 2 or y < 1 < z")
+    assert condition({'x': 2})
+    assert condition({'y': 0, 'z': 5})
+    assert not condition({'x': 1, 'y': 3})
+    assert compile_expression("")({}) is True
+    assert compile_expression("Verdadeiro and not falso")({})
+
+
+def test_a_loop_without_events_is_reported(monkeypatch):
+    monkeypatch.setattr(runtime, 'SILENT_LIMIT', 50)
+    graph = StoryGraph()
+    a, = chain(graph, ("Contexto", "voltas += 1"))
+    graph.connect(a.id, a.id)
+    with pytest.raises(StoryError):
+        StoryRunner(compile_story(graph)).step()
+
+
+def test_empty_story_is_finished():
+    program = compile_story(StoryGraph())
+    assert program.start == END
+    assert StoryRunner(program).finished
+
+
+def test_generated_story_runs_to_the_end():
+    graph = make_story(3000, seed=4)
+    runner = StoryRunner(compile_story(graph))
+    assert runner.run(chooser=lambda options: len(options) - 1) > 1000
+    assert runner.finished and runner.chapter is not None
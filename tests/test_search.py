@@ -0,0 +1,102 @@
+import random
+
+from flowstory.search import SearchIndex, fold, tokenize
+from flowstory.search import _token_score
+
+WORDS = "mistério casa floresta dragão noite chuva amor viagem mistica escola".split()
+
+
+def build(count, seed=7):
+    rng = random.Random(seed)
+    index = SearchIndex()
+    for key in range(count):
+        index.add(key, {
+            'title': ' '.join(rng.sample(WORDS, 2)),
+            'description': ' '.join(rng.choices(WORDS, k=4)),
+            'dialogue': ' '.join(rng.choices(WORDS, k=8)),
+            'tags': rng.sample(WORDS, 1),
+            'category': rng.choice(["Terror", "Romance", "Aventura"]),
+            'key': key,
+        })
+    return index
+
+
+def brute_force(index, query, category=None):
+    tokens = list(dict.fromkeys(tokenize(query)))
+    per_token = [index._terms(token, position == len(tokens) - 1)
+                 for position, token in enumerate(tokens)]
+    scored = []
+    for key, record in index.records():
+        doc = index._docs[key]
+        if category and fold(record['category']) != fold(category):
+            continue
+        scores = [_token_score(terms, doc) for terms in per_token]
+        if None not in scores:
+            scored.append((-sum(scores), -doc, key))
+    return [key for _, _, key in sorted(scored)]
+
+
+def keys_of(results, pages, size):
+    return [record['key'] for number in range(pages) for record in results.page(number, size)]
+
+
+def test_words_are_folded_and_stopwords_dropped():
+    assert fold("Mistério") == "misterio"
+    assert tokenize("O Mistério da Casa") == ["misterio", "casa"]
+
+
+def test_ranked_order_matches_brute_force():
+    index = build(400)
+    for key in range(0, 400, 7):
+        index.remove(key)
+    for query, category in [("casa", None), ("mist", None), ("Dragão noite", None),
+                            ("amor via", "romance"), ("chuva escola floresta", "Terror")]:
+        results = index.search(query, category)
+        expected = brute_force(index, query, category)
+        found = keys_of(results, 100, 9)
+        assert found == expected, query
+        assert results.exact and results.estimate == len(expected)
+
+
+def test_pages_continue_where_the_last_one_stopped():
+    index = build(200)
+    results = index.search("noite")
+    first = keys_of(results, 1, 10)
+    second = [record['key'] for record in results.page(1, 10)]
+    assert first + second == brute_force(index, "noite")[:20]
+    assert not set(first) & set(second)
+
+
+def test_estimate_is_an_upper_bound_until_exhausted():
+    index = build(100)
+    results = index.search("casa")
+    assert results.exact
+    index.remove(0)
+    results = index.search("casa")
+    total = len(brute_force(index, "casa"))
+    assert not results.exact and results.estimate >= total
+    results.page(0, 1000)
+    assert results.exact and results.estimate == total
+
+
+def test_empty_query_browses_newest_first():
+    index = SearchIndex()
+    index.add('a', {'title': "Um", 'category': "Terror"})
+    index.add('b', {'title': "Dois", 'category': "Romance"})
+    index.add('c', {'title': "Três", 'category': "terror"})
+    assert [r['title'] for r in index.search("").page(0)] == ["Três", "Dois", "Um"]
+    results = index.search("", category="Terror")
+    assert [r['title'] for r in results.page(0)] == ["Três", "Um"]
+    assert results.estimate == 2 and results.exact
+
+
+def test_republishing_replaces_the_old_version():
+    index = SearchIndex()
+    index.add('a', {'title': "Casa assombrada", 'category': "Terror"})
+    index.add('a', {'title': "Casa de praia", 'category': "Romance"})
+    assert len(index) == 1 and 'a' in index
+    assert [r['title'] for r in index.search("casa").page(0)] == ["Casa de praia"]
+    assert index.search("assombrada").page(0) == []
+    assert index.search("", category="Terror").page(0) == []
+    assert index.remove('a') and not index.remove('a')
+    assert index.search("casa").page(0) == []
@@ -0,0 +1,52 @@
+import os
+
+from flowstory.series import INDEX_NAME, SeriesLibrary
+
+
+def test_open_reads_only_the_index(tmp_path):
+    path = str(tmp_path / 'serie.flowseries')
+    library = SeriesLibrary.create(path, {'title': 'Série'})
+    first = library.add_chapter("Piloto")
+    second = library.add_chapter("Segundo", episode=5)
+    assert (first.id, first.episode, second.episode) == (1, 1, 5)
+    assert os.path.exists(os.path.join(path, INDEX_NAME))
+
+    reopened = SeriesLibrary.open(path)
+    assert reopened.project == {'title': 'Série'}
+    assert [info.label() for info in reopened.chapters()] == ["Ep. 1 - Piloto", "Ep. 5 - Segundo"]
+    assert not reopened.is_loaded(first.id)
+    # Capítulo sem arquivo abre vazio
+    assert len(reopened.load(first.id).graph) == 0
+
+
+def test_least_recent_chapters_are_saved_and_unloaded(tmp_path):
+    path = str(tmp_path / 'serie.flowseries')
+    library = SeriesLibrary.create(path, {}, max_loaded=2)
+    ids = [library.add_chapter(f"Cap {n}").id for n in range(3)]
+    for index, chapter_id in enumerate(ids):
+        chapter = library.load(chapter_id)
+        for _ in range(index + 1):
+            chapter.graph.add_node("Diálogo", f"fala {chapter_id}")
+    library.load(ids[1])
+    # Abrir o terceiro já tirou o primeiro da memória; o segundo foi o último usado
+    assert not library.is_loaded(ids[0])
+    assert library.is_loaded(ids[1]) and library.is_loaded(ids[2])
+    assert library.chapter(ids[0]).bubbles == 1
+
+    reloaded = library.load(ids[0])
+    assert [node.text for node in reloaded.graph] == [f"fala {ids[0]}"]
+    assert not library.is_loaded(ids[2])
+    library.close(wait=True)
+
+    reopened = SeriesLibrary.open(path)
+    assert [info.bubbles for info in reopened.chapters()] == [1, 2, 3]
+    assert len(reopened.load(ids[2]).graph) == 3
+
+
+def test_loading_a_loaded_chapter_returns_the_same_object(tmp_path):
+    library = SeriesLibrary.create(str(tmp_path / 's.flowseries'), {})
+    info = library.add_chapter("Único")
+    assert library.load(info.id) is library.load(info.id)
+    assert library.loaded(info.id) is not None
+    library.close(wait=True)
+    assert library.loaded(info.id) is None
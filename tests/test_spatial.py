@@ -0,0 +1,85 @@
+import random
+
+from flowstory.graph import StoryGraph, BUBBLE_WIDTH, BUBBLE_HEIGHT
+from flowstory.spatial import SpatialGrid
+
+
+def brute_query(boxes, x1, y1, x2, y2):
+    return {item for item, (bx1, by1, bx2, by2) in boxes.items()
+            if bx1 < x2 and bx2 > x1 and by1 < y2 and by2 > y1}
+
+
+def test_query_matches_a_full_scan():
+    rng = random.Random(7)
+    grid = SpatialGrid(cell_size=64)
+    boxes = {}
+    for item in range(500):
+        x, y = rng.uniform(0, 3000), rng.uniform(0, 3000)
+        boxes[item] = (x, y, x + rng.uniform(1, 300), y + rng.uniform(1, 300))
+        grid.insert(item, boxes[item])
+    for item in range(0, 500, 3):
+        x, y = rng.uniform(0, 3000), rng.uniform(0, 3000)
+        boxes[item] = (x, y, x + 50, y + 50)
+        grid.update(item, boxes[item])
+    for item in range(0, 500, 7):
+        grid.remove(item)
+        del boxes[item]
+    for _ in range(200):
+        x, y = rng.uniform(-100, 3000), rng.uniform(-100, 3000)
+        rect = (x, y, x + rng.uniform(1, 800), y + rng.uniform(1, 800))
+        assert grid.query(*rect) == brute_query(boxes, *rect)
+        assert grid.occupied(*rect) == bool(brute_query(boxes, *rect))
+
+
+def test_removing_the_last_member_drops_empty_cells():
+    grid = SpatialGrid(cell_size=100)
+    grid.insert(1, (0, 0, 250, 50))
+    grid.remove(1)
+    grid.remove(1)
+    assert not grid._cells and len(grid) == 0
+
+
+def test_small_moves_inside_a_cell_keep_the_cells():
+    grid = SpatialGrid(cell_size=256)
+    grid.insert(1, (10, 10, 110, 70))
+    cells = dict(grid._cells)
+    grid.update(1, (20, 20, 120, 80))
+    assert grid._cells == cells and grid.bounds(1) == (20, 20, 120, 80)
+    grid.update(1, (300, 20, 400, 80))
+    assert grid.query(0, 0, 200, 200) == set()
+    assert grid.query(290, 0, 500, 200) == {1}
+
+
+def test_hit_returns_the_topmost_bubble():
+    grid = SpatialGrid()
+    grid.insert(1, (0, 0, 100, 60))
+    grid.insert(2, (50, 30, 150, 90))
+    assert grid.hit(60, 40) == 2
+    assert grid.hit(10, 10) == 1
+    assert grid.hit(500, 500) is None
+
+
+def test_free_spot_is_empty_and_close():
+    grid = SpatialGrid()
+    grid.insert(1, (100, 100, 100 + BUBBLE_WIDTH, 100 + BUBBLE_HEIGHT))
+    x, y = grid.free_spot(100, 100, BUBBLE_WIDTH, BUBBLE_HEIGHT)
+    assert (x, y) != (100, 100)
+    assert not grid.occupied(x, y, x + BUBBLE_WIDTH, y + BUBBLE_HEIGHT)
+    assert abs(x - 100) <= BUBBLE_WIDTH + 20 and abs(y - 100) <= BUBBLE_HEIGHT + 20
+    assert grid.free_spot(500, 500, BUBBLE_WIDTH, BUBBLE_HEIGHT) == (500, 500)
+
+
+def test_attached_grid_follows_the_graph():
+    graph = StoryGraph()
+    first = graph.add_node("Diálogo", x=0, y=0)
+    grid = SpatialGrid()
+    grid.attach(graph)
+    second = graph.add_node("Diálogo", x=50, y=20)
+    assert grid.overlaps(first.id) == {second.id}
+    graph.move_node(second.id, 1000, 1000)
+    assert grid.overlaps(first.id) == set()
+    assert grid.hit(1010, 1010) == second.id
+    graph.remove_node(second.id)
+    assert second.id not in grid
+    graph.clear()
+    assert len(grid) == 0
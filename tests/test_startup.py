@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+
+from flowstory.startup import StartupProfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Os módulos que o script importa antes de desenhar a primeira tela
+STARTUP_MODULES = ['graph', 'fragments', 'layout', 'journal', 'history', 'editing', 'render',
+                   'spatial', 'analysis', 'startup', 'metrics', 'markup']
+HEAVY = ['json', 'zipfile', 'multiprocessing', 'sqlite3', 'asyncio']
+
+
+def test_startup_imports_leave_heavy_modules_for_later():
+    code = ("import sys\n"
+            + ''.join(f"import flowstory.{name}\n" for name in STARTUP_MODULES)
+            + f"print(','.join(name for name in {HEAVY!r} if name in sys.modules))")
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True,
+                            text=True, check=True).stdout.strip()
+    assert output == ''
+
+
+def test_report_accumulates_marks():
+    profile = StartupProfile(started=10.0, cpu_before=0.05)
+    profile.mark("imports", at=10.2)
+    profile.mark("janela", at=10.5)
+    assert round(profile.total(), 6) == 0.5
+    lines = profile.report().splitlines()
+    assert lines[2].split() == ["(interpretador,", "CPU)", "50.0"]
+    assert lines[3].split() == ["imports", "200.0", "200.0"]
+    assert lines[4].split() == ["janela", "300.0", "500.0"]
+    assert lines[-1].endswith("500.0")
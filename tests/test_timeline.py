@@ -0,0 +1,137 @@
+from flowstory.graph import StoryGraph, EDGE_NEXT
+from flowstory.metrics import Metrics
+from flowstory.runtime import StoryRunner, compile_story
+from flowstory.timeline import (MAX_CATCH_UP, TRANSITION_SECONDS, Autoplay, FrameScheduler,
+                                TkFrameClock, reading_time)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_due_callbacks_run_in_time_then_order():
+    clock = Clock()
+    scheduler = FrameScheduler(clock)
+    ran = []
+    scheduler.call_at(2.0, ran.append, 'c')
+    scheduler.call_at(1.0, ran.append, 'a')
+    scheduler.call_at(1.0, ran.append, 'b')
+    late = scheduler.call_later(5.0, ran.append, 'nunca')
+    scheduler.cancel(late)
+    assert len(scheduler) == 3 and scheduler.next_due() == 1.0
+    assert scheduler.tick(1.5) == 2 and ran == ['a', 'b']
+    assert scheduler.tick(10) == 1 and ran == ['a', 'b', 'c']
+    assert scheduler.next_due() is None
+
+
+def test_a_key_keeps_only_the_latest_entry():
+    scheduler = FrameScheduler(Clock())
+    ran = []
+    for value in range(5):
+        scheduler.call_at(value, ran.append, value, key='preview')
+    assert len(scheduler) == 1
+    scheduler.tick(10)
+    assert ran == [4]
+
+
+def test_callbacks_due_during_a_tick_run_in_the_same_frame():
+    scheduler = FrameScheduler(Clock())
+    ran = []
+    scheduler.call_at(1.0, lambda: scheduler.call_at(0.5, ran.append, 'dentro'))
+    assert scheduler.tick(1.0) == 2 and ran == ['dentro']
+
+
+class FakeRoot:
+    def __init__(self):
+        self.jobs = {}
+        self._ids = 0
+
+    def after(self, delay, callback):
+        self._ids += 1
+        self.jobs[self._ids] = (delay, callback)
+        return self._ids
+
+    def after_cancel(self, job):
+        self.jobs.pop(job, None)
+
+
+def test_tk_clock_keeps_one_after_and_skips_missed_frames():
+    clock = Clock()
+    scheduler = FrameScheduler(clock)
+    root = FakeRoot()
+    metrics = Metrics()
+    frames = TkFrameClock(root, scheduler, frame_rate=4, metrics=metrics)
+    ran = []
+    scheduler.call_at(1.25, ran.append, 1)
+    scheduler.call_at(0.25, ran.append, 2)
+    assert [delay for delay, _ in root.jobs.values()] == [250]
+
+    clock.now = 0.25
+    job = root.jobs.pop(max(root.jobs))[1]
+    # O quadro termina em 0,9 s: as bordas 0,5 e 0,75 são puladas
+    scheduler.call_at(0.25, lambda: setattr(clock, 'now', 0.9))
+    job()
+    assert ran == [2]
+    assert metrics.counters['timeline.skipped'] == 2
+    assert [delay for delay, _ in root.jobs.values()] == [350]
+    frames.stop()
+    assert root.jobs == {} and scheduler.wake is None
+
+
+def story(*bubbles):
+    graph = StoryGraph()
+    nodes = [graph.add_node(kind, text) for kind, text in bubbles]
+    for src, dst in zip(nodes, nodes[1:]):
+        graph.connect(src.id, dst.id, EDGE_NEXT)
+    return StoryRunner(compile_story(graph))
+
+
+def test_autoplay_keeps_time_from_the_previous_event():
+    clock = Clock()
+    scheduler = FrameScheduler(clock)
+    shown = []
+    runner = story(("Diálogo", "Ana: Oi"), ("Tempo de Slide", "2"), ("Transição Súbita", ""),
+                   ("Diálogo", "Ana: Tchau"))
+    play = Autoplay(runner, scheduler, shown.append)
+    play.set_automatic(True)
+    scheduler.tick(0)
+    assert [event[0] for event in shown] == ['line']
+    first = reading_time("Oi")
+    # O quadro chega atrasado, mas a próxima hora conta da hora marcada
+    clock.now = first + 0.1
+    scheduler.tick()
+    assert shown[-1][0] == 'wait' and play.waiting
+    play.advance()
+    assert len(shown) == 2
+    assert scheduler.next_due() == first + 2
+    for due in (first + 2, first + 2 + TRANSITION_SECONDS, first + 2 + TRANSITION_SECONDS
+                + reading_time("Tchau")):
+        clock.now = due
+        scheduler.tick()
+    assert [event[0] for event in shown] == ['line', 'wait', 'transition', 'line', 'end']
+
+
+def test_autoplay_does_not_catch_up_after_a_long_pause():
+    clock = Clock()
+    scheduler = FrameScheduler(clock)
+    shown = []
+    play = Autoplay(story(("Diálogo", "Ana: Oi"), ("Diálogo", "Ana: Tchau")), scheduler,
+                    shown.append)
+    play.set_automatic(True)
+    scheduler.tick(0)
+    clock.now = 100.0
+    scheduler.tick()
+    assert play.cursor == 100.0 > reading_time("Oi") + MAX_CATCH_UP
+
+
+def test_autoplay_presents_runtime_errors():
+    shown = []
+    runner = story(("Se", "1 / zero"), ("Diálogo", "Ana: nunca"))
+    play = Autoplay(runner, FrameScheduler(Clock()), shown.append)
+    play.advance()
+    assert shown[0][0] == 'error' and "1 / zero" in shown[0][1]
+    assert runner.finished and not play.playing()